@@ -1,5 +1,5 @@
 from blenderproc.python.object.FaceSlicer import extract_floor, slice_faces_with_normals
-from blenderproc.python.object.ObjectPoseSampler import sample_poses
+from blenderproc.python.object.ObjectPoseSampler import sample_poses, sample_poses_batched
 from blenderproc.python.object.ObjectMerging import merge_objects
 from blenderproc.python.object.ObjectReplacer import replace_objects
 from blenderproc.python.object.OnSurfaceSampler import sample_poses_on_surface
@@ -2,7 +2,10 @@
     set_cpu_threads, toggle_stereo, set_simplify_subdivision_render, set_noise_threshold, \
     set_max_amount_of_samples, enable_distance_output, enable_depth_output, enable_normals_output, \
     enable_diffuse_color_output, map_file_format_to_file_ending, render, set_output_format, enable_motion_blur, \
-    enable_segmentation_output, set_world_background, set_render_devices, enable_experimental_features
+    enable_segmentation_output, set_world_background, set_render_devices, enable_experimental_features, \
+    enable_render_data_change_tracking, get_render_data_changes, get_render_stats, set_render_region, get_render_region
 from blenderproc.python.renderer.SegMapRendererUtility import render_segmap
-from blenderproc.python.renderer.FlowRendererUtility import render_optical_flow
-from blenderproc.python.renderer.NOCSRendererUtility import render_nocs
+from blenderproc.python.renderer.FlowRendererUtility import render_optical_flow, enable_optical_flow_output
+from blenderproc.python.renderer.NOCSRendererUtility import render_nocs, enable_nocs_output
+from blenderproc.python.renderer.SampleBudgetRendererUtility import render_with_sample_budget
+from blenderproc.python.renderer.RegionStitchingUtility import split_into_regions, stitch_render_regions
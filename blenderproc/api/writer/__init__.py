@@ -1,4 +1,6 @@
 from blenderproc.python.writer.GifWriterUtility import write_gif_animation
-from blenderproc.python.writer.BopWriterUtility import write_bop
+from blenderproc.python.writer.BopWriterUtility import write_bop, compact_bop_chunks
 from blenderproc.python.writer.CocoWriterUtility import write_coco_annotations
-from blenderproc.python.writer.WriterUtility import write_hdf5
+from blenderproc.python.writer.CocoJournalUtility import consolidate_coco_journal
+from blenderproc.python.writer.WriterUtility import write_hdf5, Hdf5StreamWriter
+from blenderproc.python.writer.Hdf5WritePolicy import Hdf5WritePolicy
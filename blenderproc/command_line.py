@@ -6,6 +6,8 @@
 import signal
 import sys
 import subprocess
+import time
+from typing import List
 
 repo_root_directory = os.path.join(os.path.dirname(os.path.dirname(__file__)))
 sys.path.append(repo_root_directory)
@@ -37,6 +39,14 @@ def cli():
             'scenenet': "Downloads the scenenet dataset.",
             'matterport3d': "Downloads the Matterport3D dataset."
         },
+        "consolidate": {
+            'coco': "Consolidates a coco annotations journal into a single coco_annotations.json.",
+            'regions': "Stitches the hdf5 containers of several render regions into containers of the whole images."
+        },
+        "benchmark": {
+            'hdf5': "Benchmarks the hdf5 write policies on synthetic renderer outputs.",
+            'coco_rle': "Benchmarks the coco RLE encoding and decoding on synthetic masks."
+        },
         "pip": {
             'install': "Installs package in the Blender python environment",
             'uninstall': "Uninstalls package in the Blender python environment"
@@ -68,6 +78,14 @@ def cli():
     parser_extract = subparsers.add_parser('extract', help="Extract the raw images from generated containers such "
                                                            "as hdf5. \nOptions: {', '.join(options['extract'])}",
                                            formatter_class=argparse.RawTextHelpFormatter)
+    parser_consolidate = subparsers.add_parser('consolidate', help="Consolidate partial outputs into their final "
+                                                                   "files. \nOptions: "
+                                                                   f"{', '.join(options['consolidate'])}",
+                                               formatter_class=argparse.RawTextHelpFormatter)
+    parser_benchmark = subparsers.add_parser('benchmark', help="Benchmark performance critical parts of BlenderProc "
+                                                               "outside of blender. \nOptions: "
+                                                               f"{', '.join(options['benchmark'])}",
+                                             formatter_class=argparse.RawTextHelpFormatter)
     parser_pip = subparsers.add_parser('pip', help="Can be used to install/uninstall pip packages in the Blender "
                                                    "python environment. \nOptions: {', '.join(options['pip'])}",
                                        formatter_class=argparse.RawTextHelpFormatter)
@@ -84,6 +102,14 @@ def cli():
     for cmd, help_str in options['extract'].items():
         sub_parser_extract.add_parser(cmd, help=help_str, add_help=False)
 
+    sub_parser_consolidate = parser_consolidate.add_subparsers(dest='consolidate_mode')
+    for cmd, help_str in options['consolidate'].items():
+        sub_parser_consolidate.add_parser(cmd, help=help_str, add_help=False)
+
+    sub_parser_benchmark = parser_benchmark.add_subparsers(dest='benchmark_mode')
+    for cmd, help_str in options['benchmark'].items():
+        sub_parser_benchmark.add_parser(cmd, help=help_str, add_help=False)
+
     parser_pip.add_argument('pip_mode', choices=options['pip'],
                             help='\n'.join(f"{key}: {value}" for key, value in options["pip"].items()))
     parser_pip.add_argument('pip_packages', metavar='pip_packages', nargs='*',
@@ -113,6 +139,10 @@ def cli():
                                help="If set, the cache of installed pip packages will be ignored and rebuild "
                                     "based on pip freeze.")
 
+    parser_run.add_argument('--scene-workers', dest='scene_workers', type=int, default=0,
+                            help="The number of additional blender processes, which prepare the scenes given to "
+                                 "bproc.utility.prepare_scenes, while the main process renders them. Default: 0.")
+
     # Setup common arguments of run, debug and pip mode
     for subparser in [parser_run, parser_debug, parser_pip, parser_quickstart]:
         subparser.add_argument('--blender-install-path', dest='blender_install_path', default=None,
@@ -176,6 +206,9 @@ def cli():
         if args.force_pip_update:
             SetupUtility.clean_installed_packages_cache(os.path.dirname(blender_run_path), major_version)
 
+        # The processes which prepare scenes for the main process
+        workers: List[subprocess.Popen] = []
+
         # Run either in debug or in normal mode
         if args.mode == "debug":
             # pylint: disable=consider-using-with
@@ -185,6 +218,19 @@ def cli():
                                  env=used_environment)
             # pylint: enable=consider-using-with
         else:
+            scene_workers = getattr(args, "scene_workers", 0)
+            if scene_workers > 0:
+                # The workers prepare the scenes and pass them to the main process via the scene queue
+                used_environment["BLENDER_PROC_SCENE_QUEUE"] = os.path.join(temp_dir, "scene_queue")
+                used_environment["BLENDER_PROC_NUM_SCENE_WORKERS"] = str(scene_workers)
+                for worker_id in range(scene_workers):
+                    worker_environment = dict(used_environment, BLENDER_PROC_SCENE_WORKER_ID=str(worker_id))
+                    # pylint: disable=consider-using-with
+                    workers.append(subprocess.Popen([blender_run_path, "--background", "--python-use-system-env",
+                                                     "--python-exit-code", "2", "--python", path_src_run, "--",
+                                                     args.file, os.path.join(temp_dir, f"scene_worker_{worker_id}")]
+                                                    + unknown_args, env=worker_environment))
+                    # pylint: enable=consider-using-with
             # pylint: disable=consider-using-with
             p = subprocess.Popen([blender_run_path, "--background", "--python-use-system-env", "--python-exit-code",
                                   "2", "--python", path_src_run, "--", args.file, temp_dir] + unknown_args,
@@ -200,25 +246,30 @@ def clean_temp_dir():
         # Listen for SIGTERM signal, so we can properly clean up and terminate the child process
         def handle_sigterm(_signum, _frame):
             clean_temp_dir()
-            p.terminate()
+            for process in workers + [p]:
+                process.terminate()
 
         signal.signal(signal.SIGTERM, handle_sigterm)
 
+        workers_returncode = 0
         try:
+            if workers:
+                workers_returncode = wait_for_scene_workers(p, workers, used_environment["BLENDER_PROC_SCENE_QUEUE"])
             p.wait()
         except KeyboardInterrupt:
-            try:
-                p.terminate()
-            except OSError:
-                pass
-            p.wait()
+            for process in workers + [p]:
+                try:
+                    process.terminate()
+                except OSError:
+                    pass
+                process.wait()
 
         # Clean up
         clean_temp_dir()
 
-        sys.exit(p.returncode)
+        sys.exit(p.returncode if p.returncode else workers_returncode)
     # Import the required entry point
-    elif args.mode in ["vis", "extract", "download"]:
+    elif args.mode in ["vis", "extract", "download", "consolidate", "benchmark"]:
         # pylint: disable=import-outside-toplevel
         if args.mode == "vis" and args.vis_mode == "hdf5":
             from blenderproc.scripts.visHdf5Files import cli as current_cli
@@ -240,6 +291,14 @@ def handle_sigterm(_signum, _frame):
             from blenderproc.scripts.download_scenenet import cli as current_cli
         elif args.mode == "download" and args.download_mode == "matterport3d":
             from blenderproc.scripts.download_matterport3d import cli as current_cli
+        elif args.mode == "consolidate" and args.consolidate_mode == "coco":
+            from blenderproc.scripts.consolidate_coco_journal import cli as current_cli
+        elif args.mode == "consolidate" and args.consolidate_mode == "regions":
+            from blenderproc.scripts.stitch_hdf5_regions import cli as current_cli
+        elif args.mode == "benchmark" and args.benchmark_mode == "hdf5":
+            from blenderproc.scripts.benchmark_hdf5_write_policies import cli as current_cli
+        elif args.mode == "benchmark" and args.benchmark_mode == "coco_rle":
+            from blenderproc.scripts.benchmark_coco_rle import cli as current_cli
         else:
             raise RuntimeError(f"There is no linked script for the command: {args.mode}. "
                                f"Options are: {options[args.mode]}")
@@ -271,5 +330,37 @@ def handle_sigterm(_signum, _frame):
         sys.exit(0)
 
 
+def wait_for_scene_workers(main_process: subprocess.Popen, workers: List[subprocess.Popen], queue_dir: str) -> int:
+    """ Waits until the main process has finished, while keeping track of the scene workers.
+
+    When a worker exits, it is marked as done in the scene queue, also if it crashed, so the main process does not
+    wait for its scenes forever. When the main process exits, the remaining workers are terminated.
+
+    :param main_process: The main process, which renders the prepared scenes.
+    :param workers: The worker processes, which prepare the scenes.
+    :param queue_dir: The directory of the scene queue.
+    :return: The exit code of the first failed worker or 0, if no worker has failed.
+    """
+    # pylint: disable=import-outside-toplevel
+    from blenderproc.python.utility.SceneStateQueue import SceneStateQueue
+    # pylint: enable=import-outside-toplevel
+    queue = SceneStateQueue(queue_dir)
+    running_workers = dict(enumerate(workers))
+    returncode = 0
+    while main_process.poll() is None and running_workers:
+        for worker_id, worker in list(running_workers.items()):
+            if worker.poll() is not None:
+                if worker.returncode:
+                    print(f"Scene worker {worker_id} failed with exit code {worker.returncode}")
+                    returncode = returncode or worker.returncode
+                queue.mark_worker_done(worker_id)
+                del running_workers[worker_id]
+        time.sleep(0.5)
+    for worker in running_workers.values():
+        worker.terminate()
+        worker.wait()
+    return returncode
+
+
 if __name__ == "__main__":
     cli()
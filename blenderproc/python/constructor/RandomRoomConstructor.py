@@ -5,7 +5,7 @@
 
 import warnings
 import math
-from typing import Tuple, List, Dict
+from typing import Tuple, List
 import random
 
 import bpy
@@ -14,7 +14,7 @@
 import numpy as np
 
 from blenderproc.python.modules.provider.getter.Material import Material
-from blenderproc.python.utility.CollisionUtility import CollisionUtility
+from blenderproc.python.utility.CollisionUtility import CollisionUtility, BoundingBoxCache, BvhCache
 from blenderproc.python.types.EntityUtility import delete_multiple
 from blenderproc.python.types.MeshObjectUtility import MeshObject, create_primitive
 from blenderproc.python.object.FaceSlicer import FaceSlicer
@@ -49,7 +49,8 @@ def construct_random_room(used_floor_area: float, interior_objects: List[MeshObj
     # internally the first basic rectangular is counted as one
     amount_of_extrusions += 1
 
-    bvh_cache_for_intersection: Dict[str, mathutils.bvhtree.BVHTree] = {}
+    bvh_cache_for_intersection = BvhCache()
+    bb_cache_for_intersection = BoundingBoxCache()
     placed_objects = []
 
     # construct a random room
@@ -117,6 +118,7 @@ def construct_random_room(used_floor_area: float, interior_objects: List[MeshObj
                     for _ in range(placement_tries_per_face):
                         found_spot = _sample_new_object_poses_on_face(current_obj, face_bb,
                                                                      bvh_cache_for_intersection,
+                                                                     bb_cache_for_intersection,
                                                                      placed_objects, wall_obj)
                         if found_spot:
                             placed_objects.append(current_obj)
@@ -131,6 +133,7 @@ def construct_random_room(used_floor_area: float, interior_objects: List[MeshObj
                     for _ in range(placement_tries_per_face):
                         found_spot = _sample_new_object_poses_on_face(current_obj, face_bb,
                                                                      bvh_cache_for_intersection,
+                                                                     bb_cache_for_intersection,
                                                                      placed_objects, wall_obj)
                         if found_spot:
                             placed_objects.append(current_obj)
@@ -142,9 +145,6 @@ def construct_random_room(used_floor_area: float, interior_objects: List[MeshObj
             current_i = (current_i + 1) % len(list_of_face_sizes)
             total_acc_size += face_size
 
-        # remove current obj from the bvh cache
-        if current_obj.get_name() in bvh_cache_for_intersection:
-            del bvh_cache_for_intersection[current_obj.get_name()]
         # if there was no collision save the object in the placed list
         if is_duplicated:
             # delete the duplicated object
@@ -503,7 +503,8 @@ def _assign_materials_to_floor_wall_ceiling(floor_obj: MeshObject, wall_obj: Mes
                       "No materials have been assigned to the walls, floors and possible ceiling.")
 
 
-def _sample_new_object_poses_on_face(current_obj: MeshObject, face_bb, bvh_cache_for_intersection: dict,
+def _sample_new_object_poses_on_face(current_obj: MeshObject, face_bb, bvh_cache_for_intersection: BvhCache,
+                                     bb_cache_for_intersection: BoundingBoxCache,
                                      placed_objects: List[MeshObject], wall_obj: MeshObject):
     """
     Sample new object poses on the current `floor_obj`.
@@ -519,13 +520,10 @@ def _sample_new_object_poses_on_face(current_obj: MeshObject, face_bb, bvh_cache
     current_obj.set_location(random_placed_value)
     current_obj.set_rotation_euler(random_placed_rotation)
 
-    # Remove bvh cache, as object has changed
-    if current_obj.get_name() in bvh_cache_for_intersection:
-        del bvh_cache_for_intersection[current_obj.get_name()]
-
     # perform check if object can be placed there
     no_collision = CollisionUtility.check_intersections(current_obj,
                                                         bvh_cache=bvh_cache_for_intersection,
                                                         objects_to_check_against=placed_objects,
-                                                        list_of_objects_with_no_inside_check=[wall_obj])
+                                                        list_of_objects_with_no_inside_check=[wall_obj],
+                                                        bb_cache=bb_cache_for_intersection)
     return no_collision
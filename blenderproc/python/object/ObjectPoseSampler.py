@@ -2,9 +2,9 @@
 
 from typing import Callable, List, Dict, Tuple
 
-import mathutils
+import numpy as np
 
-from blenderproc.python.utility.CollisionUtility import CollisionUtility
+from blenderproc.python.utility.CollisionUtility import CollisionUtility, BoundingBoxCache, BvhCache
 from blenderproc.python.types.EntityUtility import Entity
 from blenderproc.python.types.MeshObjectUtility import MeshObject, get_all_mesh_objects
 
@@ -47,7 +47,8 @@ def sample_poses(objects_to_sample: List[MeshObject], sample_pose_func: Callable
         raise RuntimeError("The list of objects_to_sample can not be empty!")
 
     # cache to fasten collision detection
-    bvh_cache: Dict[str, mathutils.bvhtree.BVHTree] = {}
+    bvh_cache = BvhCache()
+    bb_cache = BoundingBoxCache()
 
     sample_results: Dict[Entity, Tuple[int, bool]] = {}
 
@@ -69,11 +70,8 @@ def sample_poses(objects_to_sample: List[MeshObject], sample_pose_func: Callable
             # Put the top object in queue at the sampled point in space
             sample_pose_func(obj)
 
-            # Remove bvh cache, as object has changed
-            if obj.get_name() in bvh_cache:
-                del bvh_cache[obj.get_name()]
-
-            no_collision = CollisionUtility.check_intersections(obj, bvh_cache, cur_objects_to_check_collisions, [])
+            no_collision = CollisionUtility.check_intersections(obj, bvh_cache, cur_objects_to_check_collisions, [],
+                                                                bb_cache)
 
             # If no collision then keep the position
             if no_collision:
@@ -96,3 +94,143 @@ def sample_poses(objects_to_sample: List[MeshObject], sample_pose_func: Callable
         sample_results[obj] = (amount_of_tries_done, no_collision)
 
     return sample_results
+
+
+def sample_poses_batched(objects_to_sample: List[MeshObject],
+                         sample_poses_func: Callable[[MeshObject, int], Tuple[np.ndarray, np.ndarray]],
+                         objects_to_check_collisions: List[MeshObject] = None, max_tries: int = 1000,
+                         batch_size: int = 100, mode_on_failure: str = "last_pose") -> Dict[Entity, Tuple[int, bool]]:
+    """
+    Samples positions and rotations of selected object inside the sampling volume while performing mesh and
+    bounding box collision checks, like `sample_poses`, but many poses are sampled at once.
+
+    The given function returns a batch of candidate poses per call. The bounding boxes of all candidates are checked
+    against the bounding boxes of all placed objects at once, only candidates whose bounding box intersects with
+    another one are applied to the object and checked via the meshes. The first candidate without a collision is
+    used, so the objects are placed like in `sample_poses`, if the candidates are sampled in the same way.
+
+    Example for a sample_poses_func:
+
+    .. code-block:: python
+
+        def sample_poses_func(obj: bproc.types.MeshObject, num_poses: int):
+            locations = np.random.uniform([-0.3, -0.3, 0.0], [0.3, 0.3, 0.4], size=(num_poses, 3))
+            rotations = np.array([bproc.sampler.uniformSO3() for _ in range(num_poses)])
+            return locations, rotations
+
+    :param objects_to_sample: A list of mesh objects whose poses are sampled based on the given function.
+    :param sample_poses_func: The function to use for sampling the poses of a given object. It receives the object
+                              and the number of poses and returns the locations and the euler rotations of the poses,
+                              both with shape [num_poses, 3].
+    :param objects_to_check_collisions: A list of mesh objects who should not be considered when checking for
+                                        collisions.
+    :param max_tries: Amount of tries before giving up on an object and moving to the next one.
+    :param batch_size: The number of poses which are sampled per call of `sample_poses_func`.
+    :param mode_on_failure: Define final state of objects that could not be placed without collisions within max_tries
+                            attempts. Options: 'last_pose', 'initial_pose'
+
+    :return: A dict with the objects to sample as keys and a Tuple with the number of executed attempts to place the
+             object as first element, and a bool whether it has been successfully placed without collisions.
+    """
+    # Check if mode on failure is allowed
+    allowed_modes_on_failure = ["last_pose", "initial_pose"]
+    if mode_on_failure not in allowed_modes_on_failure:
+        raise ValueError(f"{mode_on_failure} is not an allowed mode_on_failure.")
+
+    if objects_to_check_collisions is None:
+        objects_to_check_collisions = get_all_mesh_objects()
+
+    # Among objects_to_sample only check collisions against already placed objects
+    cur_objects_to_check_collisions = list(set(objects_to_check_collisions) - set(objects_to_sample))
+
+    if max_tries <= 0:
+        raise ValueError(f"The value of max_tries must be greater than zero: {max_tries}")
+    if batch_size <= 0:
+        raise ValueError(f"The value of batch_size must be greater than zero: {batch_size}")
+
+    if not objects_to_sample:
+        raise RuntimeError("The list of objects_to_sample can not be empty!")
+
+    # cache to fasten collision detection
+    bvh_cache = BvhCache()
+    bb_cache = BoundingBoxCache()
+
+    sample_results: Dict[Entity, Tuple[int, bool]] = {}
+
+    # for every selected object
+    for obj in objects_to_sample:
+        initial_location = obj.get_location()
+        initial_rotation = obj.get_rotation_euler()
+
+        no_collision = False
+        amount_of_tries_done = 0
+
+        while not no_collision and amount_of_tries_done < max_tries:
+            num_poses = min(batch_size, max_tries - amount_of_tries_done)
+            locations, rotations = sample_poses_func(obj, num_poses)
+            locations, rotations = np.asarray(locations, dtype=np.float64), np.asarray(rotations, dtype=np.float64)
+
+            # Check the bounding boxes of all candidates against the ones of the placed objects at once
+            candidate_bounds = _ObjectPoseSampler.compute_bounding_boxes(obj, locations, rotations)
+            other_bounds = bb_cache.get_bounds(cur_objects_to_check_collisions)
+            intersecting = np.all((candidate_bounds[:, np.newaxis, 1] >= other_bounds[np.newaxis, :, 0]) &
+                                  (other_bounds[np.newaxis, :, 1] >= candidate_bounds[:, np.newaxis, 0]), axis=2)
+
+            for location, rotation, candidate_intersecting in zip(locations, rotations, intersecting):
+                amount_of_tries_done += 1
+                obj.set_location(location)
+                obj.set_rotation_euler(rotation)
+                intersecting_objects = [cur_objects_to_check_collisions[i]
+                                        for i in np.flatnonzero(candidate_intersecting)]
+                # Only candidates whose bounding box intersects with another one need to be checked via the meshes
+                no_collision = not intersecting_objects or \
+                    CollisionUtility.check_intersections(obj, bvh_cache, intersecting_objects, [], bb_cache)
+                if no_collision:
+                    break
+
+        if no_collision:
+            print(f"It took {amount_of_tries_done} tries to place {obj.get_name()}")
+            # Like in sample_poses, the index of the successful try is returned
+            amount_of_tries_done -= 1
+        else:
+            amount_of_tries_done = max_tries
+            print(f"Could not place {obj.get_name()} without a collision.")
+
+            if mode_on_failure == 'initial_pose':
+                obj.set_location(initial_location)
+                obj.set_rotation_euler(initial_rotation)
+
+        # After placing an object, we will check collisions with it
+        cur_objects_to_check_collisions.append(obj)
+
+        sample_results[obj] = (amount_of_tries_done, no_collision)
+
+    return sample_results
+
+
+class _ObjectPoseSampler:
+
+    @staticmethod
+    def compute_bounding_boxes(obj: MeshObject, locations: np.ndarray, rotations: np.ndarray) -> np.ndarray:
+        """ Computes the axis-aligned world bounding boxes of the object for the given candidate poses.
+
+        :param obj: The object, whose scale and parent are kept.
+        :param locations: The locations of the candidates with shape [N, 3].
+        :param rotations: The euler rotations of the candidates in XYZ order with shape [N, 3].
+        :return: The min and max point of each bounding box with shape [N, 2, 3].
+        """
+        # The part of the local2world matrix, which does not depend on the location and rotation of the object
+        parent_mat = obj.get_local2world_mat() @ np.linalg.inv(np.array(obj.blender_obj.matrix_basis))
+
+        cos, sin = np.cos(rotations), np.sin(rotations)
+        zeros, ones = np.zeros(len(rotations)), np.ones(len(rotations))
+        rot_x = np.stack([ones, zeros, zeros, zeros, cos[:, 0], -sin[:, 0], zeros, sin[:, 0], cos[:, 0]], axis=1)
+        rot_y = np.stack([cos[:, 1], zeros, sin[:, 1], zeros, ones, zeros, -sin[:, 1], zeros, cos[:, 1]], axis=1)
+        rot_z = np.stack([cos[:, 2], -sin[:, 2], zeros, sin[:, 2], cos[:, 2], zeros, zeros, zeros, ones], axis=1)
+        # blender applies the XYZ euler rotations in the order x, y, z
+        rotation_mats = rot_z.reshape(-1, 3, 3) @ rot_y.reshape(-1, 3, 3) @ rot_x.reshape(-1, 3, 3)
+
+        local_corners = obj.get_bound_box(local_coords=True) * np.array(obj.get_scale())
+        corners = local_corners @ rotation_mats.transpose(0, 2, 1) + locations[:, np.newaxis]
+        corners = corners @ parent_mat[:3, :3].T + parent_mat[:3, 3]
+        return np.stack([np.min(corners, axis=1), np.max(corners, axis=1)], axis=1)
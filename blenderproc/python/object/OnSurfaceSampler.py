@@ -1,11 +1,10 @@
 """Sampling objects on a surface."""
 
-from typing import Callable, List, Optional, Dict
+from typing import Callable, List, Optional
 
-import mathutils
 import numpy as np
 
-from blenderproc.python.utility.CollisionUtility import CollisionUtility
+from blenderproc.python.utility.CollisionUtility import CollisionUtility, BoundingBoxCache, BvhCache
 from blenderproc.python.types.MeshObjectUtility import MeshObject
 
 
@@ -42,7 +41,8 @@ def sample_poses_on_surface(objects_to_sample: List[MeshObject], surface: MeshOb
     surface_height = max(up_direction.dot(corner) for corner in surface_bounds)
 
     # cache to fasten collision detection
-    bvh_cache: Dict[str, mathutils.bvhtree.BVHTree] = {}
+    bvh_cache = BvhCache()
+    bb_cache = BoundingBoxCache()
 
     placed_objects: List[MeshObject] = []
     for obj in objects_to_sample:
@@ -52,11 +52,8 @@ def sample_poses_on_surface(objects_to_sample: List[MeshObject], surface: MeshOb
 
         for i in range(max_tries):
             sample_pose_func(obj)
-            # Remove bvh cache, as object has changed
-            if obj.get_name() in bvh_cache:
-                del bvh_cache[obj.get_name()]
 
-            if not CollisionUtility.check_intersections(obj, bvh_cache, placed_objects, []):
+            if not CollisionUtility.check_intersections(obj, bvh_cache, placed_objects, [], bb_cache):
                 print("Collision detected, retrying!")
                 continue
 
@@ -65,9 +62,6 @@ def sample_poses_on_surface(objects_to_sample: List[MeshObject], surface: MeshOb
                 continue
 
             _OnSurfaceSampler.drop(obj, up_direction, surface_height)
-            # Remove bvh cache, as object has changed
-            if obj.get_name() in bvh_cache:
-                del bvh_cache[obj.get_name()]
 
             if not _OnSurfaceSampler.check_above_surface(obj, surface, up_direction, check_all_bb_corners_over_surface):
                 print("Not above surface after drop, retrying!")
@@ -77,7 +71,7 @@ def sample_poses_on_surface(objects_to_sample: List[MeshObject], surface: MeshOb
                 print("Bad spacing after drop, retrying!")
                 continue
 
-            if not CollisionUtility.check_intersections(obj, bvh_cache, placed_objects, []):
+            if not CollisionUtility.check_intersections(obj, bvh_cache, placed_objects, [], bb_cache):
                 print("Collision detected after drop, retrying!")
                 continue
 
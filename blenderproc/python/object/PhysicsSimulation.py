@@ -1,5 +1,7 @@
 """Run the physics simulation for the objects in the scene."""
 
+from typing import List, Tuple
+
 import bpy
 import mathutils
 import numpy as np
@@ -13,7 +15,8 @@ def simulate_physics_and_fix_final_poses(min_simulation_time: float = 4.0, max_s
                                          check_object_interval: float = 2.0,
                                          object_stopped_location_threshold: float = 0.01,
                                          object_stopped_rotation_threshold: float = 0.1, substeps_per_frame: int = 10,
-                                         solver_iters: int = 10, verbose: bool = False):
+                                         solver_iters: int = 10, verbose: bool = False,
+                                         use_deactivation: bool = False):
     """ Simulates the current scene and in the end fixes the final poses of all active objects.
 
     The simulation is run for at least `min_simulation_time` seconds and at a maximum `max_simulation_time` seconds.
@@ -30,12 +33,14 @@ def simulate_physics_and_fix_final_poses(min_simulation_time: float = 4.0, max_s
     :param object_stopped_location_threshold: The maximum difference per second and per coordinate in the rotation
                                               Euler vector that is allowed such that an object is still recognized
                                               as 'stopped moving'.
-    :param object_stopped_rotation_threshold: The maximum difference per second and per coordinate in the rotation
-                                              Euler vector that is allowed such that an object is still recognized
-                                              as 'stopped moving'.
+    :param object_stopped_rotation_threshold: The maximum rotation angle in radians per second that is allowed
+                                              such that an object is still recognized as 'stopped moving'.
     :param substeps_per_frame: Number of simulation steps taken per frame.
     :param solver_iters: Number of constraint solver iterations made per simulation step.
     :param verbose: If True, more details during the physics simulation are printed.
+    :param use_deactivation: If True, objects whose velocity is below the thresholds are deactivated by the
+                             simulator, such that resting objects no longer cost simulation time. They are activated
+                             again, when they are hit by another object.
     """
     # Undo changes made in the simulation like origin adjustment and persisting the object's scale
     with UndoAfterExecution():
@@ -43,7 +48,7 @@ def simulate_physics_and_fix_final_poses(min_simulation_time: float = 4.0, max_s
         obj_poses_before_sim = _PhysicsSimulation.get_pose()
         origin_shifts = simulate_physics(min_simulation_time, max_simulation_time, check_object_interval,
                                          object_stopped_location_threshold, object_stopped_rotation_threshold,
-                                         substeps_per_frame, solver_iters, verbose)
+                                         substeps_per_frame, solver_iters, verbose, use_deactivation)
         obj_poses_after_sim = _PhysicsSimulation.get_pose()
 
         # Make sure to remove the simulation cache as we are only interested in the final poses
@@ -76,7 +81,7 @@ def simulate_physics_and_fix_final_poses(min_simulation_time: float = 4.0, max_s
 def simulate_physics(min_simulation_time: float = 4.0, max_simulation_time: float = 40.0,
                      check_object_interval: float = 2.0, object_stopped_location_threshold: float = 0.01,
                      object_stopped_rotation_threshold: float = 0.1, substeps_per_frame: int = 10,
-                     solver_iters: int = 10, verbose: bool = False) -> dict:
+                     solver_iters: int = 10, verbose: bool = False, use_deactivation: bool = False) -> dict:
     """ Simulates the current scene.
 
     The simulation is run for at least `min_simulation_time` seconds and at a maximum `max_simulation_time` seconds.
@@ -94,12 +99,14 @@ def simulate_physics(min_simulation_time: float = 4.0, max_simulation_time: floa
     :param object_stopped_location_threshold: The maximum difference per second and per coordinate in the rotation
                                               Euler vector that is allowed such that an object is still recognized
                                               as 'stopped moving'.
-    :param object_stopped_rotation_threshold: The maximum difference per second and per coordinate in the rotation
-                                              Euler vector that is allowed such that an object is still recognized
-                                              as 'stopped moving'.
+    :param object_stopped_rotation_threshold: The maximum rotation angle in radians per second that is allowed
+                                              such that an object is still recognized as 'stopped moving'.
     :param substeps_per_frame: Number of simulation steps taken per frame.
     :param solver_iters: Number of constraint solver iterations made per simulation step.
     :param verbose: If True, more details during the physics simulation are printed.
+    :param use_deactivation: If True, objects whose velocity is below the thresholds are deactivated by the
+                             simulator, such that resting objects no longer cost simulation time. They are activated
+                             again, when they are hit by another object.
     :return: A dict containing for every active object the shift that was added to their origins.
     """
     # Shift the origin of all objects to their center of mass to make the simulation more realistic
@@ -120,7 +127,7 @@ def simulate_physics(min_simulation_time: float = 4.0, max_simulation_time: floa
     # Perform simulation
     _PhysicsSimulation.do_simulation(min_simulation_time, max_simulation_time, check_object_interval,
                                      object_stopped_location_threshold, object_stopped_rotation_threshold,
-                                     verbose)
+                                     verbose, use_deactivation)
 
     return origin_shift
 
@@ -148,11 +155,12 @@ def frames_to_seconds(frames: int) -> float:
     @staticmethod
     def do_simulation(min_simulation_time: float, max_simulation_time: float, check_object_interval: float,
                       object_stopped_location_threshold: float, object_stopped_rotation_threshold: float,
-                      verbose: bool = False):
+                      verbose: bool = False, use_deactivation: bool = False):
         """ Perform the simulation.
 
-        This method bakes the simulation for the configured number of iterations and returns all object positions
-        at the last frame.
+        This method simulates the frames one after another until all objects have stopped moving or the maximum
+        simulation time has been reached. In the end, the simulated frames are baked and the scene is at the last
+        simulated frame.
 
         :param min_simulation_time: The minimum number of seconds to simulate.
         :param max_simulation_time: The maximum number of seconds to simulate.
@@ -161,10 +169,11 @@ def do_simulation(min_simulation_time: float, max_simulation_time: float, check_
         :param object_stopped_location_threshold: The maximum difference per second and per coordinate in the rotation
                                                   Euler vector that is allowed such that an object is still recognized
                                                   as 'stopped moving'.
-        :param object_stopped_rotation_threshold: The maximum difference per second and per coordinate in the rotation
-                                                  Euler vector that is allowed such that an object is still recognized
-                                                  as 'stopped moving'.
+        :param object_stopped_rotation_threshold: The maximum rotation angle in radians per second that is allowed
+                                                  such that an object is still recognized as 'stopped moving'.
         :param verbose: If True, more details during the physics simulation are printed.
+        :param use_deactivation: If True, objects whose velocity is below the thresholds are deactivated by the
+                                 simulator.
         """
         # Make sure the RigidBody world is active
         bpy.context.scene.rigidbody_world.enabled = True
@@ -176,36 +185,59 @@ def do_simulation(min_simulation_time: float, max_simulation_time: float, check_
         if min_simulation_time >= max_simulation_time:
             raise Exception("max_simulation_iterations has to be bigger than min_simulation_iterations")
 
+        # The simulation is computed incrementally while stepping through the frames, it only stops at the end of the
+        # point cache
+        point_cache.frame_end = _PhysicsSimulation.seconds_to_frames(max_simulation_time)
+        active_objects = [obj for obj in get_all_blender_mesh_objects()
+                          if obj.rigid_body is not None and obj.rigid_body.type == 'ACTIVE']
+        if use_deactivation:
+            # Let bullet freeze objects, which are resting, such that they no longer cost simulation time
+            for obj in active_objects:
+                obj.rigid_body.use_deactivation = True
+                obj.rigid_body.use_start_deactivated = False
+                obj.rigid_body.deactivate_linear_velocity = object_stopped_location_threshold
+                obj.rigid_body.deactivate_angular_velocity = object_stopped_rotation_threshold
+
+        # Start the simulation at the first frame of the point cache
+        bpy.context.scene.frame_set(point_cache.frame_start)
+        simulated_frame = point_cache.frame_start
+
         # Run simulation starting from min to max in the configured steps
         for current_time in np.arange(min_simulation_time, max_simulation_time, check_object_interval):
             current_frame = _PhysicsSimulation.seconds_to_frames(current_time)
             print("Running simulation up to " + str(current_time) + " seconds (" + str(current_frame) + " frames)")
 
-            # Simulate current interval
-            point_cache.frame_end = current_frame
+            # Simulate current interval, continuing from the last simulated frame
             with stdout_redirected(enabled=not verbose):
-                bpy.ops.ptcache.bake({"point_cache": point_cache}, bake=True)
+                for frame in range(simulated_frame + 1, current_frame + 1):
+                    bpy.context.scene.frame_set(frame)
+            simulated_frame = max(simulated_frame, current_frame)
 
-            # Go to second last frame and get poses
+            # Go to second last frame and get poses, this frame is read from the cache
             bpy.context.scene.frame_set(current_frame - _PhysicsSimulation.seconds_to_frames(1))
-            old_poses = _PhysicsSimulation.get_pose()
+            old_locations, old_rotations = _PhysicsSimulation.get_pose_arrays(active_objects)
 
             # Go to last frame of simulation and get poses
             bpy.context.scene.frame_set(current_frame)
-            new_poses = _PhysicsSimulation.get_pose()
+            new_locations, new_rotations = _PhysicsSimulation.get_pose_arrays(active_objects)
 
             # If objects have stopped moving between the last two frames, then stop here
-            if _PhysicsSimulation.have_objects_stopped_moving(old_poses, new_poses, object_stopped_location_threshold,
-                                                              object_stopped_rotation_threshold):
+            moving = _PhysicsSimulation.get_moving_objects(old_locations, old_rotations, new_locations, new_rotations,
+                                                           object_stopped_location_threshold,
+                                                           object_stopped_rotation_threshold)
+            if not np.any(moving):
                 print("Objects have stopped moving after " + str(current_time) + "  seconds (" + str(
                     current_frame) + " frames)")
                 break
+            if verbose:
+                print(f"{np.count_nonzero(moving)} of {len(active_objects)} objects are still moving")
             if current_time + check_object_interval >= max_simulation_time:
                 print("Stopping simulation as configured max_simulation_time has been reached")
-            else:
-                # Free bake (this will not completely remove the simulation cache, so further simulations can
-                # reuse the already calculated frames)
-                bpy.ops.ptcache.free_bake({"point_cache": point_cache})
+
+        # Freeze the simulated frames as a bake, which ends at the last simulated frame, like a bake of these frames
+        # would do. Otherwise, blender would reset the cache on scene changes and simulate further frames.
+        point_cache.frame_end = simulated_frame
+        bpy.ops.ptcache.bake_from_cache({"point_cache": point_cache})
 
     @staticmethod
     def get_pose() -> dict:
@@ -225,31 +257,41 @@ def get_pose() -> dict:
         return objects_poses
 
     @staticmethod
-    def have_objects_stopped_moving(last_poses: dict, new_poses: dict, object_stopped_location_threshold: float,
-                                    object_stopped_rotation_threshold: float) -> bool:
-        """ Check if the difference between the two given poses per object is smaller than the configured threshold.
+    def get_pose_arrays(objects: List[bpy.types.Object]) -> Tuple[np.ndarray, np.ndarray]:
+        """ Returns the world locations and rotation matrices of the given objects in the current frame.
 
-        :param last_poses: Dict of form {obj_name:{'location':[x, y, z], 'rotation':[x_rot, y_rot, z_rot]}}.
-        :param new_poses: Dict of form {obj_name:{'location':[x, y, z], 'rotation':[x_rot, y_rot, z_rot]}}.
-        :param object_stopped_location_threshold: The maximum difference per second and per coordinate in the rotation
-                                                  Euler vector that is allowed such that an object is still recognized
-                                                  as 'stopped moving'.
-        :param object_stopped_rotation_threshold: The maximum difference per second and per coordinate in the rotation
-                                                  Euler vector that is allowed such that an object is still recognized
-                                                  as 'stopped moving'.
-        :return: True, if no objects are moving anymore.
+        :param objects: The objects.
+        :return: The locations with shape [N, 3] and the rotation matrices with shape [N, 3, 3].
         """
-        stopped = True
-        for obj_name in last_poses:
-            # Check location difference
-            location_diff = last_poses[obj_name]['location'] - new_poses[obj_name]['location']
-            stopped = stopped and not any(location_diff[i] > object_stopped_location_threshold for i in range(3))
-
-            # Check rotation difference
-            rotation_diff = last_poses[obj_name]['rotation'] - new_poses[obj_name]['rotation']
-            stopped = stopped and not any(rotation_diff[i] > object_stopped_rotation_threshold for i in range(3))
+        locations = np.array([obj.matrix_world.translation for obj in objects]).reshape(-1, 3)
+        rotations = np.array([obj.matrix_world.to_3x3().normalized() for obj in objects]).reshape(-1, 3, 3)
+        return locations, rotations
 
-            if not stopped:
-                break
-
-        return stopped
+    @staticmethod
+    def get_moving_objects(old_locations: np.ndarray, old_rotations: np.ndarray, new_locations: np.ndarray,
+                           new_rotations: np.ndarray, object_stopped_location_threshold: float,
+                           object_stopped_rotation_threshold: float) -> np.ndarray:
+        """ Checks for all objects at once, if the difference between their two given poses is bigger than the
+        configured threshold.
+
+        The rotations are compared via the angle of the rotation between them, so that euler angles, which wrap
+        around at +-pi, or different euler angles of the same rotation do not count as movement.
+
+        :param old_locations: The locations of all objects one second before, with shape [N, 3].
+        :param old_rotations: The rotation matrices of all objects one second before, with shape [N, 3, 3].
+        :param new_locations: The current locations of all objects, with shape [N, 3].
+        :param new_rotations: The current rotation matrices of all objects, with shape [N, 3, 3].
+        :param object_stopped_location_threshold: The maximum difference per second and per coordinate in the location
+                                                  that is allowed such that an object is still recognized as
+                                                  'stopped moving'.
+        :param object_stopped_rotation_threshold: The maximum rotation angle per second that is allowed such that an
+                                                  object is still recognized as 'stopped moving'.
+        :return: A boolean mask of shape [N], which is True for all objects which are still moving.
+        """
+        location_moving = np.any(np.abs(new_locations - old_locations) > object_stopped_location_threshold, axis=1)
+        # the frobenius norm of the difference of two rotation matrices is 2 * sqrt(2) * sin(angle / 2), which is
+        # more precise for small angles than the arccos of the trace
+        distances = np.linalg.norm((new_rotations - old_rotations).reshape(-1, 9), axis=1)
+        angles = 2 * np.arcsin(np.clip(distances / (2 * np.sqrt(2)), 0, 1))
+        rotation_moving = angles > object_stopped_rotation_threshold
+        return location_moving | rotation_moving
@@ -1,6 +1,8 @@
 """A set of function to post process the produced images."""
 
-from typing import Union, List, Optional, Dict, Any
+from collections.abc import Sequence
+from concurrent.futures import ThreadPoolExecutor
+from typing import Union, List, Optional, Dict, Any, Tuple
 
 import numpy as np
 import bpy
@@ -12,106 +14,131 @@
 from blenderproc.python.utility.BlenderUtility import get_all_blender_mesh_objects
 
 
-def dist2depth(dist: Union[List[np.ndarray], np.ndarray]) -> Union[List[np.ndarray], np.ndarray]:
+def dist2depth(dist: Union[List[np.ndarray], np.ndarray], K: Optional[np.ndarray] = None,
+               dtype: Optional[type] = None) -> Union[List[np.ndarray], np.ndarray]:
     """
-    Maps a distance image to depth image, also works with a list of images.
+    Maps a distance image to depth image, also works with a list of images or a stack of images with shape [N, H, W].
 
     :param dist: The distance data.
-    :return: The depth data
+    :param K: The intrinsics of the camera, if None is given the intrinsics of the current camera are used.
+    :param dtype: The data type of the returned depth, e.g. np.float32. If None is given, float64 is used.
+    :return: The depth data with preserved input type
     """
 
     dist = trim_redundant_channels(dist)
 
-    if isinstance(dist, list) or hasattr(dist, "shape") and len(dist.shape) > 2:
-        return [dist2depth(img) for img in dist]
+    if isinstance(dist, Sequence):
+        return [dist2depth(img, K, dtype) for img in dist]
 
-    K = CameraUtility.get_intrinsics_as_K_matrix()
-    f, cx, cy = K[0, 0], K[0, 2], K[1, 2]
-
-    xs, ys = np.meshgrid(np.arange(dist.shape[1]), np.arange(dist.shape[0]))
-
-    # coordinate distances to principal point
-    x_opt = np.abs(xs - cx)
-    y_opt = np.abs(ys - cy)
+    if K is None:
+        K = CameraUtility.get_intrinsics_as_K_matrix()
+    ray_norm_factors = _PostProcessingUtility.get_ray_norm_factors(K, dist.shape[-2], dist.shape[-1], dtype)
 
     # Solve 3 equations in Wolfram Alpha:
     # Solve[{X == (x-c0)/f0*Z, Y == (y-c1)/f0*Z, X*X + Y*Y + Z*Z = d*d}, {X,Y,Z}]
-    depth = dist * f / np.sqrt(x_opt ** 2 + y_opt ** 2 + f ** 2)
-
-    return depth
+    return np.divide(dist, ray_norm_factors, dtype=ray_norm_factors.dtype)
 
 
-def depth2dist(depth: Union[List[np.ndarray], np.ndarray]) -> Union[List[np.ndarray], np.ndarray]:
+def depth2dist(depth: Union[List[np.ndarray], np.ndarray], K: Optional[np.ndarray] = None,
+               dtype: Optional[type] = None) -> Union[List[np.ndarray], np.ndarray]:
     """
-    Maps a depth image to distance image, also works with a list of images.
+    Maps a depth image to distance image, also works with a list of images or a stack of images with shape [N, H, W].
 
     :param depth: The depth data.
-    :return: The distance data
+    :param K: The intrinsics of the camera, if None is given the intrinsics of the current camera are used.
+    :param dtype: The data type of the returned distance, e.g. np.float32. If None is given, float64 is used.
+    :return: The distance data with preserved input type
     """
 
     depth = trim_redundant_channels(depth)
 
-    if isinstance(depth, list) or hasattr(depth, "shape") and len(depth.shape) > 2:
-        return [depth2dist(img) for img in depth]
+    if isinstance(depth, Sequence):
+        return [depth2dist(img, K, dtype) for img in depth]
 
-    K = CameraUtility.get_intrinsics_as_K_matrix()
-    f, cx, cy = K[0, 0], K[0, 2], K[1, 2]
-
-    xs, ys = np.meshgrid(np.arange(depth.shape[1]), np.arange(depth.shape[0]))
-
-    # coordinate distances to principal point
-    x_opt = np.abs(xs - cx)
-    y_opt = np.abs(ys - cy)
+    if K is None:
+        K = CameraUtility.get_intrinsics_as_K_matrix()
+    ray_norm_factors = _PostProcessingUtility.get_ray_norm_factors(K, depth.shape[-2], depth.shape[-1], dtype)
 
     # Solve 3 equations in Wolfram Alpha:
     # Solve[{X == (x-c0)/f0*Z, Y == (y-c1)/f0*Z, X*X + Y*Y + Z*Z = d*d}, {X,Y,Z}]
-    dist = depth * np.sqrt(x_opt ** 2 + y_opt ** 2 + f ** 2) / f
-
-    return dist
+    return np.multiply(depth, ray_norm_factors, dtype=ray_norm_factors.dtype)
 
 
-def remove_segmap_noise(image: Union[list, np.ndarray]) -> Union[list, np.ndarray]:
+def remove_segmap_noise(image: Union[list, np.ndarray], num_threads: int = 1) -> Union[list, np.ndarray]:
     """
     A function that takes an image and a few 2D indices, where these indices correspond to pixel values in
     segmentation maps, where these values are not real labels, but some deviations from the real labels, that were
     generated as a result of Blender doing some interpolation, smoothing, or other numerical operations.
 
+    Each noisy pixel is set to the smallest value of its 3x3 neighbors, where the noisy pixels are processed in
+    row-major order, such that already denoised neighbors contribute their new value.
+
     Assumes that noise pixel values won't occur more than 100 times.
 
     :param image: ndarray of the .exr segmap
+    :param num_threads: The number of threads, which denoise the images of a list in parallel. Threads are used
+                        instead of processes, as forking blender can deadlock and numpy releases the GIL.
     :return: The denoised segmap image
     """
 
     if isinstance(image, list) or hasattr(image, "shape") and len(image.shape) > 3:
-        return [remove_segmap_noise(img) for img in image]
+        images = list(image)
+        if num_threads > 1 and len(images) > 1:
+            with ThreadPoolExecutor(max_workers=min(num_threads, len(images))) as executor:
+                return list(executor.map(remove_segmap_noise, images))
+        return [remove_segmap_noise(img) for img in images]
 
     noise_indices = _PostProcessingUtility.determine_noisy_pixels(image)
-
-    for index in noise_indices:
-        neighbors = _PostProcessingUtility.get_pixel_neighbors(image, index[0], index[
-            1])  # Extracting the indices surrounding 3x3 neighbors
-        curr_val = image[index[0]][index[1]][0]  # Current value of the noisy pixel
-
-        neighbor_vals = [image[neighbor[0]][neighbor[1]] for neighbor in
-                         neighbors]  # Getting the values of the neighbors
-        # Getting the unique values only
-        neighbor_vals = np.unique(np.array([np.array(index) for index in neighbor_vals]))
-
-        min_val = 10000000000
-        min_idx = 0
-
-        # Here we iterate through the unique values of the neighbor and find the one closest to the current noisy value
-        for idx, n in enumerate(neighbor_vals):
-            # Is this closer than the current closest value?
-            if n - curr_val <= min_val:
-                # If so, update
-                min_val = n - curr_val
-                min_idx = idx
-
-        # Now that we have found the closest value, assign it to the noisy value
-        new_val = neighbor_vals[min_idx]
-        image[index[0]][index[1]] = np.array([new_val, new_val, new_val])
-
+    noisy = np.zeros(image.shape[:2], dtype=bool)
+    noisy[noise_indices[:, 0], noise_indices[:, 1]] = True
+    rows, cols = np.nonzero(noisy)
+    if len(rows) == 0:
+        return image
+
+    # The smallest value over all channels of the neighbors, noisy neighbors before the pixel in row-major order
+    # are left out, as they are denoised before the pixel
+    pixel_min = image.min(axis=2) if image.ndim == 3 else image
+    neighbor_min = np.full(rows.shape, np.inf)
+    earlier_neighbors = []
+    noisy_index = np.full(image.shape[:2], -1)
+    noisy_index[rows, cols] = np.arange(len(rows))
+    for p in range(-1, 2):
+        for q in range(-1, 2):
+            if p == 0 and q == 0:
+                continue
+            n_rows, n_cols = rows + p, cols + q
+            valid = (n_rows >= 0) & (n_rows < image.shape[0]) & (n_cols >= 0) & (n_cols < image.shape[1])
+            n_rows, n_cols = np.where(valid, n_rows, 0), np.where(valid, n_cols, 0)
+            earlier = p < 0 or (p == 0 and q < 0)
+            if earlier:
+                earlier_neighbors.append(np.where(valid, noisy_index[n_rows, n_cols], -1))
+                valid &= ~noisy[n_rows, n_cols]
+            neighbor_min = np.where(valid, np.minimum(neighbor_min, pixel_min[n_rows, n_cols]), neighbor_min)
+    # the three neighbors in the row above and the left neighbor
+    upper_neighbors = np.stack(earlier_neighbors[:3], axis=1)
+    has_left_neighbor = earlier_neighbors[3] >= 0
+
+    # The new values are minima of the neighbor_min values, so they are propagated as integer ranks
+    values, ranks = np.unique(neighbor_min, return_inverse=True)
+    ranks = ranks.reshape(-1)
+    no_rank = len(values)
+    # Resolve the chains of noisy pixels in a single pass over the rows: the noisy pixels in the row above are
+    # final, the runs of noisy pixels within a row are resolved by a cumulative minimum, which restarts at each run
+    row_starts = np.flatnonzero(np.diff(rows, prepend=-1))
+    row_ends = np.append(row_starts[1:], len(rows))
+    for begin, end in zip(row_starts, row_ends):
+        upper = upper_neighbors[begin:end]
+        upper_ranks = np.where(upper >= 0, ranks[upper], no_rank).min(axis=1)
+        row_ranks = np.minimum(ranks[begin:end], upper_ranks)
+        # offsetting each run below all previous ones makes the cumulative minimum restart at the run
+        run_offsets = np.cumsum(~has_left_neighbor[begin:end]) * (no_rank + 1)
+        ranks[begin:end] = np.minimum.accumulate(row_ranks - run_offsets) + run_offsets
+    new_vals = values[ranks]
+
+    if image.ndim == 3:
+        image[rows, cols] = new_vals[:, np.newaxis]
+    else:
+        image[rows, cols] = new_vals
     return image
 
 
@@ -130,7 +157,7 @@ def oil_paint_filter(image: Union[list, np.ndarray], filter_size: int = 5, edges
     """
 
     if rgb:
-        if isinstance(image, list) or hasattr(image, "shape") and len(image.shape) > 3:
+        if isinstance(image, Sequence) or hasattr(image, "shape") and len(image.shape) > 3:
             return [oil_paint_filter(img, filter_size, edges_only, rgb) for img in image]
 
         intensity_img = np.sum(image, axis=2) / 3.0
@@ -156,7 +183,7 @@ def oil_paint_filter(image: Union[list, np.ndarray], filter_size: int = 5, edges
             filtered_img = image
     else:
         image = trim_redundant_channels(image)
-        if isinstance(image, list) or hasattr(image, "shape") and len(image.shape) > 2:
+        if isinstance(image, Sequence) or hasattr(image, "shape") and len(image.shape) > 2:
             return [oil_paint_filter(img, filter_size, edges_only, rgb) for img in image]
 
         if len(image.shape) == 3 and image.shape[2] > 1:
@@ -195,7 +222,7 @@ def add_kinect_azure_noise(depth: Union[list, np.ndarray], color: Optional[Union
     :return: Noisy depth image(s)
     """
 
-    if isinstance(depth, list) or hasattr(depth, "shape") and len(depth.shape) > 2:
+    if isinstance(depth, Sequence) or hasattr(depth, "shape") and len(depth.shape) > 2:
         if color is None:
             color = len(depth) * [None]
         assert len(color) == len(depth), "Enter same number of depth and color images"
@@ -235,7 +262,7 @@ def add_gaussian_shifts(image: Union[list, np.ndarray], std: float = 0.5) -> Uni
     :return: Augmented images
     """
 
-    if isinstance(image, list) or hasattr(image, "shape") and len(image.shape) > 2:
+    if isinstance(image, Sequence) or hasattr(image, "shape") and len(image.shape) > 2:
         return [add_gaussian_shifts(img, std=std) for img in image]
 
     rows, cols = image.shape
@@ -269,7 +296,7 @@ def trim_redundant_channels(image: Union[list, np.ndarray]) -> Union[list, np.nd
     :return: The trimmed image data with preserved input type
     """
 
-    if isinstance(image, list):
+    if isinstance(image, Sequence):
         return [trim_redundant_channels(ele) for ele in image]
 
     if hasattr(image, "shape") and len(image.shape) > 3:
@@ -281,6 +308,30 @@ def trim_redundant_channels(image: Union[list, np.ndarray]) -> Union[list, np.nd
     return image
 
 
+def vector_field_to_optical_flow(vector_field: Union[list, np.ndarray], direction: str,
+                                 blender_image_coordinate_style: bool = False) -> Union[list, np.ndarray]:
+    """
+    Converts the speed vectors written by `enable_optical_flow_output` to the optical flow. The written images
+    contain the speed vectors of one direction in their first two channels. This also works on a list of images.
+
+    :param vector_field: The speed vectors of one direction.
+    :param direction: The direction of the flow, either "forward" or "backward".
+    :param blender_image_coordinate_style: Whether to specify the image coordinate system at the bottom left
+                                           (blender default; True) or top left (standard convention; False).
+    :return: The optical flow with two channels with preserved input type
+    """
+    if isinstance(vector_field, Sequence):
+        return [vector_field_to_optical_flow(ele, direction, blender_image_coordinate_style) for ele in vector_field]
+
+    flow = np.array(vector_field[..., :2], dtype=np.float32)
+    if not blender_image_coordinate_style:
+        flow[..., 1] *= -1
+    if direction == "forward":
+        # invert forward flow to point at next frame
+        flow *= -1
+    return flow
+
+
 def segmentation_mapping(image: Union[List[np.ndarray], np.ndarray],
                          map_by: Union[str, List[str]],
                          default_values: Optional[Dict[str, int]]) \
@@ -316,8 +367,8 @@ def segmentation_mapping(image: Union[List[np.ndarray], np.ndarray],
         # add stereo case and make a list out of it
         image = np.array(image)[np.newaxis, np.newaxis, :, :]
 
-    # convert to int, to avoid rounding errors
-    image = np.array(image).astype(np.int64)
+    # the pass indices are stored as floats, round them to get the exact integer ids
+    image = np.rint(np.array(image)).astype(np.int64)
 
     # convert map by to a list
     if not isinstance(map_by, list):
@@ -438,6 +489,42 @@ def segmentation_mapping(image: Union[List[np.ndarray], np.ndarray],
 
 class _PostProcessingUtility:
 
+    # The ray norm factors of the most recently used intrinsics and resolutions
+    ray_norm_factor_cache: Dict[Tuple[float, float, float, int, int, str], np.ndarray] = {}
+    ray_norm_factor_cache_size = 8
+
+    @staticmethod
+    def get_ray_norm_factors(K: np.ndarray, height: int, width: int, dtype: Optional[type] = None) -> np.ndarray:
+        """ Returns the ratio between the distance and the depth for every pixel, which only depends on the
+        intrinsics and the resolution. The factors are cached, so they are only computed once per camera.
+
+        :param K: The intrinsics of the camera.
+        :param height: The height of the image in pixels.
+        :param width: The width of the image in pixels.
+        :param dtype: The data type of the factors, if None is given float64 is used.
+        :return: The read-only factors with shape [height, width].
+        """
+        dtype = np.dtype(np.float64 if dtype is None else dtype)
+        f, cx, cy = float(K[0, 0]), float(K[0, 2]), float(K[1, 2])
+        key = (f, cx, cy, int(height), int(width), dtype.str)
+
+        cache = _PostProcessingUtility.ray_norm_factor_cache
+        if key in cache:
+            # move the entry to the end, so the least recently used entry is removed first
+            cache[key] = cache.pop(key)
+            return cache[key]
+
+        # coordinate distances to principal point
+        x_opt = np.arange(width) - cx
+        y_opt = np.arange(height) - cy
+        factors = (np.sqrt(x_opt[np.newaxis, :] ** 2 + y_opt[:, np.newaxis] ** 2 + f ** 2) / f).astype(dtype)
+        factors.setflags(write=False)
+
+        if len(cache) >= _PostProcessingUtility.ray_norm_factor_cache_size:
+            del cache[next(iter(cache))]
+        cache[key] = factors
+        return factors
+
     @staticmethod
     def get_pixel_neighbors(data: np.ndarray, i: int, j: int) -> np.ndarray:
         """ Returns the valid neighbor pixel indices of the given pixel.
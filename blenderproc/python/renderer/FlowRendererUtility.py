@@ -1,12 +1,13 @@
 """Provides functionality to render an optical flow image."""
 
 import os
-from typing import Dict, List, Union
+from typing import Dict, List, Optional, Union
 
 import bpy
 import numpy as np
 
 from blenderproc.python.utility.BlenderUtility import load_image
+from blenderproc.python.postprocessing.PostProcessingUtility import vector_field_to_optical_flow
 from blenderproc.python.renderer import RendererUtility
 from blenderproc.python.utility.Utility import Utility, UndoAfterExecution
 from blenderproc.python.writer.WriterUtility import _WriterUtility
@@ -66,24 +67,20 @@ def render_optical_flow(output_dir: str = None, temp_dir: str = None, get_forwar
             # temporarily save respective vector fields
             if get_forward_flow:
                 file_path = temporary_fwd_flow_file_path + f"{frame:04d}" + ".exr"
-                fwd_flow_field = load_image(file_path, num_channels=4).astype(np.float32)
-
-                if not blender_image_coordinate_style:
-                    fwd_flow_field[:, :, 1] = fwd_flow_field[:, :, 1] * -1
+                fwd_flow_field = load_image(file_path, num_channels=4)
+                forward_flow = vector_field_to_optical_flow(fwd_flow_field, "forward", blender_image_coordinate_style)
 
                 file_name = os.path.join(output_dir, forward_flow_output_file_prefix) + f"{frame:04d}"
-                forward_flow = fwd_flow_field * -1  # invert forward flow to point at next frame
-                np.save(file_name + '.npy', forward_flow[:, :, :2])
+                np.save(file_name + '.npy', forward_flow)
 
             if get_backward_flow:
                 file_path = temporary_bwd_flow_file_path + f"{frame:04d}" + ".exr"
-                bwd_flow_field = load_image(file_path, num_channels=4).astype(np.float32)
-
-                if not blender_image_coordinate_style:
-                    bwd_flow_field[:, :, 1] = bwd_flow_field[:, :, 1] * -1
+                bwd_flow_field = load_image(file_path, num_channels=4)
+                backward_flow = vector_field_to_optical_flow(bwd_flow_field, "backward",
+                                                             blender_image_coordinate_style)
 
                 file_name = os.path.join(output_dir, backward_flow_output_file_prefix) + f"{frame:04d}"
-                np.save(file_name + '.npy', bwd_flow_field[:, :, :2])
+                np.save(file_name + '.npy', backward_flow)
 
     load_keys = set()
     # register desired outputs
@@ -97,15 +94,73 @@ def render_optical_flow(output_dir: str = None, temp_dir: str = None, get_forwar
     return _WriterUtility.load_registered_outputs(load_keys) if return_data else {}
 
 
+def enable_optical_flow_output(get_forward_flow: bool = True, get_backward_flow: bool = True,
+                               blender_image_coordinate_style: bool = False, output_dir: Optional[str] = None,
+                               forward_flow_output_file_prefix: str = "forward_flow_",
+                               forward_flow_output_key: str = "forward_flow",
+                               backward_flow_output_file_prefix: str = "backward_flow_",
+                               backward_flow_output_key: str = "backward_flow"):
+    """ Enables writing the optical flow (forward and backward) during the next rendering.
+
+    In contrast to `render_optical_flow`, no additional render call is necessary, the flow is written in the same
+    render call as the color images and returned by `bproc.renderer.render()`. As the vector pass of blender is not
+    available with motion blur, motion blur has to be disabled. As the vector pass is averaged over all samples like
+    the color image, the flow at object borders is a blend of the motions of both sides, a warning is shown when
+    rendering with more than one sample. `render_optical_flow` renders with a single sample and therefore has sharp
+    borders.
+
+    :param get_forward_flow: Whether to write forward optical flow.
+    :param get_backward_flow: Whether to write backward optical flow.
+    :param blender_image_coordinate_style: Whether to specify the image coordinate system at the bottom left
+                                           (blender default; True) or top left (standard convention; False).
+    :param output_dir: The directory to write files to, if this is None the temporary directory is used.
+    :param forward_flow_output_file_prefix: The file prefix that should be used when writing forward flow to a file.
+    :param forward_flow_output_key: The key which should be used for storing forward optical flow values.
+    :param backward_flow_output_file_prefix: The file prefix that should be used when writing backward flow to a file.
+    :param backward_flow_output_key: The key which should be used for storing backward optical flow values.
+    """
+    if get_forward_flow is False and get_backward_flow is False:
+        raise RuntimeError("At least one of forward and backward flow has to be enabled.")
+    if bpy.context.scene.render.use_motion_blur:
+        raise RuntimeError("The optical flow can not be written during the rendering, if motion blur is enabled. "
+                           "Use bproc.renderer.render_optical_flow() instead.")
+
+    if output_dir is None:
+        output_dir = Utility.get_temporary_directory()
+
+    _FlowRendererUtility.output_vector_field(get_forward_flow, get_backward_flow, output_dir,
+                                             forward_flow_output_file_prefix, backward_flow_output_file_prefix)
+
+    if get_forward_flow:
+        Utility.add_output_entry({
+            "key": forward_flow_output_key,
+            "path": os.path.join(output_dir, forward_flow_output_file_prefix) + "%04d" + ".exr",
+            "version": "3.0.0",
+            "optical_flow_direction": "forward",
+            "blender_image_coordinate_style": blender_image_coordinate_style
+        })
+    if get_backward_flow:
+        Utility.add_output_entry({
+            "key": backward_flow_output_key,
+            "path": os.path.join(output_dir, backward_flow_output_file_prefix) + "%04d" + ".exr",
+            "version": "3.0.0",
+            "optical_flow_direction": "backward",
+            "blender_image_coordinate_style": blender_image_coordinate_style
+        })
+
+
 class _FlowRendererUtility():
 
     @staticmethod
-    def output_vector_field(forward_flow: bool, backward_flow: bool, output_dir: str):
+    def output_vector_field(forward_flow: bool, backward_flow: bool, output_dir: str,
+                            forward_flow_file_prefix: str = "fwd_flow_", backward_flow_file_prefix: str = "bwd_flow_"):
         """ Configures compositor to output speed vectors.
 
         :param forward_flow: Whether to render forward optical flow.
         :param backward_flow: Whether to render backward optical flow.
         :param output_dir: The directory to write images to.
+        :param forward_flow_file_prefix: The file prefix of the forward speed vectors.
+        :param backward_flow_file_prefix: The file prefix of the backward speed vectors.
         """
 
         # Flow settings (is called "vector" in blender)
@@ -130,7 +185,7 @@ def output_vector_field(forward_flow: bool, backward_flow: bool, output_dir: str
             fwd_flow_output_file = tree.nodes.new('CompositorNodeOutputFile')
             fwd_flow_output_file.base_path = output_dir
             fwd_flow_output_file.format.file_format = "OPEN_EXR"
-            fwd_flow_output_file.file_slots.values()[0].path = "fwd_flow_"
+            fwd_flow_output_file.file_slots.values()[0].path = forward_flow_file_prefix
             links.new(combine_fwd_flow.outputs['Image'], fwd_flow_output_file.inputs['Image'])
 
         if backward_flow:
@@ -141,5 +196,5 @@ def output_vector_field(forward_flow: bool, backward_flow: bool, output_dir: str
             bwd_flow_output_file = tree.nodes.new('CompositorNodeOutputFile')
             bwd_flow_output_file.base_path = output_dir
             bwd_flow_output_file.format.file_format = "OPEN_EXR"
-            bwd_flow_output_file.file_slots.values()[0].path = "bwd_flow_"
+            bwd_flow_output_file.file_slots.values()[0].path = backward_flow_file_prefix
             links.new(combine_bwd_flow.outputs['Image'], bwd_flow_output_file.inputs['Image'])
@@ -1,6 +1,7 @@
 """Provides functionality to render a Normalized Object Coordinate Space (NOCS) image."""
 
-from typing import Optional, Dict, List
+import os
+from typing import Optional, Dict, List, Tuple
 
 import bpy
 import numpy as np
@@ -62,8 +63,121 @@ def render_nocs(output_dir: Optional[str] = None, file_prefix: str = "nocs_", ou
                                       return_data=return_data, keys_with_alpha_channel={output_key}, verbose=verbose)
 
 
+def enable_nocs_output(output_dir: Optional[str] = None, file_prefix: str = "nocs_", output_key: str = "nocs"):
+    """ Enables writing the Normalized Object Coordinate Space (NOCS) during the next rendering.
+
+    In contrast to `render_nocs`, no additional render call is necessary, the NOCS are written via a shader AOV in
+    the same render call as the color images and returned by `bproc.renderer.render()`. For this an AOV output is
+    added to the materials of all objects during each rendering and removed afterwards. Objects without any material
+    and the background are written as zero. As the AOV is sampled like the color image, the coordinates are blended
+    at object borders.
+
+    :param output_dir: The directory to write files to, if this is None the temporary directory is used.
+    :param file_prefix: The prefix to use for writing the files.
+    :param output_key: The key to use for registering the NOCS output.
+    """
+    if output_dir is None:
+        output_dir = Utility.get_temporary_directory()
+
+    view_layer = bpy.context.view_layer
+    if _NOCSRendererUtility.aov_name not in view_layer.aovs:
+        aov = view_layer.aovs.add()
+        aov.name = _NOCSRendererUtility.aov_name
+        aov.type = "COLOR"
+
+    bpy.context.scene.render.use_compositing = True
+    bpy.context.scene.use_nodes = True
+    tree = bpy.context.scene.node_tree
+    links = tree.links
+    render_layer_node = Utility.get_the_one_node_with_type(tree.nodes, 'CompositorNodeRLayers')
+
+    output_file = tree.nodes.new("CompositorNodeOutputFile")
+    output_file.base_path = output_dir
+    output_file.format.file_format = "OPEN_EXR"
+    output_file.file_slots.values()[0].path = file_prefix
+    links.new(render_layer_node.outputs[_NOCSRendererUtility.aov_name], output_file.inputs["Image"])
+
+    Utility.add_output_entry({
+        "key": output_key,
+        "path": os.path.join(output_dir, file_prefix) + "%04d" + ".exr",
+        "version": "3.0.0",
+        "is_nocs_aov": True
+    })
+
+
 class _NOCSRendererUtility:
 
+    # the name of the AOV used by `enable_nocs_output`
+    aov_name = "nocs"
+
+    @staticmethod
+    def add_nocs_aov_outputs() -> List[Tuple[bpy.types.NodeTree, bpy.types.Node]]:
+        """ Adds an AOV output, which writes the NOCS, to all materials of all mesh objects, which do not have one yet.
+
+        :return: The added nodes together with the node tree of their material, see `remove_nodes`.
+        """
+        added_nodes = []
+        for obj in get_all_blender_mesh_objects():
+            for material_slot in obj.material_slots:
+                material = material_slot.material
+                if material is None or material.node_tree is None:
+                    continue
+                nodes = material.node_tree.nodes
+                if any(node.bl_idname == "ShaderNodeOutputAOV" and
+                       _NOCSRendererUtility.get_aov_name(node) == _NOCSRendererUtility.aov_name for node in nodes):
+                    continue
+
+                tex_coords_node = nodes.new("ShaderNodeTexCoord")
+                # Scale [-1, 1] to [-0.5, 0.5]
+                scale_node = nodes.new("ShaderNodeVectorMath")
+                scale_node.operation = "SCALE"
+                scale_node.inputs[3].default_value = 0.5
+                # Move [-0.5, 0.5] to [0, 1]
+                add_node = nodes.new("ShaderNodeVectorMath")
+                add_node.operation = "ADD"
+                add_node.inputs[1].default_value = [0.5, 0.5, 0.5]
+                aov_node = nodes.new("ShaderNodeOutputAOV")
+                _NOCSRendererUtility.set_aov_name(aov_node, _NOCSRendererUtility.aov_name)
+
+                links = material.node_tree.links
+                links.new(tex_coords_node.outputs["Object"], scale_node.inputs[0])
+                links.new(scale_node.outputs["Vector"], add_node.inputs[0])
+                links.new(add_node.outputs["Vector"], aov_node.inputs["Color"])
+                added_nodes += [(material.node_tree, node)
+                                for node in [tex_coords_node, scale_node, add_node, aov_node]]
+        return added_nodes
+
+    @staticmethod
+    def remove_nodes(nodes: List[Tuple[bpy.types.NodeTree, bpy.types.Node]]):
+        """ Removes the nodes added by `add_nocs_aov_outputs` from their node trees again.
+
+        :param nodes: The nodes together with their node tree.
+        """
+        for node_tree, node in nodes:
+            node_tree.nodes.remove(node)
+
+    @staticmethod
+    def get_aov_name(aov_node: bpy.types.Node) -> str:
+        """ Returns the name of the AOV, the given AOV output node writes to.
+
+        :param aov_node: The AOV output node.
+        :return: The name of the AOV.
+        """
+        # newer blender versions renamed the property, as it shadowed the name of the node
+        return aov_node.aov_name if hasattr(aov_node, "aov_name") else aov_node.name
+
+    @staticmethod
+    def set_aov_name(aov_node: bpy.types.Node, name: str):
+        """ Sets the name of the AOV, the given AOV output node writes to.
+
+        :param aov_node: The AOV output node.
+        :param name: The name of the AOV.
+        """
+        if hasattr(aov_node, "aov_name"):
+            aov_node.aov_name = name
+        else:
+            aov_node.name = name
+
     @staticmethod
     def create_nocs_material() -> Material:
         """ Creates the material which visualizes the NOCS.
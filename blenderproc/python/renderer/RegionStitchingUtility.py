@@ -0,0 +1,134 @@
+""" Splits images into regions, which can be rendered separately, and stitches the rendered regions together again.
+Does not depend on blender. """
+
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+def split_into_regions(width: int, height: int, num_columns: int, num_rows: int) -> List[Tuple[int, int, int, int]]:
+    """ Splits an image into a grid of regions, which can be rendered via `bproc.renderer.set_render_region`.
+
+    :param width: The width of the image in pixels.
+    :param height: The height of the image in pixels.
+    :param num_columns: The number of regions along the x-axis.
+    :param num_rows: The number of regions along the y-axis.
+    :return: The regions as (x_min, y_min, x_max, y_max) in pixels, where the maximum is exclusive and the origin is
+             at the top left.
+    """
+    if not 0 < num_columns <= width or not 0 < num_rows <= height:
+        raise ValueError(f"An image of {width}x{height} pixels can not be split into {num_columns}x{num_rows} "
+                         f"regions.")
+    xs = np.linspace(0, width, num_columns + 1).round().astype(int)
+    ys = np.linspace(0, height, num_rows + 1).round().astype(int)
+    return [(int(xs[column]), int(ys[row]), int(xs[column + 1]), int(ys[row + 1]))
+            for row in range(num_rows) for column in range(num_columns)]
+
+
+def stitch_render_regions(region_data: List[Dict[str, Sequence[Any]]]) -> Dict[str, List[Any]]:
+    """ Stitches the outputs of several render calls, which rendered different regions of the same frames.
+
+    Each of the given dicts has to be returned by `bproc.renderer.render` after calling
+    `bproc.renderer.set_render_region`, such that it contains the key "render_region".
+
+    :param region_data: The returned data of each region.
+    :return: The data of the whole images, in the same format as returned by `bproc.renderer.render`.
+    """
+    if not region_data:
+        raise ValueError("There are no regions to stitch.")
+    num_frames = len(region_data[0]["render_region"])
+    stitched_data: Dict[str, List[Any]] = {}
+    for frame_index in range(num_frames):
+        frame_regions = [{key: values[frame_index] for key, values in data.items()} for data in region_data]
+        for key, value in stitch_frame_regions(frame_regions).items():
+            stitched_data.setdefault(key, []).append(value)
+    return stitched_data
+
+
+def stitch_frame_regions(frame_regions: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """ Stitches the data of different regions of a single frame.
+
+    The images are placed at their region, where the regions may have been cropped or not. Instance attribute maps
+    are merged and all other entries are taken from the first region.
+
+    :param frame_regions: Maps each key to its value for one frame, per region. Each of them has to contain the key
+                          "render_region", which is set by `bproc.renderer.render`.
+    :return: Maps each key to the value of the whole image.
+    """
+    regions = [np.asarray(frame_region["render_region"]).astype(int) for frame_region in frame_regions]
+    width, height = regions[0][4], regions[0][5]
+    if any(region[4] != width or region[5] != height for region in regions):
+        raise ValueError("The regions to stitch have been rendered with different resolutions.")
+
+    stitched: Dict[str, Any] = {}
+    for key in frame_regions[0]:
+        if key == "render_region":
+            continue
+        values = [frame_region[key] for frame_region in frame_regions]
+        if key == "instance_attribute_maps":
+            stitched[key] = _merge_instance_attribute_maps(values)
+            continue
+        image_axes = [_get_image_axis(value, region, width, height) for value, region in zip(values, regions)]
+        if all(axis is not None for axis in image_axes):
+            stitched[key] = _stitch_images(values, regions, image_axes, width, height)
+        else:
+            stitched[key] = values[0]
+    return stitched
+
+
+def _get_image_axis(value: Any, region: np.ndarray, width: int, height: int) -> Optional[int]:
+    """ Determines at which axis the image dimensions of the given value start.
+
+    :param value: The value of one key in one region.
+    :param region: The render region (x_min, y_min, x_max, y_max, width, height).
+    :param width: The width of the whole image.
+    :param height: The height of the whole image.
+    :return: 0 for a single image, 1 for a stereo pair and None, if the value is not an image of the region.
+    """
+    if not isinstance(value, np.ndarray):
+        return None
+    region_shape = (region[3] - region[1], region[2] - region[0])
+    for axis in [0, 1]:
+        if value.ndim >= axis + 2 and value.shape[axis:axis + 2] in [region_shape, (height, width)]:
+            return axis
+    return None
+
+
+def _stitch_images(values: List[np.ndarray], regions: List[np.ndarray], image_axes: List[int], width: int,
+                   height: int) -> np.ndarray:
+    """ Places the images of all regions in one image.
+
+    :param values: The image of each region, either cropped to the region or in full size.
+    :param regions: The render region (x_min, y_min, x_max, y_max, width, height) of each image.
+    :param image_axes: The axis, at which the image dimensions start, for each image.
+    :param width: The width of the whole image.
+    :param height: The height of the whole image.
+    :return: The stitched image, pixels which are not covered by any region are zero.
+    """
+    axis = image_axes[0]
+    shape = values[0].shape[:axis] + (height, width) + values[0].shape[axis + 2:]
+    stitched = np.zeros(shape, dtype=values[0].dtype)
+    for value, region, image_axis in zip(values, regions, image_axes):
+        if image_axis != axis:
+            raise ValueError("Stereo and mono images can not be stitched together.")
+        x_min, y_min, x_max, y_max = region[:4]
+        target = (slice(None),) * axis + (slice(y_min, y_max), slice(x_min, x_max))
+        if value.shape[axis:axis + 2] == (height, width) and (y_max - y_min, x_max - x_min) != (height, width):
+            # the region was not cropped
+            stitched[target] = value[target]
+        else:
+            stitched[target] = value
+    return stitched
+
+
+def _merge_instance_attribute_maps(values: List[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """ Merges the instance attribute maps of all regions, each instance is only listed once.
+
+    :param values: The instance attribute map of each region.
+    :return: The merged instance attribute map, sorted by the instance ids.
+    """
+    instances: Dict[Any, Dict[str, Any]] = {}
+    for attribute_map in values:
+        for instance in attribute_map:
+            instances.setdefault(instance["idx"], instance)
+    return [instances[idx] for idx in sorted(instances)]
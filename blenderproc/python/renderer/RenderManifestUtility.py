@@ -0,0 +1,118 @@
+"""Keeps track of the completely rendered frames, such that an interrupted rendering can be resumed."""
+
+import json
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class RenderManifest:
+    """ An append-only JSON-lines file, which lists all frames whose outputs have been written completely.
+
+    Each render call has its own manifest, whose name contains a key of the render call, which e.g. hashes the
+    camera poses and the frame range, as resuming only makes sense for the same scene. So if a script renders several
+    times into the same output_dir and is interrupted during a later call, the restarted earlier calls do not touch
+    the manifest of the interrupted call. The first line contains the random seed of the run. Each further line
+    marks one frame as complete and lists its files together with their modification times. A line is only appended
+    after all files of the frame have been written, so a frame which was interrupted while being rendered is never
+    marked as complete. A frame only counts as complete, if all of its files still exist and have not been
+    overwritten since, e.g. by another render call which writes to the same files.
+
+    Once a render call has finished, its manifest should be removed via `remove`.
+
+    This module does not depend on blender.
+    """
+
+    def __init__(self, output_dir: str, seed: str, call_key: str):
+        """
+        :param output_dir: The directory in which the manifest is stored.
+        :param seed: The random seed of the run, a manifest of a different seed is not resumed.
+        :param call_key: Identifies the render call, each call has its own manifest.
+        """
+        self.path = os.path.join(output_dir, f"render_manifest_{call_key}.jsonl")
+        self.completed_frames: Dict[int, List[Tuple[str, int]]] = {}
+
+        RenderManifest._remove_incomplete_last_line(self.path)
+        lines = RenderManifest._read_json_lines(self.path)
+        if lines:
+            if lines[0].get("seed") != seed:
+                raise RuntimeError(f"The render manifest {self.path} was written with the random seed "
+                                   f"{lines[0].get('seed')}, but the current seed is {seed}. Resuming only works "
+                                   f"with the same seed, use a different output directory or remove the manifest.")
+            for line in lines[1:]:
+                self.completed_frames[line["frame"]] = [(path, mtime) for path, mtime in line["files"]]
+        else:
+            os.makedirs(output_dir, exist_ok=True)
+            self.remove()
+            self._append({"seed": seed, "call": call_key})
+
+    def is_complete(self, frame: int) -> bool:
+        """ Returns whether the given frame has been rendered completely and all of its files still exist.
+
+        :param frame: The frame number.
+        :return: True, if the frame does not have to be rendered again.
+        """
+        return frame in self.completed_frames and all(mtime is not None and RenderManifest._get_mtime(path) == mtime
+                                                      for path, mtime in self.completed_frames[frame])
+
+    def mark_complete(self, frame: int, files: List[str]):
+        """ Marks the given frame as complete, this should only be called after all of its files were written.
+
+        :param frame: The frame number.
+        :param files: The paths of all files of the frame.
+        """
+        files_with_mtimes = [(path, RenderManifest._get_mtime(path)) for path in files]
+        self._append({"frame": frame, "files": files_with_mtimes})
+        self.completed_frames[frame] = files_with_mtimes
+
+    def remove(self):
+        """ Removes the manifest, this should be called once the render call has finished. """
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self.completed_frames = {}
+
+    def _append(self, entry: Dict[str, Any]):
+        """ Appends the given entry and makes sure it is stored on disk, before returning.
+
+        :param entry: The entry to append.
+        """
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    @staticmethod
+    def _get_mtime(path: str) -> Optional[int]:
+        """ Returns the modification time of the given file, which changes whenever the file is written again.
+
+        :param path: The path to the file.
+        :return: The modification time in nanoseconds or None, if the file does not exist.
+        """
+        try:
+            return os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def _read_json_lines(path: str) -> List[Dict[str, Any]]:
+        """ Reads a JSON-lines file, an incomplete last line is ignored.
+
+        :param path: The path to the file.
+        :return: The parsed lines.
+        """
+        if not os.path.exists(path):
+            return []
+        with open(path, "r", encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.endswith("\n")]
+
+    @staticmethod
+    def _remove_incomplete_last_line(path: str):
+        """ Removes the last line of the file, if it was not completely written, so new lines can be appended.
+
+        :param path: The path to the file.
+        """
+        if not os.path.exists(path):
+            return
+        with open(path, "rb+") as f:
+            content = f.read()
+            if content and not content.endswith(b"\n"):
+                f.truncate(content.rfind(b"\n") + 1)
@@ -0,0 +1,142 @@
+"""Collects the timings of each rendered frame via the render handlers of blender."""
+
+import json
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import bpy
+
+
+class RenderStats:
+    """ The timings and samples of all frames of one render call.
+
+    Each frame is described by a dict with the following keys:
+
+    * `frame`: The frame number.
+    * `sync_time`: The seconds spent on synchronizing the scene with the render engine and building the BVH.
+    * `render_time`: The seconds spent on sampling.
+    * `composite_time`: The seconds spent on compositing, this includes writing the outputs of the compositor.
+    * `write_time`: The seconds spent on writing the rendered image.
+    * `total_time`: The seconds between the start of the frame and the end of writing it.
+    * `samples`: The number of samples, which were reported last by the render engine.
+    * `max_samples`: The maximum number of samples per pixel.
+    * `sample_budget`: Only set by `render_with_sample_budget`, the chosen number of samples and the reason for it.
+    """
+
+    def __init__(self):
+        self.frames: List[Dict[str, Any]] = []
+
+    def total(self, key: str) -> float:
+        """ Returns the sum of the given value over all frames.
+
+        :param key: The key of the value, e.g. "sync_time".
+        :return: The sum over all frames.
+        """
+        return sum(frame[key] for frame in self.frames)
+
+    def write_json_lines(self, path: str):
+        """ Appends one JSON line per frame to the given file.
+
+        :param path: The path of the JSON-lines file.
+        """
+        with open(path, "a", encoding="utf-8") as f:
+            for frame in self.frames:
+                f.write(json.dumps(frame) + "\n")
+
+    def __len__(self) -> int:
+        return len(self.frames)
+
+    def __repr__(self) -> str:
+        return f"RenderStats({len(self.frames)} frames, sync: {self.total('sync_time'):.3f}s, " \
+               f"render: {self.total('render_time'):.3f}s, composite: {self.total('composite_time'):.3f}s, " \
+               f"write: {self.total('write_time'):.3f}s)"
+
+
+class _RenderStatsCollector:
+    """ Fills a `RenderStats` object, while it is registered at the render handlers of blender.
+
+    The phases of a frame are separated by the status messages of the render engine: The synchronization ends with
+    the first reported sample and the sampling ends, when the compositing starts or the frame is finished. The
+    handlers are called by blender for every frame, so there is no need to parse the output of blender.
+    """
+
+    def __init__(self, frame_callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+                 status_callback: Optional[Callable[[int, str], None]] = None):
+        """
+        :param frame_callback: Is called with the stats of each frame, when the frame has been written.
+        :param status_callback: Is called with the current sample and the status of the render engine, whenever
+                                the render engine reports its progress.
+        """
+        self.stats = RenderStats()
+        self._frame_callback = frame_callback
+        self._status_callback = status_callback
+        self._timestamps: Dict[str, float] = {}
+        self._samples = 0
+
+    def __enter__(self) -> "_RenderStatsCollector":
+        bpy.app.handlers.render_pre.append(self._on_render_pre)
+        bpy.app.handlers.render_stats.append(self._on_render_stats)
+        bpy.app.handlers.render_post.append(self._on_render_post)
+        bpy.app.handlers.render_write.append(self._on_render_write)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        bpy.app.handlers.render_pre.remove(self._on_render_pre)
+        bpy.app.handlers.render_stats.remove(self._on_render_stats)
+        bpy.app.handlers.render_post.remove(self._on_render_post)
+        bpy.app.handlers.render_write.remove(self._on_render_write)
+
+    def _on_render_pre(self, *_):
+        """ Called at the start of each frame. """
+        self._timestamps = {"begin": time.perf_counter()}
+        self._samples = 0
+
+    def _on_render_stats(self, stats: str, *_):
+        """ Called whenever the render engine reports its progress.
+
+        :param stats: The status line, e.g. "Fra:1 Mem:... | Time:... | Scene, ViewLayer | Sample 3/64".
+        """
+        now = time.perf_counter()
+        status_columns = [col.strip() for col in stats.split("|")]
+        status = status_columns[-1]
+        if "Compositing" in status_columns:
+            self._timestamps.setdefault("composite_begin", now)
+            status = " | ".join(status_columns[status_columns.index("Compositing"):])
+        elif status.startswith("Sample"):
+            self._timestamps.setdefault("render_begin", now)
+            sample = status[len("Sample"):].split("/", maxsplit=1)[0].strip()
+            if sample.isdigit():
+                self._samples = int(sample)
+        if self._status_callback is not None:
+            self._status_callback(self._samples, status)
+
+    def _on_render_post(self, *_):
+        """ Called when the frame has been rendered and composited, but before it is written. """
+        self._timestamps["post"] = time.perf_counter()
+
+    def _on_render_write(self, scene: bpy.types.Scene, *_):
+        """ Called after the frame has been written, this completes the stats of the frame.
+
+        :param scene: The rendered scene.
+        """
+        end = time.perf_counter()
+        timestamps = self._timestamps
+        if "begin" not in timestamps:
+            return
+        post = timestamps.get("post", end)
+        composite_begin = timestamps.get("composite_begin", post)
+        render_begin = min(timestamps.get("render_begin", composite_begin), composite_begin)
+        frame = {
+            "frame": scene.frame_current,
+            "sync_time": render_begin - timestamps["begin"],
+            "render_time": composite_begin - render_begin,
+            "composite_time": post - composite_begin,
+            "write_time": end - post,
+            "total_time": end - timestamps["begin"],
+            "samples": self._samples,
+            "max_samples": scene.cycles.samples
+        }
+        self.stats.frames.append(frame)
+        self._timestamps = {}
+        if self._frame_callback is not None:
+            self._frame_callback(frame)
@@ -1,13 +1,15 @@
 """Provides functionality to render a color, normal, depth and distance image."""
 
 from contextlib import contextmanager
+import hashlib
+import json
 import os
-import threading
-from typing import IO, Union, Dict, List, Set, Optional, Any
+from typing import IO, Union, Dict, List, Set, Optional, Any, Tuple
 import math
 import sys
 import platform
 import time
+import warnings
 
 import mathutils
 import bpy
@@ -17,6 +19,8 @@
 
 from blenderproc.python.camera import CameraUtility
 from blenderproc.python.modules.main.GlobalStorage import GlobalStorage
+from blenderproc.python.renderer.RenderStatsUtility import RenderStats, _RenderStatsCollector
+from blenderproc.python.renderer.RenderManifestUtility import RenderManifest
 from blenderproc.python.utility.BlenderUtility import get_all_blender_mesh_objects
 from blenderproc.python.utility.DefaultConfig import DefaultConfig
 from blenderproc.python.utility.Utility import Utility, stdout_redirected
@@ -461,6 +465,8 @@ def enable_segmentation_output(map_by: Union[str, List[str]] = "category_id",
     output_node = tree.nodes.new('CompositorNodeOutputFile')
     output_node.base_path = output_dir
     output_node.format.file_format = "OPEN_EXR"
+    # a full float stores all indices up to 2^24 exactly, while a half float is only exact up to 2048
+    output_node.format.color_depth = "32"
     output_node.file_slots.values()[0].path = file_prefix
     Utility.add_output_entry({
         "key": output_key,
@@ -478,6 +484,32 @@ def enable_segmentation_output(map_by: Union[str, List[str]] = "category_id",
     bpy.context.scene.view_layers["ViewLayer"].pass_alpha_threshold = pass_alpha_threshold
 
 
+def _update_segmentation_pass_indices():
+    """ Gives all mesh objects, which were added after `enable_segmentation_output`, their own pass index.
+
+    New objects have the pass index zero, which is reserved for the background, and duplicated objects share the
+    pass index of their original. Both get a new unique index, while all other objects keep theirs, such that the
+    instance ids stay consistent across render calls.
+    """
+    used_pass_indices = set()
+    objects_without_index = []
+    for obj in get_all_blender_mesh_objects():
+        if obj.pass_index == 0 or obj.pass_index in used_pass_indices:
+            objects_without_index.append(obj)
+        else:
+            used_pass_indices.add(obj.pass_index)
+
+    next_pass_index = max(used_pass_indices, default=0) + 1
+    # blender stores the pass index of an object as a 16-bit signed integer
+    max_pass_index = bpy.types.Object.bl_rna.properties["pass_index"].hard_max
+    if next_pass_index + len(objects_without_index) - 1 > max_pass_index:
+        raise RuntimeError(f"The {len(objects_without_index)} new objects can not get a unique pass index, as "
+                           f"blender only supports pass indices up to {max_pass_index}.")
+    for obj in objects_without_index:
+        obj.pass_index = next_pass_index
+        next_pass_index += 1
+
+
 def enable_diffuse_color_output(output_dir: Optional[str] = None, file_prefix: str = "diffuse_",
                                 output_key: str = "diffuse"):
     """ Enables writing diffuse color (albedo) images.
@@ -528,14 +560,22 @@ def map_file_format_to_file_ending(file_format: str) -> str:
     raise RuntimeError(f"Unknown Image Type {file_format}")
 
 
-def _progress_bar_thread(pipe_out: int, stdout: IO, total_frames: int, num_samples: int):
-    """ The thread rendering the progress bar
+@contextmanager
+def _render_progress_bar(stdout: IO, total_frames: int, enabled: bool = True):
+    """ Shows a progress bar visualizing the render progress.
+
+    The progress bar is updated via the returned callbacks, which should be given to the `_RenderStatsCollector`.
 
-    :param pipe_out: The pipe output delivering blenders debug messages.
     :param stdout: The stdout to which the progress bar should be written.
     :param total_frames: The number of frames that should be rendered.
-    :param num_samples: The number of samples used to render each frame.
+    :param enabled: If False, no progress bar is shown.
+    :return: The callbacks, which are called for each finished frame and for each status update of a frame.
     """
+    if not enabled:
+        yield None, None
+        return
+
+    num_samples = bpy.context.scene.cycles.samples
     # Define columns for progress bar
     columns = [
         TextColumn("[progress.description]{task.description}"),
@@ -548,79 +588,38 @@ def _progress_bar_thread(pipe_out: int, stdout: IO, total_frames: int, num_sampl
         complete_task = progress.add_task("[green]Total", total=total_frames, status="")
         frame_task = progress.add_task("[yellow]Current frame", total=num_samples, status="")
 
-        # Continuously read blenders debug messages
-        current_line = ""
-        while True:
-            # Read the next character
-            char = os.read(pipe_out, 1).decode()
+        def on_frame(_: Dict[str, Any]):
+            progress.advance(complete_task)
+            finished_frames = int(progress.tasks[complete_task].completed)
+            progress.update(complete_task, status=f"Rendering frame {finished_frames + 1} of {total_frames}")
+            progress.update(frame_task, completed=0, status="")
 
-            # If its the ending character, stop
-            if not char or "\b" == char:
-                break
-            # If the current line has ended
-            if char == "\n":
-                # Check if its a line we can use (starts with "Fra:")
-                if current_line.startswith("Fra:"):
-                    # Extract current frame number and set to progress bar
-                    frame_number = int(current_line.split()[0][len("Fra:"):])
-                    progress.update(complete_task, completed=frame_number)
-                    progress.update(complete_task, status=f"Rendering frame {frame_number + 1} of {total_frames}")
-
-                    # Split line into columns
-                    status_columns = [col.strip() for col in current_line.split("|")]
-                    if "Scene, ViewLayer" in status_columns:
-                        # If we are currently at "Scene, ViewLayer", use everything afterwards
-                        status = " | ".join(status_columns[status_columns.index("Scene, ViewLayer") + 1:])
-                        # If we are currently rendering, update the progress
-                        if status.startswith("Sample"):
-                            progress.update(frame_task, completed=int(status[len("Sample"):].split("/", maxsplit=1)[0]))
-                    elif "Compositing" in status_columns:
-                        # If we are at "Compositing", use everything afterwards including "Compositing"
-                        status = " | ".join(status_columns[status_columns.index("Compositing"):])
-                        # Set render progress to complete
-                        progress.update(frame_task, completed=num_samples)
-                    else:
-                        # In every other case, use last column
-                        status = status_columns[-1]
-                    # Set status to progress bar
-                    progress.update(frame_task, status=status)
-                # Start with next line
-                current_line = ""
-            else:
-                # Append char to current line
-                current_line += char
+        def on_status(sample: int, status: str):
+            if status.startswith("Compositing"):
+                # Set render progress to complete
+                sample = num_samples
+            progress.update(frame_task, completed=sample, status=status)
 
+        yield on_frame, on_status
 
-@contextmanager
-def _render_progress_bar(pipe_out: int, pipe_in: int, stdout: IO, total_frames: int, enabled: bool = True):
-    """ Shows a progress bar visualizing the render progress.
 
-    :param pipe_out: The pipe output delivering blenders debug messages.
-    :param pipe_in: The input of the pipe, necessary to send the end character.
-    :param stdout: The stdout to which the progress bar should be written.
-    :param total_frames: The number of frames that should be rendered.
-    :param enabled: If False, no progress bar is shown.
+def get_render_stats() -> RenderStats:
+    """ Returns the timings and samples of all frames of the last render call.
+
+    :return: The stats of the last render call, see `RenderStats`.
     """
-    if enabled:
-        thread = threading.Thread(target=_progress_bar_thread,
-                                  args=(pipe_out, stdout, total_frames, bpy.context.scene.cycles.samples))
-        thread.start()
-        try:
-            yield
-        finally:
-            # Send final character, so the thread knows to stop
-            w = os.fdopen(pipe_in, 'w')
-            w.write("\b")
-            w.close()
-            thread.join()
-    else:
-        yield
+    if not GlobalStorage.is_in_storage("render_stats"):
+        raise RuntimeError("There is no render call yet, whose stats could be returned.")
+    return GlobalStorage.get("render_stats")
 
 
 def render(output_dir: Optional[str] = None, file_prefix: str = "rgb_", output_key: Optional[str] = "colors",
            load_keys: Optional[Set[str]] = None, return_data: bool = True,
            keys_with_alpha_channel: Optional[Set[str]] = None,
-           verbose: bool = False) -> Dict[str, Union[np.ndarray, List[np.ndarray]]]:
+           verbose: bool = False, lazy_loading: bool = False,
+           max_cached_frames: int = 8,
+           stats_log_path: Optional[str] = None,
+           resumable: bool = False) -> Dict[str, Union[np.ndarray, List[np.ndarray]]]:
     """ Render all frames.
 
     This will go through all frames from scene.frame_start to scene.frame_end and render each of them.
@@ -633,12 +632,36 @@ def render(output_dir: Optional[str] = None, file_prefix: str = "rgb_", output_k
     :param return_data: Whether to load and return generated data. Backwards compatibility to config-based pipeline.
     :param keys_with_alpha_channel: A set containing all keys whose alpha channels should be loaded.
     :param verbose: If True, more details about the rendering process are printed.
+    :param lazy_loading: If True, the per frame outputs are not loaded directly, instead each frame is loaded when it
+                         is accessed for the first time. This keeps the memory usage low for long sequences, see
+                         `LazyFrameList`. The lists of outputs, which are not written to the temporary directory,
+                         can not be accessed anymore after the next render call.
+    :param max_cached_frames: Only used with lazy_loading, the number of frames per key which are kept in memory.
+    :param stats_log_path: If given, the timings and samples of each frame are appended as JSON lines to this file.
+                           They can also be retrieved after rendering via `get_render_stats`.
+    :param resumable: If True, each completely written frame is recorded in a manifest in the output_dir. If the
+                      rendering is interrupted, a restart with the same random seed and output_dir only renders the
+                      missing frames of the interrupted render call. This requires BLENDER_PROC_RANDOM_SEED to be
+                      set. The outputs of the compositor, which would be written to the temporary directory, are
+                      written to the output_dir instead. See `RenderManifest`.
     :return: dict of lists of raw renderer output. Keys can be 'distance', 'colors', 'normals'
     """
+    if resumable and output_dir is None:
+        raise ValueError("A resumable rendering needs an output_dir, which outlives the blender process.")
+    if resumable and not os.getenv("BLENDER_PROC_RANDOM_SEED"):
+        raise ValueError("A resumable rendering needs a fixed random seed, otherwise a restart creates a different "
+                         "scene. Set the environment variable BLENDER_PROC_RANDOM_SEED.")
     if output_dir is None:
         output_dir = Utility.get_temporary_directory()
+    # the lazily loaded outputs of earlier calls, which are not in the temporary directory, are overwritten now
+    _WriterUtility.invalidate_overwritable_lazy_frame_lists()
+    if resumable:
+        _ResumableRendering.move_compositor_outputs(Utility.get_temporary_directory(), output_dir)
     if load_keys is None:
         load_keys = {'colors', 'distance', 'normals', 'diffuse', 'depth', 'segmap'}
+        # the optical flow and nocs outputs, which are written in the same render call, are loaded as well
+        load_keys |= {output["key"] for output in Utility.get_registered_outputs()
+                      if output.get("is_nocs_aov", False) or "optical_flow_direction" in output}
         keys_with_alpha_channel = {'colors'} if bpy.context.scene.render.film_transparent else None
 
     if output_key is not None:
@@ -652,47 +675,215 @@ def render(output_dir: Optional[str] = None, file_prefix: str = "rgb_", output_k
 
     bpy.context.scene.render.filepath = os.path.join(output_dir, file_prefix)
 
+    if any(output.get("is_semantic_segmentation", False) for output in Utility.get_registered_outputs()):
+        _update_segmentation_pass_indices()
+    if bpy.context.scene.cycles.samples > 1 and \
+            any("optical_flow_direction" in output for output in Utility.get_registered_outputs()):
+        warnings.warn(f"The optical flow is rendered with {bpy.context.scene.cycles.samples} samples, so the flow at "
+                      f"object borders is a blend of the motions of both sides. Use "
+                      f"bproc.renderer.render_optical_flow() for sharp borders.")
+
     # Skip if there is nothing to render
     if bpy.context.scene.frame_end != bpy.context.scene.frame_start:
         if len(get_all_blender_mesh_objects()) == 0:
             raise Exception("There are no mesh-objects to render, "
                             "please load an object before invoking the renderer.")
+
+        frames = list(range(bpy.context.scene.frame_start, bpy.context.scene.frame_end))
+        manifest = None
+        if resumable:
+            manifest = RenderManifest(output_dir, os.getenv("BLENDER_PROC_RANDOM_SEED"),
+                                      _ResumableRendering.get_call_key(frames))
+            frames = [frame for frame in frames if not manifest.is_complete(frame)]
+            print(f"Resuming the rendering, {bpy.context.scene.frame_end - bpy.context.scene.frame_start - len(frames)}"
+                  f" frames are already complete")
+
         # Print what is rendered
-        total_frames = bpy.context.scene.frame_end - bpy.context.scene.frame_start
+        total_frames = len(frames)
         if load_keys:
             registered_output_keys = [output["key"] for output in Utility.get_registered_outputs()]
             keys_to_render = sorted([key for key in load_keys if key in registered_output_keys])
             print(f"Rendering {total_frames} frames of {', '.join(keys_to_render)}...")
 
-        # As frame_end is pointing to the next free frame, decrease it by one, as
-        # blender will render all frames in [frame_start, frame_ned]
-        bpy.context.scene.frame_end -= 1
-
-        # Define pipe to communicate blenders debug messages to progress bar
-        pipe_out, pipe_in = os.pipe()
+        # The progress is reported by the render handlers, so blenders debug messages are not needed
         begin = time.time()
-        with stdout_redirected(pipe_in, enabled=not verbose) as stdout:
-            with _render_progress_bar(pipe_out, pipe_in, stdout, total_frames, enabled=not verbose):
-                bpy.ops.render.render(animation=True, write_still=True)
-
-        # Close Pipes to prevent having unclosed file handles
-        try:
-            os.close(pipe_out)
-        except OSError:
-            pass
-        try:
-            os.close(pipe_in)
-        except OSError:
-            pass
-
+        frame_start, frame_end = bpy.context.scene.frame_start, bpy.context.scene.frame_end
+        # pylint: disable=import-outside-toplevel,cyclic-import
+        from blenderproc.python.renderer.NOCSRendererUtility import _NOCSRendererUtility
+        # pylint: enable=import-outside-toplevel,cyclic-import
+        with stdout_redirected(os.devnull, enabled=not verbose) as stdout:
+            with _render_progress_bar(stdout, total_frames, enabled=not verbose) as (on_frame, on_status):
+
+                def on_frame_written(frame_stats: Dict[str, Any]):
+                    if manifest is not None:
+                        manifest.mark_complete(frame_stats["frame"],
+                                               _ResumableRendering.get_frame_files(frame_stats["frame"]))
+                    if on_frame is not None:
+                        on_frame(frame_stats)
+
+                with _RenderStatsCollector(on_frame_written, on_status) as stats_collector:
+                    nocs_aov_nodes = []
+                    try:
+                        if any(output.get("is_nocs_aov", False) for output in Utility.get_registered_outputs()):
+                            # the AOV outputs are only added to the materials for this rendering
+                            nocs_aov_nodes = _NOCSRendererUtility.add_nocs_aov_outputs()
+                        # blender renders all frames in [frame_start, frame_end], so render each consecutive run of
+                        # frames separately
+                        for first_frame, last_frame in _ResumableRendering.group_consecutive_frames(frames):
+                            bpy.context.scene.frame_start = first_frame
+                            bpy.context.scene.frame_end = last_frame
+                            bpy.ops.render.render(animation=True, write_still=True)
+                    finally:
+                        # Revert changes
+                        bpy.context.scene.frame_start, bpy.context.scene.frame_end = frame_start, frame_end
+                        _NOCSRendererUtility.remove_nodes(nocs_aov_nodes)
+
+        GlobalStorage.set("render_stats", stats_collector.stats)
+        if stats_log_path is not None:
+            stats_collector.stats.write_json_lines(stats_log_path)
+
+        if manifest is not None:
+            # the render call is complete, so a restart renders it again from scratch
+            manifest.remove()
         print(f"Finished rendering after {time.time() - begin:.3f} seconds")
-        # Revert changes
-        bpy.context.scene.frame_end += 1
+        if _RenderDataChangeTracker.track_changes in bpy.app.handlers.depsgraph_update_post:
+            # the rendering has evaluated the dependency graph, so all changes have been reported by now
+            print("Changes since the last rendering: " + ", ".join(
+                f"{len(names)} {name.replace('_', ' ')}" for name, names in _RenderDataChangeTracker.changes.items()))
+            _RenderDataChangeTracker.reset_changes()
     else:
         raise RuntimeError("No camera poses have been registered, therefore nothing can be rendered. A camera "
                            "pose can be registered via bproc.camera.add_camera_pose().")
 
-    return _WriterUtility.load_registered_outputs(load_keys, keys_with_alpha_channel) if return_data else {}
+    if not return_data:
+        return {}
+    data = _WriterUtility.load_registered_outputs(load_keys, keys_with_alpha_channel, lazy_loading,
+                                                  max_cached_frames)
+    region = get_render_region()
+    if region is not None:
+        # needed for stitching the regions together
+        data["render_region"] = [np.array(region + (bpy.context.scene.render.resolution_x,
+                                                    bpy.context.scene.render.resolution_y))
+                                 for _ in range(bpy.context.scene.frame_start, bpy.context.scene.frame_end)]
+    return data
+
+
+class _ResumableRendering:
+    """ Helper functions for resumable renderings, see `render`. """
+
+    @staticmethod
+    def move_compositor_outputs(temp_dir: str, output_dir: str):
+        """ Changes all outputs of the compositor, which are written to the temporary directory, to the output dir.
+
+        :param temp_dir: The temporary directory, which is removed when blender exits.
+        :param output_dir: The output directory, which outlives the blender process.
+        """
+        if not bpy.context.scene.use_nodes:
+            return
+        moved_prefixes = []
+        for node in Utility.get_nodes_with_type(bpy.context.scene.node_tree.nodes, 'CompositorNodeOutputFile'):
+            if os.path.abspath(node.base_path) == os.path.abspath(temp_dir):
+                node.base_path = output_dir
+                moved_prefixes.extend(slot.path for slot in node.file_slots)
+        # the registered outputs have to point to the new location as well
+        for output in Utility.get_registered_outputs():
+            output_dir_of_entry, file_name = os.path.split(output["path"])
+            if os.path.abspath(output_dir_of_entry) == os.path.abspath(temp_dir) and \
+                    any(file_name.startswith(prefix + "%") for prefix in moved_prefixes):
+                output["path"] = os.path.join(output_dir, file_name)
+
+    @staticmethod
+    def get_call_key(frames: List[int]) -> str:
+        """ Returns a key, which identifies the current render call within the run.
+
+        It hashes the index of the resumable render call, the frame range and the camera poses, so a restart with
+        the same random seed gets the same key for the same call, while a different call or scene gets another key.
+
+        :param frames: All frames which are rendered in this call.
+        :return: The key.
+        """
+        call_index = GlobalStorage.get("resumable_render_calls") if \
+            GlobalStorage.is_in_storage("resumable_render_calls") else 0
+        GlobalStorage.set("resumable_render_calls", call_index + 1)
+        cam_poses = [CameraUtility.get_camera_pose(frame).round(6).tolist() for frame in frames]
+        key = json.dumps({"call": call_index, "frames": [frames[0], frames[-1]], "cam_poses": cam_poses})
+        return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def get_frame_files(frame: int) -> List[str]:
+        """ Returns all files, which are written for the given frame by the renderer and the compositor.
+
+        :param frame: The frame number.
+        :return: The paths of the files.
+        """
+        paths = [bpy.context.scene.render.filepath + f"{frame:04d}" +
+                 map_file_format_to_file_ending(bpy.context.scene.render.image_settings.file_format)]
+        if bpy.context.scene.use_nodes:
+            for node in Utility.get_nodes_with_type(bpy.context.scene.node_tree.nodes, 'CompositorNodeOutputFile'):
+                for slot in node.file_slots:
+                    paths.append(os.path.join(node.base_path, slot.path) + f"{frame:04d}" +
+                                 map_file_format_to_file_ending(node.format.file_format))
+        if bpy.context.scene.render.use_multiview:
+            paths = [stereo_path for path in paths for stereo_path in _WriterUtility.get_stereo_path_pair(path)]
+        return paths
+
+    @staticmethod
+    def group_consecutive_frames(frames: List[int]) -> List[Tuple[int, int]]:
+        """ Groups the given sorted frames into runs of consecutive frames.
+
+        :param frames: The sorted frame numbers.
+        :return: The first and the last frame of each run.
+        """
+        runs = []
+        for frame in frames:
+            if runs and runs[-1][1] == frame - 1:
+                runs[-1] = (runs[-1][0], frame)
+            else:
+                runs.append((frame, frame))
+        return runs
+
+
+def set_render_region(region: Optional[Tuple[int, int, int, int]] = None):
+    """ Restricts the rendering to the given region of the image, by using the render border of blender.
+
+    All outputs are cropped to the region. The data returned by `render` then contains the key "render_region", such
+    that the outputs of the different regions can be stitched together via `bproc.renderer.stitch_render_regions`.
+    This allows splitting a single high resolution frame across several processes or machines, the regions can be
+    generated via `bproc.renderer.split_into_regions`.
+
+    :param region: The region as (x_min, y_min, x_max, y_max) in pixels, where the maximum is exclusive and the
+                   origin is at the top left. If None, the whole image is rendered again.
+    """
+    if region is None:
+        bpy.context.scene.render.use_border = False
+        bpy.context.scene.render.use_crop_to_border = False
+        GlobalStorage.set("render_region", None)
+        return
+
+    width, height = bpy.context.scene.render.resolution_x, bpy.context.scene.render.resolution_y
+    x_min, y_min, x_max, y_max = region
+    if not 0 <= x_min < x_max <= width or not 0 <= y_min < y_max <= height:
+        raise ValueError(f"The render region {region} is not inside of the image with {width}x{height} pixels.")
+
+    # blender truncates border * resolution to get the pixel bounds, the small offset makes sure this results in
+    # exactly the requested pixels. The border of blender starts at the bottom left.
+    bpy.context.scene.render.border_min_x = (x_min + 0.25) / width
+    bpy.context.scene.render.border_max_x = min((x_max + 0.25) / width, 1)
+    bpy.context.scene.render.border_min_y = (height - y_max + 0.25) / height
+    bpy.context.scene.render.border_max_y = min((height - y_min + 0.25) / height, 1)
+    bpy.context.scene.render.use_border = True
+    bpy.context.scene.render.use_crop_to_border = True
+    GlobalStorage.set("render_region", (x_min, y_min, x_max, y_max))
+
+
+def get_render_region() -> Optional[Tuple[int, int, int, int]]:
+    """ Returns the region set via `set_render_region`.
+
+    :return: The region as (x_min, y_min, x_max, y_max) in pixels or None, if the whole image is rendered.
+    """
+    if GlobalStorage.is_in_storage("render_region"):
+        return GlobalStorage.get("render_region")
+    return None
 
 
 def set_output_format(file_format: Optional[str] = None, color_depth: Optional[int] = None,
@@ -750,6 +941,72 @@ def render_init():
     bpy.context.scene.render.use_persistent_data = True
 
 
+def enable_render_data_change_tracking(enable: bool = True):
+    """ Tracks which objects, materials and collections change between consecutive render calls.
+
+    The render data is kept alive between render calls by default, as `render_init` enables
+    `use_persistent_data`. Blender then only synchronizes the changed data with the render engine, so the scene
+    is synchronized faster, the fewer objects change between the render calls.
+
+    While enabled, the number of changes is printed after each rendering, see `get_render_data_changes`. This is only
+    informational, blender itself decides which data it synchronizes.
+
+    :param enable: If False, the tracking is stopped.
+    """
+    if enable:
+        if _RenderDataChangeTracker.track_changes not in bpy.app.handlers.depsgraph_update_post:
+            bpy.app.handlers.depsgraph_update_post.append(_RenderDataChangeTracker.track_changes)
+    else:
+        if _RenderDataChangeTracker.track_changes in bpy.app.handlers.depsgraph_update_post:
+            bpy.app.handlers.depsgraph_update_post.remove(_RenderDataChangeTracker.track_changes)
+    _RenderDataChangeTracker.reset_changes()
+
+
+def get_render_data_changes() -> Dict[str, Set[str]]:
+    """ Returns the changes of the scene since the last render call, these are only tracked while
+    `enable_render_data_change_tracking` is active.
+
+    :return: The names of the moved objects, the objects with changed geometry, the changed materials and the changed
+             collections, which means that objects were added or removed.
+    """
+    if bpy.context.view_layer is not None:
+        # the changes are only reported, when the dependency graph is evaluated
+        bpy.context.view_layer.update()
+    return {name: set(names) for name, names in _RenderDataChangeTracker.changes.items()}
+
+
+class _RenderDataChangeTracker:
+    """ Tracks the changes between the render calls. """
+
+    changes: Dict[str, Set[str]] = {"moved_objects": set(), "changed_geometries": set(), "changed_materials": set(),
+                                    "changed_collections": set()}
+
+    @staticmethod
+    def track_changes(_: bpy.types.Scene, depsgraph: bpy.types.Depsgraph):
+        """ Handler of the dependency graph updates, which collects the names of the changed data blocks per type.
+
+        :param depsgraph: The updated dependency graph.
+        """
+        changes = _RenderDataChangeTracker.changes
+        for update in depsgraph.updates:
+            if isinstance(update.id, bpy.types.Object):
+                if update.is_updated_transform:
+                    changes["moved_objects"].add(update.id.name)
+                if update.is_updated_geometry:
+                    changes["changed_geometries"].add(update.id.name)
+            elif isinstance(update.id, bpy.types.Material):
+                changes["changed_materials"].add(update.id.name)
+            elif isinstance(update.id, bpy.types.Collection):
+                # objects were linked to or unlinked from a collection
+                changes["changed_collections"].add(update.id.name)
+
+    @staticmethod
+    def reset_changes():
+        """ Resets the tracked changes, this is done after each render call. """
+        for names in _RenderDataChangeTracker.changes.values():
+            names.clear()
+
+
 def disable_all_denoiser():
     """ Disables all denoiser.
 
@@ -0,0 +1,180 @@
+"""Provides functionality to choose the number of samples per frame based on a time budget or a noise target."""
+
+import math
+import os
+from typing import Any, Dict, List, Optional, Set, Union
+
+import bpy
+import numpy as np
+
+from blenderproc.python.renderer import RendererUtility
+from blenderproc.python.utility.Utility import Utility, UndoAfterExecution
+from blenderproc.python.writer.WriterUtility import _WriterUtility
+
+
+def render_with_sample_budget(time_budget_per_frame: Optional[float] = None, target_noise: Optional[float] = None,
+                              probe_samples: int = 8, min_samples: int = 1, max_samples: int = 1024,
+                              output_dir: Optional[str] = None, file_prefix: str = "rgb_",
+                              output_key: Optional[str] = "colors", load_keys: Optional[Set[str]] = None,
+                              return_data: bool = True, keys_with_alpha_channel: Optional[Set[str]] = None,
+                              verbose: bool = False, sample_budget_output_key: str = "sample_budget",
+                              stats_log_path: Optional[str] = None) \
+        -> Dict[str, Union[np.ndarray, List[np.ndarray], List[Dict[str, Any]]]]:
+    """ Renders all frames, where the number of samples is chosen per frame based on a quick probe rendering.
+
+    At first, every frame is rendered twice with `probe_samples` samples and different seeds. The difference of
+    both probes gives the noise of the frame and their render time gives the time per sample. Based on this, the
+    number of samples is chosen per frame, such that the frame fits into the time budget and/or reaches the target
+    noise. The noise decreases with the square root of the number of samples. If both are given, the smaller number
+    of samples is used. Afterwards, all frames are rendered in one render call with their chosen number of samples.
+
+    The decisions are returned per frame under `sample_budget_output_key`, so they are stored by the writers. They
+    are also added to the stats of each frame under "sample_budget", see `get_render_stats`, so they are kept when
+    return_data is False.
+
+    :param time_budget_per_frame: The wall-clock time in seconds, which should be spent on each frame. This includes
+                                  the time of the two probe renderings of the frame.
+    :param target_noise: The target root-mean-square noise of the linear pixel values.
+    :param probe_samples: The number of samples used for each of the two probe renderings.
+    :param min_samples: The minimum number of samples per frame.
+    :param max_samples: The maximum number of samples per frame.
+    :param output_dir: The directory to write files to, if this is None the temporary directory is used.
+    :param file_prefix: The prefix to use for writing the images.
+    :param output_key: The key to use for registering the output.
+    :param load_keys: Set of output keys to load when available
+    :param return_data: Whether to load and return generated data.
+    :param keys_with_alpha_channel: A set containing all keys whose alpha channels should be loaded.
+    :param verbose: If True, more details about the rendering process are printed.
+    :param sample_budget_output_key: The key under which the decisions are returned.
+    :param stats_log_path: If given, the stats of each frame including its decision are appended as JSON lines to
+                           this file.
+    :return: dict of lists of raw renderer output and the decisions per frame.
+    """
+    if time_budget_per_frame is None and target_noise is None:
+        raise ValueError("Either a time budget per frame or a target noise has to be given.")
+    if min_samples > max_samples:
+        raise ValueError(f"The minimum number of samples {min_samples} is higher than the maximum {max_samples}.")
+
+    probes = _SampleBudgetRendererUtility.render_probes(probe_samples, verbose)
+    decisions = []
+    for frame, probe in zip(range(bpy.context.scene.frame_start, bpy.context.scene.frame_end), probes):
+        decision = _SampleBudgetRendererUtility.choose_samples(probe, probe_samples, time_budget_per_frame,
+                                                               target_noise, min_samples, max_samples)
+        decisions.append(decision)
+        print(f"Frame {frame}: {decision['samples']} samples, limited by {decision['limited_by']}")
+
+    previous_samples = bpy.context.scene.cycles.samples
+    # only the inserted keyframes are deleted again, so a failed insertion does not hide the original exception
+    keyframed_frames = []
+    try:
+        # the number of samples is read by cycles for every frame, so it can be animated
+        for frame, decision in zip(range(bpy.context.scene.frame_start, bpy.context.scene.frame_end), decisions):
+            bpy.context.scene.cycles.samples = decision["samples"]
+            bpy.context.scene.cycles.keyframe_insert(data_path="samples", frame=frame)
+            keyframed_frames.append(frame)
+        data = RendererUtility.render(output_dir, file_prefix, output_key, load_keys, return_data,
+                                      keys_with_alpha_channel, verbose)
+    finally:
+        for frame in keyframed_frames:
+            bpy.context.scene.cycles.keyframe_delete(data_path="samples", frame=frame)
+        bpy.context.scene.cycles.samples = previous_samples
+
+    # keep the decisions in the stats of the render call, as the returned data might be empty
+    decisions_per_frame = dict(zip(range(bpy.context.scene.frame_start, bpy.context.scene.frame_end), decisions))
+    stats = RendererUtility.get_render_stats()
+    for frame_stats in stats.frames:
+        frame_stats["sample_budget"] = decisions_per_frame.get(frame_stats["frame"])
+    if stats_log_path is not None:
+        stats.write_json_lines(stats_log_path)
+
+    if return_data:
+        data[sample_budget_output_key] = decisions
+    return data
+
+
+class _SampleBudgetRendererUtility:
+
+    @staticmethod
+    def render_probes(probe_samples: int, verbose: bool) -> List[Dict[str, float]]:
+        """ Renders all frames twice with the given number of samples and different seeds.
+
+        :param probe_samples: The number of samples per probe.
+        :param verbose: If True, more details about the rendering process are printed.
+        :return: The noise, the time per sample, the time spent besides sampling and the time of both probe
+                 renderings for each frame.
+        """
+        temp_dir = Utility.get_temporary_directory()
+        frame_stats = []
+        with UndoAfterExecution():
+            RendererUtility.set_max_amount_of_samples(probe_samples)
+            RendererUtility.set_noise_threshold(0)
+            # the denoiser would hide the noise
+            RendererUtility.set_denoiser(None)
+            # the compositor outputs are not needed for the probes
+            bpy.context.scene.render.use_compositing = False
+            bpy.context.scene.cycles.use_animated_seed = False
+            # use a linear color space without quantization for measuring the noise
+            RendererUtility.set_output_format("OPEN_EXR", 32, enable_transparency=False)
+
+            for probe_index in range(2):
+                bpy.context.scene.cycles.seed = probe_index
+                print(f"Rendering probe {probe_index + 1} of 2 with {probe_samples} samples...")
+                RendererUtility.render(temp_dir, f"probe_{probe_index}_", None, load_keys=set(), return_data=False,
+                                       verbose=verbose)
+                frame_stats.append(RendererUtility.get_render_stats().frames)
+
+        probes = []
+        for frame_index, frame in enumerate(range(bpy.context.scene.frame_start, bpy.context.scene.frame_end)):
+            images = [_WriterUtility.load_frame_output(os.path.join(temp_dir, f"probe_{probe_index}_{frame:04d}.exr"),
+                                                       {}, False) for probe_index in range(2)]
+            # the difference of two independent renderings has twice the variance of a single rendering
+            noise = float(np.sqrt(np.mean(np.square(images[0] - images[1])) / 2))
+            stats = [frame_stats[probe_index][frame_index] for probe_index in range(2)]
+            probes.append({
+                "noise": noise,
+                "time_per_sample": sum(stat["render_time"] for stat in stats) / (2 * probe_samples),
+                # the second probe can reuse the render data of the first one, so the first is more realistic
+                "overhead_time": stats[0]["total_time"] - stats[0]["render_time"],
+                "probe_time": sum(stat["total_time"] for stat in stats)
+            })
+        return probes
+
+    @staticmethod
+    def choose_samples(probe: Dict[str, float], probe_samples: int, time_budget_per_frame: Optional[float],
+                       target_noise: Optional[float], min_samples: int, max_samples: int) -> Dict[str, Any]:
+        """ Chooses the number of samples of a frame based on its probe.
+
+        :param probe: The probe of the frame, see `render_probes`.
+        :param probe_samples: The number of samples per probe.
+        :param time_budget_per_frame: The wall-clock time in seconds, which should be spent on the frame, including
+                                      the probe renderings.
+        :param target_noise: The target root-mean-square noise of the linear pixel values.
+        :param min_samples: The minimum number of samples.
+        :param max_samples: The maximum number of samples.
+        :return: The chosen number of samples together with the probe and the reason for the decision.
+        """
+        candidates = {"max_samples": max_samples}
+        if time_budget_per_frame is not None:
+            # the probes have already used a part of the budget
+            sampling_time = time_budget_per_frame - probe["probe_time"] - probe["overhead_time"]
+            candidates["time"] = int(sampling_time / max(probe["time_per_sample"], 1e-9))
+        if target_noise is not None:
+            # the noise decreases with the square root of the number of samples
+            candidates["noise"] = math.ceil(probe_samples * (probe["noise"] / target_noise) ** 2)
+
+        limited_by = min(candidates, key=candidates.get)
+        samples = candidates[limited_by]
+        if samples < min_samples:
+            samples = min_samples
+            limited_by = "min_samples"
+        return {
+            "samples": samples,
+            "limited_by": limited_by,
+            "probe_samples": probe_samples,
+            "probe_noise": probe["noise"],
+            "time_per_sample": probe["time_per_sample"],
+            "overhead_time": probe["overhead_time"],
+            "probe_time": probe["probe_time"],
+            "expected_noise": probe["noise"] * math.sqrt(probe_samples / samples),
+            "expected_time": probe["probe_time"] + probe["overhead_time"] + samples * probe["time_per_sample"]
+        }
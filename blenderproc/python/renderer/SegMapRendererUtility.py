@@ -22,6 +22,10 @@ def render_segmap(output_dir: Optional[str] = None, temp_dir: Optional[str] = No
                   render_colorspace_size_per_dimension: int = 2048) -> Dict[str, Union[np.ndarray, List[np.ndarray]]]:
     """ Renders segmentation maps for all frames
 
+    This needs an additional render call, in which all materials are replaced by colors, which encode the object
+    attributes. Prefer `bproc.renderer.enable_segmentation_output`, which writes the exact integer object indices in
+    the same render call as the color images.
+
     :param output_dir: The directory to write images to.
     :param temp_dir: The directory to write intermediate data to.
     :param map_by: The attributes to be used for color mapping.
@@ -104,6 +108,9 @@ def render_segmap(output_dir: Optional[str] = None, temp_dir: Optional[str] = No
 
         return_dict: Dict[str, Union[np.ndarray, List[np.ndarray]]] = {}
 
+        # the attribute values of the objects do not change between frames, so they are only resolved once
+        resolved_attributes: Dict[Tuple[str, int], Tuple[Any, bool]] = {}
+
         # After rendering
         for frame in range(bpy.context.scene.frame_start, bpy.context.scene.frame_end):  # for each rendered frame
             save_in_csv_attributes: Dict[int, Dict[str, Any]] = {}
@@ -149,51 +156,36 @@ def render_segmap(output_dir: Optional[str] = None, temp_dir: Optional[str] = No
                         if attribute.startswith("cp_"):
                             attribute = attribute[len("cp_"):]
                         # check if a default value was specified
-                        default_value_set = False
-                        if current_attribute in default_values or attribute in default_values:
-                            default_value_set = True
-                            if current_attribute in default_values:
-                                default_value = default_values[current_attribute]
-                            elif attribute in default_values:
-                                default_value = default_values[attribute]
-                        # iterate over all object ids
+                        default_value_set = current_attribute in default_values or attribute in default_values
+                        # resolve the attribute of all visible objects, which have not been resolved before
                         for object_id in object_ids:
                             # Convert np.uint8 to int, such that the save_in_csv_attributes dict can later be serialized
                             object_id = int(object_id)
-                            # get the corresponding object via the id
-                            current_obj = objects[object_id]
-                            # if the current obj has a attribute with that name -> get it
-                            if hasattr(current_obj, attribute):
-                                value = getattr(current_obj, attribute)
-                            # if the current object has a custom property with that name -> get it
-                            elif current_attribute.startswith("cp_") and attribute in current_obj:
-                                value = current_obj[attribute]
-                            elif current_attribute.startswith("cf_"):
-                                if current_attribute == "cf_basename":
-                                    value = current_obj.name
-                                    if "." in value:
-                                        value = value[:value.rfind(".")]
-                            elif default_value_set:
-                                # if none of the above applies use the default value
-                                value = default_value
+                            if (current_attribute, object_id) not in resolved_attributes:
+                                resolved_attributes[(current_attribute, object_id)] = _resolve_object_attribute(
+                                    objects[object_id], current_attribute, attribute,
+                                    default_values[current_attribute] if current_attribute in default_values
+                                    else default_values.get(attribute), default_value_set)
+
+                        # build a lookup table from object id to value, which is then applied to all pixels at once
+                        lookup_table = np.zeros(len(objects), dtype=optimal_dtype)
+                        for object_id in object_ids:
+                            object_id = int(object_id)
+                            value, is_default_value = resolved_attributes[(current_attribute, object_id)]
+                            if is_default_value:
                                 num_default_values += 1
-                            else:
-                                # if the requested current_attribute is not a custom property or an attribute
-                                # or there is a default value stored
-                                # it throws an exception
-                                raise RuntimeError(f"The obj: {current_obj.name} does not have the "
-                                                   f"attribute: {current_attribute}, striped: {attribute}. "
-                                                   f"Maybe try a default value.")
 
                             # save everything which is not instance also in the .csv
                             if isinstance(value, (int, float, np.integer, np.floating)):
                                 was_used = True
-                                resulting_map[segmap == object_id] = value
+                                lookup_table[object_id] = value
 
                             if object_id in save_in_csv_attributes:
                                 save_in_csv_attributes[object_id][attribute] = value
                             else:
                                 save_in_csv_attributes[object_id] = {attribute: value}
+                        if was_used:
+                            resulting_map = lookup_table[segmap]
 
                     if was_used and num_default_values < len(object_ids):
                         channels.append(org_attribute)
@@ -255,6 +247,42 @@ def render_segmap(output_dir: Optional[str] = None, temp_dir: Optional[str] = No
     return return_dict
 
 
+def _resolve_object_attribute(obj: bpy.types.Object, current_attribute: str, attribute: str,
+                              default_value: Any, default_value_set: bool) -> Tuple[Any, bool]:
+    """ Determines the value of the requested attribute for the given object.
+
+    :param obj: The object, which should be queried.
+    :param current_attribute: The requested attribute, e.g. "cp_category_id", "location" or "cf_basename".
+    :param attribute: The requested attribute without the "cp_" prefix.
+    :param default_value: The value used, if the object does not have the attribute.
+    :param default_value_set: Whether a default value was specified.
+    :return: The value and whether the default value was used.
+    """
+    value = None
+    # if the current obj has a attribute with that name -> get it
+    if hasattr(obj, attribute):
+        value = getattr(obj, attribute)
+    # if the current object has a custom property with that name -> get it
+    elif current_attribute.startswith("cp_") and attribute in obj:
+        value = obj[attribute]
+    elif current_attribute.startswith("cf_"):
+        if current_attribute == "cf_basename":
+            value = obj.name
+            if "." in value:
+                value = value[:value.rfind(".")]
+    elif default_value_set:
+        # if none of the above applies use the default value
+        return default_value, True
+    else:
+        # if the requested current_attribute is not a custom property or an attribute
+        # or there is a default value stored
+        # it throws an exception
+        raise RuntimeError(f"The obj: {obj.name} does not have the "
+                           f"attribute: {current_attribute}, striped: {attribute}. "
+                           f"Maybe try a default value.")
+    return value, False
+
+
 def _colorize_object(obj: bpy.types.Object, color: mathutils.Vector, use_alpha_channel: bool):
     """ Adjusts the materials of the given object, s.t. they are ready for rendering the seg map.
 
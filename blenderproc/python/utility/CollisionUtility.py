@@ -1,55 +1,57 @@
 """ This module provides a collection of functions to check if objects collide. """
 
+import hashlib
 from typing import Union, Optional, Dict, Tuple, List, Callable
 
+import bmesh
 import mathutils
 import numpy as np
 from mathutils import Vector, Euler, Matrix
 
 from blenderproc.python.types.MeshObjectUtility import MeshObject
 
-
 class CollisionUtility:
     """
     This class provides utility functions to check if two objects intersect with each other.
     """
 
     @staticmethod
-    def check_intersections(obj: MeshObject, bvh_cache: Optional[Dict[str, mathutils.bvhtree.BVHTree]],
+    def check_intersections(obj: MeshObject, bvh_cache: Optional["BvhCache"],
                             objects_to_check_against: List[MeshObject],
-                            list_of_objects_with_no_inside_check: List[MeshObject]):
+                            list_of_objects_with_no_inside_check: List[MeshObject],
+                            bb_cache: Optional["BoundingBoxCache"] = None):
         """ Checks if an object intersects with any object given in the list.
 
-        The bvh_cache adds all current objects to the bvh tree, which increases the speed.
+        The bvh_cache stores the meshes and the bvh trees of all objects, which increases the speed. The trees are
+        only rebuilt, if an object has been moved, see `BvhCache`.
 
-        If an object is already in the cache it is removed, before performing the check.
+        The bounding boxes of all objects are checked at once via the bb_cache, only the objects whose bounding box
+        intersects the one of `obj` are checked via their bvh trees.
 
         :param obj: Object which should be checked. Type: :class:`bpy.types.Object`
-        :param bvh_cache: Dict of all the bvh trees, removes the `obj` from the cache before adding it again. \
-                          Type: :class:`dict`
+        :param bvh_cache: The cache of the meshes and bvh trees, if None is given a new cache is used.
         :param objects_to_check_against: List of objects which the object is checked again \
                                          Type: :class:`list`
         :param list_of_objects_with_no_inside_check: List of objects on which no inside check is performed. \
                                                      This check is only done for the objects in \
                                                      `objects_to_check_against`. Type: :class:`list`
+        :param bb_cache: The cached world bounding boxes of the objects, if None is given all bounding boxes are
+                         computed.
         :return: Type: :class:`bool`, True if no collision was found, false if at least one collision was found
         """
+        if bb_cache is None:
+            bb_cache = BoundingBoxCache()
 
         no_collision = True
-        # Now check for collisions
-        for collision_obj in objects_to_check_against:
+        # First check which bounding boxes collide, then check for more refined collisions
+        for collision_obj in bb_cache.get_intersecting_objects(obj, objects_to_check_against):
             # Do not check collisions with yourself
             if collision_obj == obj:
                 continue
-            # First check if bounding boxes collides
-            intersection = CollisionUtility.check_bb_intersection(obj, collision_obj)
-            # if they do
-            if intersection:
-                skip_inside_check = collision_obj in list_of_objects_with_no_inside_check
-                # then check for more refined collisions
-                intersection, bvh_cache = CollisionUtility.check_mesh_intersection(obj, collision_obj,
-                                                                                   bvh_cache=bvh_cache,
-                                                                                   skip_inside_check=skip_inside_check)
+            skip_inside_check = collision_obj in list_of_objects_with_no_inside_check
+            intersection, bvh_cache = CollisionUtility.check_mesh_intersection(obj, collision_obj,
+                                                                               bvh_cache=bvh_cache,
+                                                                               skip_inside_check=skip_inside_check)
             if intersection:
                 no_collision = False
                 break
@@ -115,12 +117,12 @@ def is_overlapping_1D(x_min_1, x_max_1, x_min_2, x_max_2):
 
     @staticmethod
     def check_mesh_intersection(obj1: MeshObject, obj2: MeshObject, skip_inside_check: bool = False,
-                                bvh_cache: Optional[Dict[str, mathutils.bvhtree.BVHTree]] = None) \
-            -> Tuple[bool, Dict[str, mathutils.bvhtree.BVHTree]]:
+                                bvh_cache: Optional["BvhCache"] = None) -> Tuple[bool, "BvhCache"]:
         """
         Checks if the two objects are intersecting.
 
-        This will use BVH trees to check whether the objects are overlapping.
+        This will use BVH trees to check whether the objects are overlapping. The trees are taken from the bvh_cache,
+        so a tree is only built, if its object has been moved since the last check.
 
         It is further also checked if one object is completely inside the other.
         This check requires that both objects are watertight, have correct normals and are coherent.
@@ -129,39 +131,27 @@ def check_mesh_intersection(obj1: MeshObject, obj2: MeshObject, skip_inside_chec
         :param obj1: object 1 to check for intersection, must be a mesh
         :param obj2: object 2 to check for intersection, must be a mesh
         :param skip_inside_check: Disables checking whether one object is completely inside the other.
-        :param bvh_cache: Dict of all the bvh trees, removes the `obj` from the cache before adding it again.
+        :param bvh_cache: The cache of the meshes and bvh trees, if None is given a new cache is used.
         :return: True, if they are intersecting
         """
 
-        if bvh_cache is None:
-            bvh_cache = {}
+        if not isinstance(bvh_cache, BvhCache):
+            # earlier versions used a dict of bvh trees, which can not be reused
+            bvh_cache = BvhCache()
 
         # If one of the objects has no vertices, collision is impossible
         if len(obj1.get_mesh().vertices) == 0 or len(obj2.get_mesh().vertices) == 0:
             return False, bvh_cache
 
-        # create bvhtree for obj1
-        if obj1.get_name() not in bvh_cache:
-            obj1_BVHtree = obj1.create_bvh_tree()
-            bvh_cache[obj1.get_name()] = obj1_BVHtree
-        else:
-            obj1_BVHtree = bvh_cache[obj1.get_name()]
-
-        # create bvhtree for obj2
-        if obj2.get_name() not in bvh_cache:
-            obj2_BVHtree = obj2.create_bvh_tree()
-            bvh_cache[obj2.get_name()] = obj2_BVHtree
-        else:
-            obj2_BVHtree = bvh_cache[obj2.get_name()]
+        obj1_BVHtree = bvh_cache.get_world_bvh_tree(obj1)
+        obj2_BVHtree = bvh_cache.get_world_bvh_tree(obj2)
 
         # Check whether both meshes intersect
         inter = len(obj1_BVHtree.overlap(obj2_BVHtree)) > 0
 
         # Optionally check whether obj2 is contained in obj1
         if not inter and not skip_inside_check:
-            inter = CollisionUtility.is_point_inside_object(obj1, obj1_BVHtree,
-                                                            Matrix(obj2.get_local2world_mat()) @
-                                                            obj2.get_mesh().vertices[0].co)
+            inter = CollisionUtility.is_point_inside_local_bvh_tree(obj1_BVHtree, bvh_cache.get_world_point(obj2))
             if inter:
                 print("Warning: Detected that " + obj2.get_name() + " is completely inside " + obj1.get_name() +
                       ". This might be wrong, if " + obj1.get_name() +
@@ -170,8 +160,7 @@ def check_mesh_intersection(obj1: MeshObject, obj2: MeshObject, skip_inside_chec
 
         # Optionally check whether obj1 is contained in obj2
         if not inter and not skip_inside_check:
-            inter = CollisionUtility.is_point_inside_object(obj2, obj2_BVHtree, Matrix(obj1.get_local2world_mat())
-                                                            @ obj1.get_mesh().vertices[0].co)
+            inter = CollisionUtility.is_point_inside_local_bvh_tree(obj2_BVHtree, bvh_cache.get_world_point(obj1))
             if inter:
                 print("Warning: Detected that " + obj1.get_name() + " is completely inside " + obj2.get_name() +
                       ". This might be wrong, if " + obj2.get_name() + " is not water tight or has incorrect "
@@ -180,6 +169,40 @@ def check_mesh_intersection(obj1: MeshObject, obj2: MeshObject, skip_inside_chec
 
         return inter, bvh_cache
 
+    @staticmethod
+    def get_mesh_arrays(obj: MeshObject) -> Tuple[np.ndarray, np.ndarray]:
+        """ Returns the vertices and the triangles of the object's mesh in its local frame.
+
+        :param obj: The mesh object.
+        :return: The vertices with shape [V, 3] and the vertex indices of the triangles with shape [T, 3].
+        """
+        mesh = obj.get_mesh()
+        if len(mesh.loop_triangles) == 0 and len(mesh.polygons) > 0:
+            mesh.calc_loop_triangles()
+        vertices = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+        mesh.vertices.foreach_get("co", vertices)
+        triangles = np.empty(len(mesh.loop_triangles) * 3, dtype=np.int32)
+        mesh.loop_triangles.foreach_get("vertices", triangles)
+        return vertices.reshape(-1, 3), triangles.reshape(-1, 3)
+
+    @staticmethod
+    def is_point_inside_local_bvh_tree(bvh_tree: mathutils.bvhtree.BVHTree, point: np.ndarray) -> bool:
+        """ Checks whether the given point is inside the mesh of the bvh tree, both given in the same frame.
+
+        This only works if the mesh is watertight and has correct normals
+
+        :param bvh_tree: A bvh tree of the mesh.
+        :param point: The point to check in the frame of the bvh tree.
+        :return: True, if the point is inside the mesh
+        """
+        point = Vector(point)
+        # Look for closest point on the mesh
+        nearest, normal, _, _ = bvh_tree.find_nearest(point)
+        if nearest is None:
+            return False
+        # Compute dot product between direction and normal vector
+        return (nearest - point).normalized().dot(normal.normalized()) >= 0.0
+
     @staticmethod
     def is_point_inside_object(obj: MeshObject, obj_bvh_tree: mathutils.bvhtree.BVHTree,
                                point: Union[Vector, np.ndarray]) -> bool:
@@ -200,3 +223,196 @@ def is_point_inside_object(obj: MeshObject, obj_bvh_tree: mathutils.bvhtree.BVHT
         # Compute dot product between direction and normal vector
         a = p2.normalized().dot((Euler(obj.get_rotation_euler()).to_matrix() @ normal).normalized())
         return a >= 0.0
+
+
+class BvhCache:
+    """ Caches the meshes and the bvh trees of objects for collision checks.
+
+    Each mesh datablock is read once into a bmesh, which is identified by a hash of the mesh content. The hash is
+    also computed only once per datablock, so datablocks with the same content share one bmesh, e.g. the copies
+    created via `MeshObject.duplicate`. As each datablock is only read once, the cache expects that the meshes are
+    not edited while it is used, e.g. via `persist_transformation_into_mesh`. An edited mesh has to be removed via
+    `remove_mesh`.
+
+    `BVHTree.overlap` can only compare two trees in the same frame, so each object has a bvh tree in the world frame.
+    It is only rebuilt, if the pose of the object has changed. So when sampling the pose of one object, at most one
+    tree is built per try, while the trees of all other objects are reused. To build a tree, the cached bmesh is
+    transformed into the world frame and back afterwards, which avoids copying the mesh.
+    """
+
+    # after this many transformations, the bmesh is copied again from the unchanged one, so the rounding errors of
+    # transforming it back and forth do not accumulate
+    max_transformations = 50
+
+    def __init__(self):
+        # the content hash of each mesh datablock, identified by its name
+        self._content_hashes: Dict[str, str] = {}
+        # the unchanged bmesh, the bmesh used for building trees, the number of transformations applied to it and the
+        # first vertex of each mesh content
+        self._bmeshes: Dict[str, list] = {}
+        # the content hash, the local2world matrix and the bvh tree of each object, identified by its name
+        self._world_bvh_trees: Dict[str, Tuple[str, np.ndarray, mathutils.bvhtree.BVHTree]] = {}
+
+    def get_content_hash(self, obj: MeshObject) -> str:
+        """ Returns the hash of the content of the object's mesh, the mesh is read only once per datablock.
+
+        :param obj: The mesh object.
+        :return: The content hash.
+        """
+        mesh = obj.get_mesh()
+        if mesh.name not in self._content_hashes:
+            vertices, triangles = CollisionUtility.get_mesh_arrays(obj)
+            content_hash = hashlib.sha1(vertices.tobytes() + triangles.tobytes()).hexdigest()
+            self._content_hashes[mesh.name] = content_hash
+            if content_hash not in self._bmeshes:
+                unchanged_bmesh = bmesh.new()
+                unchanged_bmesh.from_mesh(mesh)
+                self._bmeshes[content_hash] = [unchanged_bmesh, unchanged_bmesh.copy(), 0,
+                                               vertices[0].astype(np.float64)]
+        return self._content_hashes[mesh.name]
+
+    def get_world_bvh_tree(self, obj: MeshObject) -> mathutils.bvhtree.BVHTree:
+        """ Returns the bvh tree of the object in the world frame, it is only built if the object has been moved.
+
+        :param obj: The mesh object.
+        :return: The bvh tree.
+        """
+        content_hash = self.get_content_hash(obj)
+        local2world = obj.get_local2world_mat()
+        cached = self._world_bvh_trees.get(obj.get_name())
+        if cached is None or cached[0] != content_hash or not np.array_equal(cached[1], local2world):
+            cached = (content_hash, local2world, self._build_world_bvh_tree(content_hash, local2world))
+            self._world_bvh_trees[obj.get_name()] = cached
+        return cached[2]
+
+    def get_world_point(self, obj: MeshObject) -> np.ndarray:
+        """ Returns the first vertex of the object in the world frame, which is used for the inside checks.
+
+        :param obj: The mesh object.
+        :return: The point in the world frame.
+        """
+        first_vertex = self._bmeshes[self.get_content_hash(obj)][3]
+        local2world = obj.get_local2world_mat()
+        return local2world[:3, :3] @ first_vertex + local2world[:3, 3]
+
+    def remove_mesh(self, obj: MeshObject):
+        """ Removes the mesh of the given object, this is necessary if the mesh has been edited.
+
+        :param obj: The object, whose mesh has been edited.
+        """
+        self._content_hashes.pop(obj.get_mesh().name, None)
+
+    def _build_world_bvh_tree(self, content_hash: str, local2world: np.ndarray) -> mathutils.bvhtree.BVHTree:
+        """ Builds the bvh tree of the given mesh content in the world frame.
+
+        :param content_hash: The content hash of the mesh.
+        :param local2world: The local2world matrix of the object.
+        :return: The bvh tree.
+        """
+        entry = self._bmeshes[content_hash]
+        unchanged_bmesh, bm, num_transformations, _ = entry
+        matrix = Matrix(local2world)
+        if abs(matrix.determinant()) < 1e-12:
+            # the transformation can not be reverted
+            bm = unchanged_bmesh.copy()
+            bm.transform(matrix)
+            return mathutils.bvhtree.BVHTree.FromBMesh(bm)
+        if num_transformations >= BvhCache.max_transformations:
+            bm.free()
+            bm = unchanged_bmesh.copy()
+            entry[1] = bm
+            num_transformations = 0
+        bm.transform(matrix)
+        bvh_tree = mathutils.bvhtree.BVHTree.FromBMesh(bm)
+        bm.transform(matrix.inverted())
+        entry[2] = num_transformations + 1
+        return bvh_tree
+
+
+class BoundingBoxCache:
+    """ Caches the axis-aligned world bounding boxes of objects in one array, such that the bounding box of an
+    object can be checked against the bounding boxes of many other objects at once.
+
+    Like the bvh cache, the bounding boxes are identified by the object names and are only recomputed, if the
+    local2world matrix of an object has changed since its bounding box was computed. If the mesh of an object has
+    been edited, its bounding box has to be removed via `remove`.
+    """
+
+    def __init__(self):
+        self._indices: Dict[str, int] = {}
+        # the min and max point of each bounding box, rows of removed objects are reused
+        self._bounds = np.empty((16, 2, 3))
+        # the local2world matrix of each object at the time its bounding box was computed
+        self._local2world_mats = np.empty((16, 4, 4))
+        self._free_indices: List[int] = []
+
+    def update(self, obj: MeshObject) -> np.ndarray:
+        """ Computes the bounding box of the given object and stores it in the cache.
+
+        :param obj: The object whose bounding box should be updated.
+        :return: The min and max point of the axis-aligned world bounding box.
+        """
+        return self._update(obj, obj.get_local2world_mat())
+
+    def remove(self, obj: MeshObject):
+        """ Removes the bounding box of the given object, this is necessary if the mesh of the object has been edited.
+
+        :param obj: The object to remove.
+        """
+        if obj.get_name() in self._indices:
+            self._free_indices.append(self._indices.pop(obj.get_name()))
+
+    def get_bounds(self, objects: List[MeshObject]) -> np.ndarray:
+        """ Returns the cached bounding boxes of the given objects, missing or outdated bounding boxes are computed.
+
+        :param objects: The objects whose bounding boxes should be returned.
+        :return: The min and max point of each axis-aligned world bounding box with shape [N, 2, 3].
+        """
+        indices = []
+        for obj in objects:
+            local2world = obj.get_local2world_mat()
+            index = self._indices.get(obj.get_name())
+            if index is None or not np.array_equal(self._local2world_mats[index], local2world):
+                self._update(obj, local2world)
+                index = self._indices[obj.get_name()]
+            indices.append(index)
+        return self._bounds[np.array(indices, dtype=int)]
+
+    def _update(self, obj: MeshObject, local2world: np.ndarray) -> np.ndarray:
+        """ Computes the bounding box of the given object and stores it together with the given local2world matrix.
+
+        :param obj: The object whose bounding box should be updated.
+        :param local2world: The current local2world matrix of the object.
+        :return: The min and max point of the axis-aligned world bounding box.
+        """
+        name = obj.get_name()
+        if name not in self._indices:
+            if self._free_indices:
+                self._indices[name] = self._free_indices.pop()
+            else:
+                if len(self._indices) == len(self._bounds):
+                    self._bounds = np.concatenate([self._bounds, np.empty_like(self._bounds)])
+                    self._local2world_mats = np.concatenate([self._local2world_mats,
+                                                             np.empty_like(self._local2world_mats)])
+                self._indices[name] = len(self._indices)
+        index = self._indices[name]
+        bound_box = obj.get_bound_box()
+        self._bounds[index] = np.min(bound_box, axis=0), np.max(bound_box, axis=0)
+        self._local2world_mats[index] = local2world
+        return self._bounds[index]
+
+    def get_intersecting_objects(self, obj: MeshObject, objects: List[MeshObject]) -> List[MeshObject]:
+        """ Returns the objects whose axis-aligned world bounding box intersects with the one of the given object.
+
+        The bounding box of `obj` is updated, the bounding boxes of the other objects are only computed, if they are
+        not cached yet or if the objects have been moved.
+
+        :param obj: The object, whose bounding box is recomputed.
+        :param objects: The objects to check against.
+        :return: The intersecting objects in the order in which they were given.
+        """
+        bounds = self.update(obj).copy()
+        other_bounds = self.get_bounds(objects)
+        # the same check as check_bb_intersection_on_values, but for all objects at once
+        intersecting = np.all((bounds[1] >= other_bounds[:, 0]) & (other_bounds[:, 1] >= bounds[0]), axis=1)
+        return [objects[i] for i in np.flatnonzero(intersecting)]
@@ -0,0 +1,235 @@
+"""Allows preparing scenes in separate worker processes, while the main process renders the prepared scenes."""
+
+import os
+import random
+import sys
+import warnings
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import bpy
+import numpy as np
+
+from blenderproc.python.camera import CameraUtility
+from blenderproc.python.types.EntityUtility import Entity
+from blenderproc.python.types.LightUtility import Light
+from blenderproc.python.types.MaterialUtility import Material
+from blenderproc.python.types.MeshObjectUtility import MeshObject
+from blenderproc.python.utility.SceneStateQueue import SceneStateQueue
+from blenderproc.python.utility.Utility import reset_keyframes
+
+
+def prepare_scenes(num_scenes: int, prepare_scene_func: Callable[[int], None], entities: List[Entity],
+                   materials: Optional[List[Material]] = None, max_pending_scenes: int = 4) -> Iterator[int]:
+    """ Prepares the given number of scenes and yields the index of each scene, once it is ready for rendering.
+
+    If BlenderProc is started via `blenderproc run --scene-workers N`, the scenes are prepared in N separate
+    blender processes, while the main process renders. The workers only send the resulting state of the scene to
+    the main process, which contains:
+
+    * the pose and the visibility of the given entities,
+    * the material slots of the given mesh objects,
+    * the color and the energy of the given lights,
+    * the values of all unconnected node inputs of the used and the given materials and
+    * the camera poses and intrinsics.
+
+    Everything else, e.g. loading the objects or creating the nodes of the materials, has to be done in the same
+    way in all processes before calling this function, as the entities and materials are identified by their names.
+    Without scene workers, the scenes are prepared one after another in the current process.
+
+    The workers run the same script as the main process. Once a worker has prepared all of its scenes, it exits
+    inside this function, so the body of the loop and everything after it, e.g. the writers, only run in the main
+    process. Work before this function, which only the main process needs, can be skipped via `is_scene_worker`.
+
+    If the environment variable BLENDER_PROC_RANDOM_SEED is set, the random generators are seeded per scene, so the
+    prepared scenes do not depend on the number of workers.
+
+    Example:
+
+    .. code-block:: python
+
+        for scene_index in bproc.utility.prepare_scenes(num_scenes, prepare_scene, objects + [light]):
+            data = bproc.renderer.render()
+            bproc.writer.write_hdf5(output_dir, data, append_to_existing_output=True)
+
+    :param num_scenes: The number of scenes to prepare.
+    :param prepare_scene_func: The function which prepares a scene, e.g. sampling object poses, running the physics
+                               simulation and sampling camera poses. It receives the index of the scene.
+    :param entities: The entities whose state is transferred from the workers to the main process.
+    :param materials: Further materials whose values are transferred, the materials of the given mesh objects
+                      are always transferred.
+    :param max_pending_scenes: The maximum number of prepared scenes, which wait for being rendered. This prevents
+                               the workers from running too far ahead.
+    :return: Iterator over the indices of the prepared scenes. In the worker processes nothing is yielded, instead
+             the process exits.
+    """
+    queue_dir = os.getenv("BLENDER_PROC_SCENE_QUEUE")
+    if queue_dir is None:
+        # No workers, so prepare the scenes one after another
+        for scene_index in range(num_scenes):
+            _ScenePreparationUtility.seed_random_generators(scene_index)
+            prepare_scene_func(scene_index)
+            yield scene_index
+        return
+
+    queue = SceneStateQueue(queue_dir)
+    num_workers = int(os.environ["BLENDER_PROC_NUM_SCENE_WORKERS"])
+    worker_id = os.getenv("BLENDER_PROC_SCENE_WORKER_ID")
+    if worker_id is not None:
+        # This is a worker, it prepares every num_workers-th scene
+        worker_id = int(worker_id)
+        for scene_index in range(worker_id, num_scenes, num_workers):
+            queue.wait_for_space(max_pending_scenes)
+            _ScenePreparationUtility.seed_random_generators(scene_index)
+            prepare_scene_func(scene_index)
+            state = capture_scene_state(entities, materials)
+            state["scene_index"] = scene_index
+            queue.put(state, worker_id, scene_index)
+            print(f"Prepared scene {scene_index}")
+        queue.mark_worker_done(worker_id)
+        # the rest of the script, e.g. rendering and writing, is only meant for the main process
+        print(f"Scene worker {worker_id} is done")
+        sys.exit(0)
+
+    # This is the main process, it applies the prepared scenes
+    num_prepared_scenes = 0
+    state = queue.get(num_workers)
+    while state is not None:
+        apply_scene_state(state, entities)
+        num_prepared_scenes += 1
+        yield state["scene_index"]
+        state = queue.get(num_workers)
+    if num_prepared_scenes < num_scenes:
+        warnings.warn(f"Only {num_prepared_scenes} of {num_scenes} scenes have been prepared, check the output of "
+                      f"the scene workers for errors.")
+
+
+def is_scene_worker() -> bool:
+    """ Returns whether this process is a scene worker, which only prepares scenes for the main process.
+
+    This can be used to skip work before `prepare_scenes`, which only the main process needs, e.g. setting up the
+    render outputs. Everything the prepared scenes depend on has to be done in all processes.
+
+    :return: True, if this process was started as a scene worker via `blenderproc run --scene-workers N`.
+    """
+    return os.getenv("BLENDER_PROC_SCENE_QUEUE") is not None and os.getenv("BLENDER_PROC_SCENE_WORKER_ID") is not None
+
+
+def capture_scene_state(entities: List[Entity], materials: Optional[List[Material]] = None) -> Dict[str, Any]:
+    """ Captures the state of the given entities, their materials and the camera, such that it can be serialized.
+
+    :param entities: The entities whose state should be captured.
+    :param materials: Further materials whose values should be captured.
+    :return: The state, which can be serialized via JSON.
+    """
+    used_materials = {} if materials is None else {material.get_name(): material for material in materials}
+    entity_states = {}
+    for entity in entities:
+        entity_state = {
+            "local2world": entity.get_local2world_mat().tolist(),
+            "hide_render": entity.blender_obj.hide_render
+        }
+        if isinstance(entity, MeshObject):
+            entity_materials = entity.get_materials()
+            entity_state["materials"] = [None if material is None else material.get_name()
+                                         for material in entity_materials]
+            used_materials.update({material.get_name(): material for material in entity_materials
+                                   if material is not None})
+        if isinstance(entity, Light):
+            entity_state["color"] = list(entity.get_color())
+            entity_state["energy"] = entity.get_energy()
+        entity_states[entity.get_name()] = entity_state
+
+    material_states = {}
+    for name, material in used_materials.items():
+        material_states[name] = {node.name: _ScenePreparationUtility.get_unconnected_input_values(node)
+                                 for node in material.nodes}
+
+    cam_ob = bpy.context.scene.camera
+    camera_state = {
+        "poses": [CameraUtility.get_camera_pose(frame).tolist()
+                  for frame in range(bpy.context.scene.frame_start, bpy.context.scene.frame_end)],
+        "data": {key: getattr(cam_ob.data, key) for key in _ScenePreparationUtility.camera_data_keys},
+        "render": {key: getattr(bpy.context.scene.render, key) for key in _ScenePreparationUtility.render_keys}
+    }
+    return {"entities": entity_states, "materials": material_states, "camera": camera_state}
+
+
+def apply_scene_state(state: Dict[str, Any], entities: List[Entity]):
+    """ Applies a state, which was captured via `capture_scene_state`, possibly in another blender process.
+
+    :param state: The captured state.
+    :param entities: The entities whose state should be applied, they are identified by their names.
+    """
+    entities_by_name = {entity.get_name(): entity for entity in entities}
+    for name, entity_state in state["entities"].items():
+        if name not in entities_by_name:
+            raise RuntimeError(f"The entity {name} of the prepared scene does not exist in this process. All "
+                               f"processes have to create the same entities.")
+        entity = entities_by_name[name]
+        entity.set_local2world_mat(np.array(entity_state["local2world"]))
+        entity.blender_obj.hide_render = entity_state["hide_render"]
+        if "materials" in entity_state:
+            for index, material_name in enumerate(entity_state["materials"]):
+                if material_name is not None:
+                    entity.set_material(index, Material(bpy.data.materials[material_name]))
+        if "color" in entity_state:
+            entity.set_color(entity_state["color"])
+            entity.set_energy(entity_state["energy"])
+
+    for name, node_states in state["materials"].items():
+        material = Material(bpy.data.materials[name])
+        for node_name, input_values in node_states.items():
+            if node_name not in material.nodes:
+                raise RuntimeError(f"The node {node_name} of the material {name} does not exist in this process. "
+                                   f"All processes have to create the same material nodes.")
+            inputs = material.nodes[node_name].inputs
+            for index, value in input_values.items():
+                inputs[int(index)].default_value = value
+
+    camera_state = state["camera"]
+    cam_ob = bpy.context.scene.camera
+    for key, value in camera_state["data"].items():
+        setattr(cam_ob.data, key, value)
+    for key, value in camera_state["render"].items():
+        setattr(bpy.context.scene.render, key, value)
+    reset_keyframes()
+    for cam2world_matrix in camera_state["poses"]:
+        CameraUtility.add_camera_pose(np.array(cam2world_matrix))
+
+
+class _ScenePreparationUtility:
+
+    # The properties of the camera data and the render settings, which define the intrinsics
+    camera_data_keys = ["type", "lens", "lens_unit", "sensor_width", "sensor_height", "sensor_fit", "shift_x",
+                        "shift_y", "clip_start", "clip_end"]
+    render_keys = ["resolution_x", "resolution_y", "resolution_percentage", "pixel_aspect_x", "pixel_aspect_y"]
+
+    @staticmethod
+    def seed_random_generators(scene_index: int):
+        """ Seeds the random generators per scene, if a random seed is given via BLENDER_PROC_RANDOM_SEED.
+
+        :param scene_index: The index of the scene.
+        """
+        random_seed = os.getenv("BLENDER_PROC_RANDOM_SEED")
+        if random_seed:
+            scene_seed = (int(random_seed) + scene_index) % 2 ** 32
+            random.seed(scene_seed)
+            np.random.seed(scene_seed)
+
+    @staticmethod
+    def get_unconnected_input_values(node: bpy.types.Node) -> Dict[str, Any]:
+        """ Returns the default values of all inputs of the node, which are not connected to another node.
+
+        :param node: The node.
+        :return: Maps the index of each unconnected input to its value.
+        """
+        values = {}
+        for index, node_input in enumerate(node.inputs):
+            if node_input.links or not hasattr(node_input, "default_value"):
+                continue
+            value = node_input.default_value
+            if isinstance(value, (bool, int, float, str)):
+                values[str(index)] = value
+            elif hasattr(value, "__len__") and all(isinstance(element, (int, float)) for element in value):
+                values[str(index)] = list(value)
+        return values
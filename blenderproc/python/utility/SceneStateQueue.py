@@ -0,0 +1,87 @@
+"""A queue of prepared scene states, which is shared between several blender processes via a directory."""
+
+import glob
+import json
+import os
+import time
+from typing import Any, Dict, Optional
+
+
+class SceneStateQueue:
+    """ Passes scene states from the scene preparation workers to the rendering process.
+
+    Each state is stored as one JSON file in the queue directory. A file is first written under a temporary name and
+    then renamed, so a reader never sees a partially written state. The rendering process claims a state by renaming
+    it, removes it after it has been applied and stops, when all workers are done and no state is left.
+
+    This module does not depend on blender.
+    """
+
+    def __init__(self, queue_dir: str):
+        """
+        :param queue_dir: The directory which contains the queued states.
+        """
+        self.queue_dir = queue_dir
+        os.makedirs(queue_dir, exist_ok=True)
+
+    def put(self, state: Dict[str, Any], worker_id: int, scene_index: int):
+        """ Adds the given state to the queue.
+
+        :param state: The scene state, has to be serializable via JSON.
+        :param worker_id: The id of the worker which prepared the state.
+        :param scene_index: The index of the prepared scene, states are consumed in the order of these indices.
+        """
+        path = os.path.join(self.queue_dir, f"state_{scene_index:08d}_{worker_id:03d}.json")
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(state, f, separators=(",", ":"))
+        os.replace(path + ".tmp", path)
+
+    def num_pending(self) -> int:
+        """ Returns the number of states, which have not been claimed yet.
+
+        :return: The number of pending states.
+        """
+        return len(glob.glob(os.path.join(self.queue_dir, "state_*.json")))
+
+    def wait_for_space(self, max_pending: int, poll_interval: float = 0.5):
+        """ Blocks until less than the given number of states are pending, so workers do not run too far ahead.
+
+        :param max_pending: The maximum number of pending states.
+        :param poll_interval: The seconds to wait between checking the queue.
+        """
+        while self.num_pending() >= max_pending:
+            time.sleep(poll_interval)
+
+    def mark_worker_done(self, worker_id: int):
+        """ Marks that the given worker will not add any further states.
+
+        :param worker_id: The id of the worker.
+        """
+        with open(os.path.join(self.queue_dir, f"worker_{worker_id:03d}.done"), "w", encoding="utf-8"):
+            pass
+
+    def get(self, num_workers: int, poll_interval: float = 0.5) -> Optional[Dict[str, Any]]:
+        """ Claims the pending state with the lowest scene index, blocks until a state is available.
+
+        :param num_workers: The number of workers, which add states to the queue.
+        :param poll_interval: The seconds to wait between checking the queue.
+        :return: The state or None, if all workers are done and all states have been claimed.
+        """
+        while True:
+            # check whether the workers are done before looking for states, so no state that is added in between
+            # can be missed
+            all_done = len(glob.glob(os.path.join(self.queue_dir, "worker_*.done"))) >= num_workers
+            for path in sorted(glob.glob(os.path.join(self.queue_dir, "state_*.json"))):
+                claimed_path = path[:-len(".json")] + ".claimed"
+                try:
+                    os.rename(path, claimed_path)
+                except FileNotFoundError:
+                    # another process claimed the state in the meantime
+                    continue
+                with open(claimed_path, "r", encoding="utf-8") as f:
+                    state = json.load(f)
+                os.remove(claimed_path)
+                return state
+            if all_done:
+                return None
+            time.sleep(poll_interval)
@@ -3,10 +3,12 @@
 import json
 import os
 import glob
-from typing import List, Optional
+from typing import List, Optional, Union, Dict, Any, Tuple, Iterator, BinaryIO
 import shutil
 import warnings
 import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
 
 import numpy as np
 import png
@@ -27,7 +29,8 @@ def write_bop(output_dir: str, target_objects: Optional[List[MeshObject]] = None
               color_file_format: str = "PNG", dataset: str = "", append_to_existing_output: bool = True,
               depth_scale: float = 1.0, jpg_quality: int = 95, save_world2cam: bool = True,
               ignore_dist_thres: float = 100., m2mm: bool = True, frames_per_chunk: int = 1000,
-              calc_mask_info_coco: bool = True, delta: int = 15):
+              calc_mask_info_coco: bool = True, delta: int = 15, num_worker_threads: int = 4,
+              instance_segmaps: Optional[List[np.ndarray]] = None, incremental_chunk_annotations: bool = False):
     """Write the BOP data
 
     :param output_dir: Path to the output directory.
@@ -51,11 +54,27 @@ def write_bop(output_dir: str, target_objects: Optional[List[MeshObject]] = None
     :param frames_per_chunk: Number of frames saved in each chunk (called scene in BOP)
     :param calc_mask_info_coco: Whether to calculate gt masks, gt info and gt coco annotations.
     :param delta: Tolerance used for estimation of the visibility masks.
+    :param num_worker_threads: The number of threads, which encode and write the color and depth images. If set to 0,
+                               all images are written on the main thread.
+    :param instance_segmaps: List of instance segmentation images, as returned by the renderer after calling
+                             `bproc.renderer.enable_segmentation_output(map_by=["instance"])`. If given, the gt masks
+                             and gt info are computed directly from these images and the silhouettes of the object
+                             meshes, which does not need the vispy renderer or an OpenGL context. In this case
+                             `delta` is not used, as the visible masks are taken from the segmentation.
+    :param incremental_chunk_annotations: If true, the annotations of a chunk, which is not full yet, are appended
+                                          to JSON-lines sidecar files (e.g. scene_gt.jsonl and scene_gt_coco.jsonl)
+                                          instead of loading and rewriting the chunk's JSON files in every run. Only
+                                          the new frames are read back for computing the masks, gt info and coco
+                                          annotations. The sidecars are compacted into the BOP JSON files as soon as
+                                          the chunk is full. Call `compact_bop_chunks` after the last run to also
+                                          compact the last chunk.
     """
     if depths is None:
         depths = []
     if colors is None:
         colors = []
+    # the native mask computation needs the instance segmentation of every frame
+    calc_masks_natively = calc_mask_info_coco and instance_segmaps is not None
 
     # Output paths.
     dataset_dir = os.path.join(output_dir, dataset)
@@ -99,13 +118,13 @@ def write_bop(output_dir: str, target_objects: Optional[List[MeshObject]] = None
         starting_frame_id = 0
         if last_chunk_dir:
             last_chunk_gt_fpath = os.path.join(last_chunk_dir, 'scene_gt.json')
-            chunk_gt = _BopWriterUtility.load_json(last_chunk_gt_fpath, keys_to_int=True)
 
             # Current chunk and frame ID's.
             starting_chunk_id = int(os.path.basename(last_chunk_dir))
-            starting_frame_id = int(sorted(chunk_gt.keys())[-1]) + 1
+            starting_frame_id = _BopWriterUtility.get_last_frame_id(last_chunk_gt_fpath) + 1
 
-            if starting_frame_id % frames_per_chunk == 0:
+            # a chunk without any complete frame, e.g. after a crash, is filled again
+            if starting_frame_id > 0 and starting_frame_id % frames_per_chunk == 0:
                 starting_chunk_id += 1
                 starting_frame_id = 0
 
@@ -114,12 +133,18 @@ def write_bop(output_dir: str, target_objects: Optional[List[MeshObject]] = None
     _BopWriterUtility.write_frames(chunks_dir, dataset_objects=dataset_objects, depths=depths, colors=colors,
                                    color_file_format=color_file_format, frames_per_chunk=frames_per_chunk,
                                    m2mm=m2mm, ignore_dist_thres=ignore_dist_thres, save_world2cam=save_world2cam,
-                                   depth_scale=depth_scale, jpg_quality=jpg_quality)
+                                   depth_scale=depth_scale, jpg_quality=jpg_quality,
+                                   num_worker_threads=num_worker_threads,
+                                   instance_segmaps=instance_segmaps if calc_masks_natively else None,
+                                   incremental_chunk_annotations=incremental_chunk_annotations)
 
     if calc_mask_info_coco:
-        # Set up the bop toolkit
-        SetupUtility.setup_pip(["git+https://github.com/thodan/bop_toolkit", "vispy>=0.6.5",
-                                "PyOpenGL==3.1.0"])
+        # Set up the bop toolkit, the vispy renderer is only needed, if the masks are not computed natively
+        if calc_masks_natively:
+            SetupUtility.setup_pip(["git+https://github.com/thodan/bop_toolkit"])
+        else:
+            SetupUtility.setup_pip(["git+https://github.com/thodan/bop_toolkit", "vispy>=0.6.5",
+                                    "PyOpenGL==3.1.0"])
 
         # determine which objects to add to the vsipy renderer
         # for numpy>=1.20, np.float is deprecated: https://numpy.org/doc/stable/release/1.20.0-notes.html#deprecations
@@ -131,14 +156,34 @@ def write_bop(output_dir: str, target_objects: Optional[List[MeshObject]] = None
         chunk_dir_ids = [d.split('/')[-1] for d in chunk_dirs]
         chunk_dirs = chunk_dirs[chunk_dir_ids.index(f"{starting_chunk_id:06d}"):]
 
-        _BopWriterUtility.calc_gt_masks(chunk_dirs=chunk_dirs, starting_frame_id=starting_frame_id,
-                                        dataset_objects=dataset_objects, delta=delta)
-        _BopWriterUtility.calc_gt_info(chunk_dirs=chunk_dirs, starting_frame_id=starting_frame_id,
-                                       dataset_objects=dataset_objects, delta=delta)
+        if not calc_masks_natively:
+            _BopWriterUtility.calc_gt_masks(chunk_dirs=chunk_dirs, starting_frame_id=starting_frame_id,
+                                            dataset_objects=dataset_objects, delta=delta)
+            _BopWriterUtility.calc_gt_info(chunk_dirs=chunk_dirs, starting_frame_id=starting_frame_id,
+                                           dataset_objects=dataset_objects, delta=delta)
         _BopWriterUtility.calc_gt_coco(chunk_dirs=chunk_dirs, dataset_objects=dataset_objects,
                                        starting_frame_id=starting_frame_id)
 
 
+def compact_bop_chunks(output_dir: str, dataset: str = ""):
+    """ Compacts the JSON-lines sidecars of all chunks into their BOP JSON files.
+
+    This is only needed, if `write_bop` was called with `incremental_chunk_annotations=True`, as the sidecars of the
+    last chunk are only compacted, when the chunk is full.
+
+    :param output_dir: Path to the output directory, the same as given to `write_bop`.
+    :param dataset: The dataset, the same as given to `write_bop`.
+    """
+    chunks_dir = os.path.join(output_dir, dataset, 'train_pbr')
+    for chunk_dir in sorted(glob.glob(os.path.join(chunks_dir, '*'))):
+        if os.path.isdir(chunk_dir):
+            for sidecar_path in glob.glob(os.path.join(chunk_dir, '*.jsonl')):
+                if os.path.basename(sidecar_path) == "scene_gt_coco.jsonl":
+                    _BopWriterUtility.compact_chunk_coco(os.path.splitext(sidecar_path)[0] + ".json")
+                else:
+                    _BopWriterUtility.compact_chunk_json(os.path.splitext(sidecar_path)[0] + ".json")
+
+
 class _BopWriterUtility:
     """ Saves the synthesized dataset in the BOP format. The dataset is split
         into chunks which are saved as individual "scenes". For more details
@@ -175,10 +220,12 @@ def save_json(path, content):
         From the BOP toolkit (https://github.com/thodan/bop_toolkit).
 
         :param path: Path to the output JSON file.
-        :param content: Dictionary/list to save.
+        :param content: Dictionary/list to save. The file is replaced atomically.
         """
         text = ""
-        with open(path, 'w', encoding="utf-8") as file:
+        # write into a temporary file first, such that the file at the given path is always complete
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w', encoding="utf-8") as file:
             if isinstance(content, dict):
                 text += '{\n'
                 content_sorted = sorted(content.items(), key=lambda x: x[0])
@@ -200,6 +247,222 @@ def save_json(path, content):
                 file.write(text)
             else:
                 json.dump(content, file, sort_keys=True)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def sidecar_path(path: str) -> str:
+        """ Returns the path of the JSON-lines sidecar, which belongs to the given chunk JSON file.
+
+        :param path: Path to a chunk JSON file, e.g. .../000000/scene_gt.json
+        :return: The path of the sidecar, e.g. .../000000/scene_gt.jsonl
+        """
+        return os.path.splitext(path)[0] + ".jsonl"
+
+    @staticmethod
+    def read_json_lines(path: str) -> List[Tuple[int, Any]]:
+        """ Reads the entries of a JSON-lines sidecar. An incomplete last line, e.g. due to a crash while
+        appending, is ignored.
+
+        :param path: Path to the sidecar.
+        :return: The (im_id, content) pairs in the order they were appended.
+        """
+        entries = []
+        if not os.path.exists(path):
+            return entries
+        with open(path, 'r', encoding="utf-8") as f:
+            for line in f:
+                if not line.endswith('\n'):
+                    break
+                entry = json.loads(line)
+                entries.append((int(entry["im_id"]), entry["data"]))
+        return entries
+
+    @staticmethod
+    def read_json_lines_reversed(path: str, block_size: int = 65536) -> Iterator[Tuple[int, Any]]:
+        """ Reads the entries of a JSON-lines sidecar backwards, starting with the last complete line. So the last
+        entries can be read without reading the whole file. An incomplete last line is ignored.
+
+        :param path: Path to the sidecar.
+        :param block_size: The number of bytes which are read at once.
+        :return: The (im_id, content) pairs in the reversed order they were appended.
+        """
+        if not os.path.exists(path):
+            return
+        with open(path, 'rb') as f:
+            end = _BopWriterUtility.find_end_of_complete_lines(f, block_size)
+            # the beginning of the last line, which has not been parsed yet
+            rest = b''
+            while end > 0:
+                start = max(0, end - block_size)
+                f.seek(start)
+                data = f.read(end - start) + rest
+                end = start
+                lines = data.split(b'\n')
+                # the first line might be incomplete, except at the beginning of the file
+                rest = lines[0] if end > 0 else b''
+                for line in reversed(lines[1:] if end > 0 else lines):
+                    if line:
+                        entry = json.loads(line)
+                        yield int(entry["im_id"]), entry["data"]
+
+    @staticmethod
+    def find_end_of_complete_lines(f: BinaryIO, block_size: int = 65536) -> int:
+        """ Returns the position after the last newline of the given file. Only the last byte is read, if the file
+        ends with a newline.
+
+        :param f: The file opened in binary mode.
+        :param block_size: The number of bytes which are read at once, while looking for the last newline.
+        :return: The number of bytes of all complete lines.
+        """
+        end = f.seek(0, os.SEEK_END)
+        if end == 0:
+            return 0
+        f.seek(end - 1)
+        if f.read(1) == b'\n':
+            return end
+        # the last line is incomplete, look for the newline before it
+        while end > 0:
+            start = max(0, end - block_size)
+            f.seek(start)
+            newline_pos = f.read(end - start).rfind(b'\n')
+            if newline_pos >= 0:
+                return start + newline_pos + 1
+            end = start
+        return 0
+
+    @staticmethod
+    def append_json_lines(path: str, content: Dict[int, Any]):
+        """ Appends the given entries to a JSON-lines sidecar, one line per frame.
+
+        :param path: Path to the sidecar.
+        :param content: Maps the im_id of each new frame to its annotation.
+        """
+        if not content:
+            return
+        with open(path, 'ab+') as f:
+            # drop an incomplete last line, which could be left over from a crash
+            size = f.seek(0, os.SEEK_END)
+            end = _BopWriterUtility.find_end_of_complete_lines(f)
+            if end != size:
+                f.truncate(end)
+            for im_id in sorted(content.keys()):
+                f.write((json.dumps({"im_id": im_id, "data": content[im_id]}, sort_keys=True) + '\n').encode("utf-8"))
+
+    @staticmethod
+    def load_chunk_json(path: str, min_im_id: int = 0) -> Dict[int, Any]:
+        """ Loads the annotations of a chunk, which are stored in the BOP JSON file and its JSON-lines sidecar.
+
+        :param path: Path to the chunk JSON file, e.g. .../000000/scene_gt.json
+        :param min_im_id: Only the frames starting with this im_id are needed. If they are all in the sidecar, only
+                          the end of the sidecar is read.
+        :return: Maps the im_id of each frame to its annotation. If min_im_id is given, it might also contain frames
+                 with a smaller im_id.
+        """
+        content = {}
+        sidecar_path = _BopWriterUtility.sidecar_path(path)
+        if min_im_id > 0 and os.path.exists(sidecar_path):
+            # the frames are appended in the order of their im_ids, so the new frames are at the end
+            for im_id, data in _BopWriterUtility.read_json_lines_reversed(sidecar_path):
+                content[im_id] = data
+                if im_id <= min_im_id:
+                    return content
+        if os.path.exists(path):
+            content = _BopWriterUtility.load_json(path, keys_to_int=True)
+        content.update(_BopWriterUtility.read_json_lines(sidecar_path))
+        return content
+
+    @staticmethod
+    def save_chunk_json(path: str, content: Dict[int, Any], incremental: bool = False, chunk_is_full: bool = True):
+        """ Saves the annotations of a chunk.
+
+        :param path: Path to the chunk JSON file, e.g. .../000000/scene_gt.json
+        :param content: Maps the im_id of each frame to its annotation. If incremental is True, only the new frames,
+                        otherwise all frames of the chunk.
+        :param incremental: If True, the new frames are appended to the JSON-lines sidecar.
+        :param chunk_is_full: If True, the sidecar is compacted into the BOP JSON file.
+        """
+        sidecar_path = _BopWriterUtility.sidecar_path(path)
+        if incremental:
+            _BopWriterUtility.append_json_lines(sidecar_path, content)
+            if chunk_is_full:
+                _BopWriterUtility.compact_chunk_json(path)
+        else:
+            _BopWriterUtility.save_json(path, content)
+            if os.path.exists(sidecar_path):
+                os.remove(sidecar_path)
+
+    @staticmethod
+    def compact_chunk_json(path: str):
+        """ Merges the JSON-lines sidecar of a chunk into its BOP JSON file and removes the sidecar.
+
+        :param path: Path to the chunk JSON file, e.g. .../000000/scene_gt.json
+        """
+        sidecar_path = _BopWriterUtility.sidecar_path(path)
+        if os.path.exists(sidecar_path):
+            # the JSON file is replaced atomically, before the sidecar is removed, so no frame can get lost
+            _BopWriterUtility.save_json(path, _BopWriterUtility.load_chunk_json(path))
+            os.remove(sidecar_path)
+
+    @staticmethod
+    def save_coco_json(path: str, content: Dict[str, Any]):
+        """ Saves the COCO annotations of a chunk, the file is replaced atomically.
+
+        :param path: Path to the COCO JSON file, e.g. .../000000/scene_gt_coco.json
+        :param content: The COCO annotations.
+        """
+        with open(path + ".tmp", 'w', encoding='utf-8') as output_json_file:
+            json.dump(content, output_json_file)
+        os.replace(path + ".tmp", path)
+
+    @staticmethod
+    def load_chunk_coco(path: str) -> Dict[str, Any]:
+        """ Loads the COCO annotations of a chunk, which are stored in the COCO JSON file and its JSON-lines sidecar.
+
+        :param path: Path to the COCO JSON file, e.g. .../000000/scene_gt_coco.json
+        :return: The COCO annotations.
+        """
+        content = _BopWriterUtility.load_json(path)
+        for _, frame in _BopWriterUtility.read_json_lines(_BopWriterUtility.sidecar_path(path)):
+            content["images"].append(frame["image"])
+            content["annotations"].extend(frame["annotations"])
+        return content
+
+    @staticmethod
+    def compact_chunk_coco(path: str):
+        """ Merges the JSON-lines sidecar of a chunk into its COCO JSON file and removes the sidecar.
+
+        :param path: Path to the COCO JSON file, e.g. .../000000/scene_gt_coco.json
+        """
+        sidecar_path = _BopWriterUtility.sidecar_path(path)
+        if os.path.exists(sidecar_path):
+            _BopWriterUtility.save_coco_json(path, _BopWriterUtility.load_chunk_coco(path))
+            os.remove(sidecar_path)
+
+    @staticmethod
+    def get_next_coco_annotation_id(path: str) -> int:
+        """ Returns the id for the next COCO annotation of a chunk. If the chunk has a sidecar, it is read backwards
+        until the last frame with annotations is found.
+
+        :param path: Path to the COCO JSON file, e.g. .../000000/scene_gt_coco.json
+        :return: The largest annotation id of the chunk plus one.
+        """
+        for _, frame in _BopWriterUtility.read_json_lines_reversed(_BopWriterUtility.sidecar_path(path)):
+            if frame["annotations"]:
+                return max(annotation["id"] for annotation in frame["annotations"]) + 1
+        annotations = _BopWriterUtility.load_json(path)["annotations"] if os.path.exists(path) else []
+        return max((annotation["id"] for annotation in annotations), default=0) + 1
+
+    @staticmethod
+    def get_last_frame_id(path: str) -> int:
+        """ Returns the id of the last frame in a chunk. If the chunk has a sidecar, only its last line is parsed.
+
+        :param path: Path to the chunk JSON file, e.g. .../000000/scene_gt.json
+        :return: The largest im_id of the chunk or -1, if the chunk does not contain any complete frame yet.
+        """
+        for im_id, _ in _BopWriterUtility.read_json_lines_reversed(_BopWriterUtility.sidecar_path(path)):
+            return im_id
+        im_ids = _BopWriterUtility.load_chunk_json(path).keys()
+        return max(im_ids) if im_ids else -1
 
     @staticmethod
     def save_depth(path: str, im: np.ndarray):
@@ -241,13 +504,15 @@ def write_camera(camera_path: str, depth_scale: float = 1.0):
 
     @staticmethod
     def get_frame_gt(dataset_objects: List[bpy.types.Mesh], unit_scaling: float, ignore_dist_thres: float,
-                     destination_frame: Optional[List[str]] = None):
+                     destination_frame: Optional[List[str]] = None, return_mesh_poses: bool = False):
         """ Returns GT pose annotations between active camera and objects.
         :param dataset_objects: Save annotations for these objects.
         :param unit_scaling: 1000. for outputting poses in mm
         :param ignore_dist_thres: Distance between camera and object after which object is ignored.
                                   Mostly due to failed physics.
         :param destination_frame: Transform poses from Blender internal coordinates to OpenCV coordinates
+        :param return_mesh_poses: If True, additionally the mesh object of each annotation is returned together with
+                                  its full (scaled) model to camera transformation in meters.
         :return: A list of GT camera-object pose annotations for scene_gt.json
         """
         if destination_frame is None:
@@ -257,6 +522,7 @@ def get_frame_gt(dataset_objects: List[bpy.types.Mesh], unit_scaling: float, ign
                                                                local_frame_change=destination_frame))
 
         frame_gt = []
+        mesh_poses = []
         for obj in dataset_objects:
             if isinstance(obj, Link):
                 if not obj.visuals:
@@ -264,8 +530,10 @@ def get_frame_gt(dataset_objects: List[bpy.types.Mesh], unit_scaling: float, ign
                 if len(obj.visuals) > 1:
                     warnings.warn('BOP Writer only supports saving poses of one visual mesh per Link')
                 H_m2w = Matrix(obj.get_visual_local2world_mats()[0])
+                mesh_obj = obj.visuals[0]
             else:
                 H_m2w = Matrix(obj.get_local2world_mat())
+                mesh_obj = obj
                 assert obj.has_cp("category_id"), f"{obj.get_name()} object has no custom property 'category_id'"
 
             cam_H_m2c = H_c2w_opencv.inverted() @ H_m2w
@@ -281,6 +549,7 @@ def get_frame_gt(dataset_objects: List[bpy.types.Mesh], unit_scaling: float, ign
                     'obj_id': obj.get_cp("category_id") if not isinstance(obj, Link) else obj.visuals[0].get_cp(
                         'category_id')
                 })
+                mesh_poses.append((mesh_obj, np.array(cam_H_m2c)))
             else:
                 print('ignored obj, ', obj.get_cp("category_id"), 'because either ')
                 print('(1) it is further away than parameter "ignore_dist_thres: ",', ignore_dist_thres)
@@ -288,6 +557,8 @@ def get_frame_gt(dataset_objects: List[bpy.types.Mesh], unit_scaling: float, ign
                 print('or')
                 print('(2) the object pose has not been given in meters')
 
+        if return_mesh_poses:
+            return frame_gt, mesh_poses
         return frame_gt
 
     @staticmethod
@@ -328,9 +599,15 @@ def get_frame_camera(save_world2cam: bool, depth_scale: float = 1.0, unit_scalin
     def write_frames(chunks_dir: str, dataset_objects: list, depths: Optional[List[np.ndarray]] = None,
                      colors: Optional[List[np.ndarray]] = None, color_file_format: str = "PNG",
                      depth_scale: float = 1.0, frames_per_chunk: int = 1000, m2mm: bool = True,
-                     ignore_dist_thres: float = 100., save_world2cam: bool = True, jpg_quality: int = 95):
+                     ignore_dist_thres: float = 100., save_world2cam: bool = True, jpg_quality: int = 95,
+                     num_worker_threads: int = 4, instance_segmaps: Optional[List[np.ndarray]] = None,
+                     incremental_chunk_annotations: bool = False):
         """Write each frame's ground truth into chunk directory in BOP format
 
+        The ground truth is extracted on the main thread, while the color and depth images are encoded and written
+        on a pool of worker threads. The scene_gt.json and scene_camera.json of a chunk are only written, once all
+        images of the chunk have been written.
+
         :param chunks_dir: Path to the output directory of the current chunk.
         :param dataset_objects: Save annotations for these objects.
         :param depths: List of depth images in m to save
@@ -345,6 +622,12 @@ def write_frames(chunks_dir: str, dataset_objects: list, depths: Optional[List[n
         :param m2mm: Original bop annotations and models are in mm. If true, we convert the gt annotations
                      to mm here. This is needed if BopLoader option mm2m is used.
         :param frames_per_chunk: Number of frames saved in each chunk (called scene in BOP)
+        :param num_worker_threads: The number of threads, which encode and write the color and depth images. If set
+                                   to 0, all images are written on the main thread.
+        :param instance_segmaps: List of instance segmentation images. If given, the gt masks and the
+                                 scene_gt_info.json are computed from them, see `calc_frame_gt_masks_and_info`.
+        :param incremental_chunk_annotations: If true, the annotations of chunks, which are not full yet, are appended
+                                              to JSON-lines sidecar files, see `write_bop`.
         """
         if depths is None:
             depths = []
@@ -358,6 +641,8 @@ def write_frames(chunks_dir: str, dataset_objects: list, depths: Optional[List[n
         depth_tpath = os.path.join(chunks_dir, '{chunk_id:06d}', 'depth', '{im_id:06d}' + depth_ext)
         chunk_camera_tpath = os.path.join(chunks_dir, '{chunk_id:06d}', 'scene_camera.json')
         chunk_gt_tpath = os.path.join(chunks_dir, '{chunk_id:06d}', 'scene_gt.json')
+        chunk_gt_info_tpath = os.path.join(chunks_dir, '{chunk_id:06d}', 'scene_gt_info.json')
+        chunk_mask_dir_tpath = os.path.join(chunks_dir, '{chunk_id:06d}', '{mask_type}')
 
         # Paths to the already existing chunk folders (such folders may exist
         # when appending to an existing dataset).
@@ -370,28 +655,31 @@ def write_frames(chunks_dir: str, dataset_objects: list, depths: Optional[List[n
         if len(chunk_dirs):
             last_chunk_dir = sorted(chunk_dirs)[-1]
             last_chunk_gt_fpath = os.path.join(last_chunk_dir, 'scene_gt.json')
-            chunk_gt = _BopWriterUtility.load_json(last_chunk_gt_fpath, keys_to_int=True)
 
             # Last chunk and frame ID's.
             last_chunk_id = int(os.path.basename(last_chunk_dir))
-            last_frame_id = int(sorted(chunk_gt.keys())[-1])
+            last_frame_id = _BopWriterUtility.get_last_frame_id(last_chunk_gt_fpath)
 
             # Current chunk and frame ID's.
             curr_chunk_id = last_chunk_id
             curr_frame_id = last_frame_id + 1
-            if curr_frame_id % frames_per_chunk == 0:
+            # a chunk without any complete frame, e.g. after a crash, is filled again
+            if curr_frame_id > 0 and curr_frame_id % frames_per_chunk == 0:
                 curr_chunk_id += 1
                 curr_frame_id = 0
 
         # Initialize structures for the GT annotations and camera info.
         chunk_gt = {}
         chunk_camera = {}
-        if curr_frame_id != 0:
+        chunk_gt_info = {}
+        if curr_frame_id != 0 and not incremental_chunk_annotations:
             # Load GT and camera info of the chunk we are appending to.
-            chunk_gt = _BopWriterUtility.load_json(
-                chunk_gt_tpath.format(chunk_id=curr_chunk_id), keys_to_int=True)
-            chunk_camera = _BopWriterUtility.load_json(
-                chunk_camera_tpath.format(chunk_id=curr_chunk_id), keys_to_int=True)
+            chunk_gt = _BopWriterUtility.load_chunk_json(chunk_gt_tpath.format(chunk_id=curr_chunk_id))
+            chunk_camera = _BopWriterUtility.load_chunk_json(chunk_camera_tpath.format(chunk_id=curr_chunk_id))
+            if instance_segmaps is not None:
+                chunk_gt_info = _BopWriterUtility.load_chunk_json(chunk_gt_info_tpath.format(chunk_id=curr_chunk_id))
+        # The triangles of each mesh, only needed for the native mask computation.
+        mesh_triangles: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
 
         # Go through all frames.
         num_new_frames = bpy.context.scene.frame_end - bpy.context.scene.frame_start
@@ -400,80 +688,342 @@ def write_frames(chunks_dir: str, dataset_objects: list, depths: Optional[List[n
             raise Exception("The amount of images stored in the depths/colors does not correspond to the amount"
                             "of images specified by frame_start to frame_end.")
 
-        for frame_id in range(bpy.context.scene.frame_start, bpy.context.scene.frame_end):
-            # Activate frame.
-            bpy.context.scene.frame_set(frame_id)
-
-            # Reset data structures and prepare folders for a new chunk.
-            if curr_frame_id == 0:
-                chunk_gt = {}
-                chunk_camera = {}
-                os.makedirs(os.path.dirname(
-                    rgb_tpath.format(chunk_id=curr_chunk_id, im_id=0, im_type='PNG')))
-                os.makedirs(os.path.dirname(
-                    depth_tpath.format(chunk_id=curr_chunk_id, im_id=0)))
-
-            # Get GT annotations and camera info for the current frame.
-
-            # Output translation gt in m or mm
-            unit_scaling = 1000. if m2mm else 1.
-
-            chunk_gt[curr_frame_id] = _BopWriterUtility.get_frame_gt(dataset_objects, unit_scaling, ignore_dist_thres)
-            chunk_camera[curr_frame_id] = _BopWriterUtility.get_frame_camera(save_world2cam, depth_scale, unit_scaling)
-
-            if colors:
-                color_rgb = colors[frame_id]
-                color_bgr = color_rgb.copy()
-                color_bgr[..., :3] = color_bgr[..., :3][..., ::-1]
-                if color_file_format == 'PNG':
-                    rgb_fpath = rgb_tpath.format(chunk_id=curr_chunk_id, im_id=curr_frame_id, im_type='.png')
-                    cv2.imwrite(rgb_fpath, color_bgr)
-                elif color_file_format == 'JPEG':
-                    rgb_fpath = rgb_tpath.format(chunk_id=curr_chunk_id, im_id=curr_frame_id, im_type='.jpg')
-                    cv2.imwrite(rgb_fpath, color_bgr, [int(cv2.IMWRITE_JPEG_QUALITY), jpg_quality])
-            else:
-                rgb_output = Utility.find_registered_output_by_key("colors")
-                if rgb_output is None:
-                    raise Exception("RGB image has not been rendered.")
-                color_ext = '.png' if rgb_output['path'].endswith('png') else '.jpg'
-                # Copy the resulting RGB image.
+        # The images are encoded and written on worker threads, while the blender state is only accessed here.
+        # The amount of frames waiting for a worker is limited, such that not all images are kept in memory.
+        executor = ThreadPoolExecutor(max_workers=num_worker_threads, thread_name_prefix="BopWriter") \
+            if num_worker_threads > 0 else None
+        free_slots = threading.BoundedSemaphore(2 * max(1, num_worker_threads))
+        pending: List[Tuple[int, Future]] = []
+
+        try:
+            for frame_id in range(bpy.context.scene.frame_start, bpy.context.scene.frame_end):
+                # Activate frame.
+                bpy.context.scene.frame_set(frame_id)
+
+                # Reset data structures and prepare folders for a new chunk.
+                if curr_frame_id == 0:
+                    chunk_gt = {}
+                    chunk_camera = {}
+                    chunk_gt_info = {}
+                    os.makedirs(os.path.dirname(
+                        rgb_tpath.format(chunk_id=curr_chunk_id, im_id=0, im_type='PNG')), exist_ok=True)
+                    os.makedirs(os.path.dirname(
+                        depth_tpath.format(chunk_id=curr_chunk_id, im_id=0)), exist_ok=True)
+                if instance_segmaps is not None:
+                    for mask_type in ["mask", "mask_visib"]:
+                        os.makedirs(chunk_mask_dir_tpath.format(chunk_id=curr_chunk_id, mask_type=mask_type),
+                                    exist_ok=True)
+
+                # Get GT annotations and camera info for the current frame.
+
+                # Output translation gt in m or mm
+                unit_scaling = 1000. if m2mm else 1.
+
+                chunk_gt[curr_frame_id], mesh_poses = _BopWriterUtility.get_frame_gt(
+                    dataset_objects, unit_scaling, ignore_dist_thres, return_mesh_poses=True)
+                chunk_camera[curr_frame_id] = _BopWriterUtility.get_frame_camera(save_world2cam, depth_scale,
+                                                                                 unit_scaling)
+
+                # Collect everything the workers need, such that they do not have to access the blender state.
+                if colors:
+                    color_source = colors[frame_id]
+                    color_ext = '.png' if color_file_format == 'PNG' else '.jpg'
+                else:
+                    rgb_output = Utility.find_registered_output_by_key("colors")
+                    if rgb_output is None:
+                        raise Exception("RGB image has not been rendered.")
+                    color_ext = '.png' if rgb_output['path'].endswith('png') else '.jpg'
+                    color_source = rgb_output['path'] % frame_id
                 rgb_fpath = rgb_tpath.format(chunk_id=curr_chunk_id, im_id=curr_frame_id, im_type=color_ext)
-                shutil.copyfile(rgb_output['path'] % frame_id, rgb_fpath)
 
-            if depths:
-                depth = depths[frame_id]
-            else:
-                # Load the resulting dist image.
-                dist_output = Utility.find_registered_output_by_key("distance")
-                if dist_output is None:
-                    raise Exception("Distance image has not been rendered.")
-                distance = _WriterUtility.load_output_file(resolve_path(dist_output['path'] % frame_id), remove=False)
-                depth = dist2depth(distance)
+                if depths:
+                    depth_source = depths[frame_id]
+                else:
+                    dist_output = Utility.find_registered_output_by_key("distance")
+                    if dist_output is None:
+                        raise Exception("Distance image has not been rendered.")
+                    depth_source = resolve_path(dist_output['path'] % frame_id)
+                depth_fpath = depth_tpath.format(chunk_id=curr_chunk_id, im_id=curr_frame_id)
+                cam_K = np.array(chunk_camera[curr_frame_id]['cam_K']).reshape(3, 3)
+
+                mask_args = None
+                if instance_segmaps is not None:
+                    # the object geometry in camera coordinates is read here, the rasterization happens on the workers
+                    mask_args = (chunk_mask_dir_tpath.format(chunk_id=curr_chunk_id, mask_type='{mask_type}'),
+                                 curr_frame_id, instance_segmaps[frame_id],
+                                 _BopWriterUtility.get_silhouette_geometry(mesh_poses, mesh_triangles))
+
+                write_args = (rgb_fpath, color_source, color_file_format, jpg_quality, depth_fpath, depth_source,
+                              cam_K, depth_scale, mask_args)
+                if executor is None:
+                    frame_gt_info = _BopWriterUtility.write_frame_images(*write_args)
+                    if frame_gt_info is not None:
+                        chunk_gt_info[curr_frame_id] = frame_gt_info
+                else:
+                    # block until a worker is free, this avoids piling up the images of too many frames
+                    free_slots.acquire()
+                    try:
+                        future = executor.submit(_BopWriterUtility.write_frame_images, *write_args)
+                    except BaseException:
+                        free_slots.release()
+                        raise
+                    future.add_done_callback(lambda _: free_slots.release())
+                    pending.append((curr_frame_id, future))
+
+                # Save the chunk info if we are at the end of a chunk or at the last new frame.
+                chunk_is_full = (curr_frame_id + 1) % frames_per_chunk == 0
+                if chunk_is_full or (frame_id == num_new_frames - 1):
+                    # Only write the chunk info, once all of its images are on disc.
+                    for pending_frame_id, future in pending:
+                        frame_gt_info = future.result()
+                        if frame_gt_info is not None:
+                            chunk_gt_info[pending_frame_id] = frame_gt_info
+                    pending = []
+
+                    if instance_segmaps is not None:
+                        _BopWriterUtility.save_chunk_json(chunk_gt_info_tpath.format(chunk_id=curr_chunk_id),
+                                                          chunk_gt_info, incremental_chunk_annotations, chunk_is_full)
+
+                    # Save GT annotations.
+                    _BopWriterUtility.save_chunk_json(chunk_gt_tpath.format(chunk_id=curr_chunk_id), chunk_gt,
+                                                      incremental_chunk_annotations, chunk_is_full)
+
+                    # Save camera info.
+                    _BopWriterUtility.save_chunk_json(chunk_camera_tpath.format(chunk_id=curr_chunk_id),
+                                                      chunk_camera, incremental_chunk_annotations, chunk_is_full)
+
+                    # Update ID's.
+                    curr_chunk_id += 1
+                    curr_frame_id = 0
+                else:
+                    curr_frame_id += 1
+
+            for _, future in pending:
+                future.result()
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=True)
 
-            # Scale the depth to retain a higher precision (the depth is saved
-            # as a 16-bit PNG image with range 0-65535).
-            depth_mm = 1000.0 * depth  # [m] -> [mm]
-            depth_mm_scaled = depth_mm / float(depth_scale)
+    @staticmethod
+    def write_frame_images(rgb_fpath: str, color_source: Union[np.ndarray, str], color_file_format: str,
+                           jpg_quality: int, depth_fpath: str, depth_source: Union[np.ndarray, str],
+                           cam_K: np.ndarray, depth_scale: float, mask_args: Optional[tuple] = None) \
+            -> Optional[List[Dict[str, Any]]]:
+        """ Writes the color and depth image of a single frame. Does not access the blender state, such that it can
+        be called from a worker thread.
+
+        :param rgb_fpath: Path to the output color image.
+        :param color_source: Either the color image in RGB or the path of the rendered color image, which is copied.
+        :param color_file_format: File type to save color images. Available: "PNG", "JPEG"
+        :param jpg_quality: If color_file_format is "JPEG", save with the given quality.
+        :param depth_fpath: Path to the output depth image.
+        :param depth_source: Either the depth image in m or the path of the rendered distance image.
+        :param cam_K: The camera intrinsics of the frame, used to convert the distance into depth.
+        :param depth_scale: Multiply the uint16 output depth image with this factor to get depth in mm.
+        :param mask_args: If given, the gt masks of the frame are computed and written as well. These are the
+                          arguments of `calc_frame_gt_masks_and_info` except for the depth and intrinsics.
+        :return: The gt info of the frame, if mask_args were given.
+        """
+        if isinstance(color_source, str):
+            # Copy the resulting RGB image.
+            shutil.copyfile(color_source, rgb_fpath)
+        else:
+            color_bgr = color_source.copy()
+            color_bgr[..., :3] = color_bgr[..., :3][..., ::-1]
+            if color_file_format == 'PNG':
+                cv2.imwrite(rgb_fpath, color_bgr)
+            elif color_file_format == 'JPEG':
+                cv2.imwrite(rgb_fpath, color_bgr, [int(cv2.IMWRITE_JPEG_QUALITY), jpg_quality])
+
+        if isinstance(depth_source, str):
+            # Load the resulting dist image.
+            distance = _WriterUtility.load_output_file(depth_source, remove=False)
+            depth = dist2depth(distance, cam_K)
+        else:
+            depth = depth_source
+
+        # Scale the depth to retain a higher precision (the depth is saved
+        # as a 16-bit PNG image with range 0-65535).
+        depth_mm = 1000.0 * depth  # [m] -> [mm]
+        depth_mm_scaled = depth_mm / float(depth_scale)
+
+        # Save the scaled depth image.
+        _BopWriterUtility.save_depth(depth_fpath, depth_mm_scaled.copy())
+
+        if mask_args is not None:
+            mask_dir_tpath, im_id, instance_segmap, silhouettes = mask_args
+            # use the depth as it is stored in the depth image, such that px_count_valid matches the dataset
+            stored_depth = np.round(np.minimum(depth_mm_scaled, 65535))
+            return _BopWriterUtility.calc_frame_gt_masks_and_info(mask_dir_tpath, im_id, instance_segmap,
+                                                                  stored_depth, silhouettes, cam_K)
+        return None
 
-            # Save the scaled depth image.
-            depth_fpath = depth_tpath.format(chunk_id=curr_chunk_id, im_id=curr_frame_id)
-            _BopWriterUtility.save_depth(depth_fpath, depth_mm_scaled)
+    @staticmethod
+    def get_silhouette_geometry(mesh_poses: List[Tuple[MeshObject, np.ndarray]],
+                                mesh_triangles: Dict[str, Tuple[np.ndarray, np.ndarray]]) \
+            -> List[Tuple[int, np.ndarray, np.ndarray]]:
+        """ Collects the geometry of the annotated objects in camera coordinates, which is needed to rasterize
+        their unoccluded silhouettes.
+
+        :param mesh_poses: The mesh objects of the annotations and their model to camera transformations, as
+                           returned by `get_frame_gt`.
+        :param mesh_triangles: Caches the local vertices and triangle indices of each mesh, is filled on the fly.
+        :return: For each annotation: the instance id (pass index), the vertices in camera coordinates [N, 3] and
+                 the vertex indices of the triangles [M, 3].
+        """
+        geometry = []
+        for mesh_obj, cam_H_m2c in mesh_poses:
+            mesh = mesh_obj.get_mesh()
+            if mesh.name not in mesh_triangles:
+                mesh.calc_loop_triangles()
+                vertices = np.empty(len(mesh.vertices) * 3, dtype=np.float64)
+                mesh.vertices.foreach_get("co", vertices)
+                triangles = np.empty(len(mesh.loop_triangles) * 3, dtype=np.int64)
+                mesh.loop_triangles.foreach_get("vertices", triangles)
+                mesh_triangles[mesh.name] = (vertices.reshape(-1, 3), triangles.reshape(-1, 3))
+            vertices, triangles = mesh_triangles[mesh.name]
+            vertices_cam = vertices @ cam_H_m2c[:3, :3].T + cam_H_m2c[:3, 3]
+            geometry.append((mesh_obj.blender_obj.pass_index, vertices_cam, triangles))
+        return geometry
 
-            # Save the chunk info if we are at the end of a chunk or at the last new frame.
-            if ((curr_frame_id + 1) % frames_per_chunk == 0) or \
-                    (frame_id == num_new_frames - 1):
+    @staticmethod
+    def rasterize_silhouette(vertices_cam: np.ndarray, triangles: np.ndarray, K: np.ndarray,
+                             width: int, height: int, offset: Tuple[int, int] = (0, 0)) \
+            -> Tuple[np.ndarray, Tuple[int, int]]:
+        """ Rasterizes the unoccluded silhouette of a triangle mesh on the CPU.
+
+        Only the part of the canvas covered by the projected mesh is allocated and returned.
+
+        :param vertices_cam: The vertices in OpenCV camera coordinates [N, 3].
+        :param triangles: The vertex indices of the triangles [M, 3].
+        :param K: The camera intrinsics.
+        :param width: The width of the canvas.
+        :param height: The height of the canvas.
+        :param offset: Shifts the principal point by (x, y), used to also capture the parts outside the image.
+        :return: The binary silhouette cropped to the projected bounding box of the mesh inside the canvas and the
+                 (x, y) canvas coordinates of the upper left corner of the crop.
+        """
+        # only triangles completely in front of the camera are rasterized
+        in_front = vertices_cam[:, 2] > 1e-6
+        triangles = triangles[in_front[triangles].all(axis=1)]
+        if len(triangles) == 0:
+            return np.zeros((0, 0), dtype=bool), (0, 0)
+
+        # project all vertices at once, with 4 bits sub pixel precision
+        subpixel_bits = 4
+        z = np.where(in_front, vertices_cam[:, 2], 1.0)
+        xs = K[0, 0] * vertices_cam[:, 0] / z + K[0, 2] + offset[0]
+        ys = K[1, 1] * vertices_cam[:, 1] / z + K[1, 2] + offset[1]
+        projected = np.stack([xs, ys], axis=-1)
+        # clamp far away vertices, such that the fixed point coordinates of opencv do not overflow
+        limit = 4 * max(width, height)
+        projected = np.clip(projected, -limit, limit) * (1 << subpixel_bits)
+        polygons = np.round(projected[triangles]).astype(np.int32)
+
+        # crop the canvas to the pixels the polygons can touch, shifting by whole pixels does not change the raster
+        x_min, y_min = np.maximum(polygons.reshape(-1, 2).min(axis=0) >> subpixel_bits, 0)
+        x_max, y_max = np.minimum((polygons.reshape(-1, 2).max(axis=0) >> subpixel_bits) + 1, [width - 1, height - 1])
+        if x_min > x_max or y_min > y_max:
+            return np.zeros((0, 0), dtype=bool), (0, 0)
+        silhouette = np.zeros((y_max - y_min + 1, x_max - x_min + 1), dtype=np.uint8)
+        polygons -= np.array([x_min, y_min], dtype=np.int32) << subpixel_bits
+        cv2.fillPoly(silhouette, list(polygons), 1, lineType=cv2.LINE_8, shift=subpixel_bits)
+        return silhouette.astype(bool), (int(x_min), int(y_min))
 
-                # Save GT annotations.
-                _BopWriterUtility.save_json(chunk_gt_tpath.format(chunk_id=curr_chunk_id), chunk_gt)
+    @staticmethod
+    def calc_frame_gt_masks_and_info(mask_dir_tpath: str, im_id: int, instance_segmap: np.ndarray,
+                                     depth: np.ndarray, silhouettes: List[Tuple[int, np.ndarray, np.ndarray]],
+                                     K: np.ndarray) -> List[Dict[str, Any]]:
+        """ Computes and writes the gt masks and the gt info of a single frame without the vispy renderer.
+
+        The visible masks are taken from the instance segmentation, the full masks are rasterized from the object
+        meshes on a canvas three times the size of the image, such that also the truncated parts are counted,
+        in the same way the bop toolkit does it. The annotations are processed one after another and only the
+        projected bounding box of each object is rasterized, so memory does not grow with the number of objects.
+
+        :param mask_dir_tpath: Template of the mask directories with a `{mask_type}` placeholder.
+        :param im_id: The id of the frame inside its chunk.
+        :param instance_segmap: The instance segmentation of the frame.
+        :param depth: The depth image of the frame in the stored depth units.
+        :param silhouettes: For each annotation: its instance id, its vertices in camera coordinates and its
+                            triangles, as returned by `get_silhouette_geometry`.
+        :param K: The camera intrinsics of the frame.
+        :return: The gt info of the frame, one entry per annotation.
+        """
+        instance_segmap = np.asarray(instance_segmap)
+        if instance_segmap.ndim == 3:
+            instance_segmap = instance_segmap[:, :, 0]
+        im_height, im_width = instance_segmap.shape
+        valid_depth = depth > 0
+
+        frame_gt_info = []
+        for gt_id, (instance_id, vertices, triangles) in enumerate(silhouettes):
+            mask_visib = instance_segmap == instance_id
+            # unoccluded silhouette including the truncated parts, cropped to the projected bounding box
+            silhouette, (x0, y0) = _BopWriterUtility.rasterize_silhouette(vertices, triangles, K, 3 * im_width,
+                                                                          3 * im_height, (im_width, im_height))
+            # the part of the crop that lies inside the image
+            x_begin, x_end = max(x0, im_width), min(x0 + silhouette.shape[1], 2 * im_width)
+            y_begin, y_end = max(y0, im_height), min(y0 + silhouette.shape[0], 2 * im_height)
+            mask = np.zeros((im_height, im_width), dtype=bool)
+            if x_begin < x_end and y_begin < y_end:
+                mask[y_begin - im_height:y_end - im_height, x_begin - im_width:x_end - im_width] = \
+                    silhouette[y_begin - y0:y_end - y0, x_begin - x0:x_end - x0]
+            px_count_truncated = int(silhouette.sum()) - int(mask.sum())
+            # the visible part is always part of the silhouette, even if the rasterization differs by a pixel
+            mask |= mask_visib
+
+            px_count_visib = int(mask_visib.sum())
+            px_count_all = px_count_truncated + int(mask.sum())
+            visible = px_count_visib > 0
+            if visible:
+                # union of the bounding boxes of the silhouette (in image coordinates) and of the visible mask
+                bbox_visib = _BopWriterUtility.calc_2d_bboxes(mask_visib[np.newaxis])[0]
+                corners = [bbox_visib[:2], bbox_visib[:2] + bbox_visib[2:]]
+                if silhouette.any():
+                    bbox_silhouette = _BopWriterUtility.calc_2d_bboxes(silhouette[np.newaxis],
+                                                                       offset=(im_width - x0, im_height - y0))[0]
+                    corners += [bbox_silhouette[:2], bbox_silhouette[:2] + bbox_silhouette[2:]]
+                bbox_min, bbox_max = np.min(corners, axis=0), np.max(corners, axis=0)
+                bbox_obj = [int(e) for e in np.concatenate([bbox_min, bbox_max - bbox_min])]
+                bbox_visib = [int(e) for e in bbox_visib]
+            else:
+                bbox_obj = bbox_visib = [-1, -1, -1, -1]
+
+            cv2.imwrite(os.path.join(mask_dir_tpath.format(mask_type='mask'), f'{im_id:06d}_{gt_id:06d}.png'),
+                        255 * mask.astype(np.uint8))
+            cv2.imwrite(os.path.join(mask_dir_tpath.format(mask_type='mask_visib'), f'{im_id:06d}_{gt_id:06d}.png'),
+                        255 * mask_visib.astype(np.uint8))
+
+            frame_gt_info.append({
+                'px_count_all': px_count_all,
+                'px_count_valid': int((mask & valid_depth).sum()),
+                'px_count_visib': px_count_visib,
+                'visib_fract': px_count_visib / px_count_all if px_count_all > 0 else 0.0,
+                'bbox_obj': bbox_obj,
+                'bbox_visib': bbox_visib
+            })
+        return frame_gt_info
 
-                # Save camera info.
-                _BopWriterUtility.save_json(chunk_camera_tpath.format(chunk_id=curr_chunk_id), chunk_camera)
+    @staticmethod
+    def calc_2d_bboxes(masks: np.ndarray, offset: Tuple[int, int] = (0, 0)) -> np.ndarray:
+        """ Calculates the 2D bounding boxes of a stack of binary masks in the bop format [x, y, width, height],
+        where width and height are the distance between the outermost pixels.
 
-                # Update ID's.
-                curr_chunk_id += 1
-                curr_frame_id = 0
-            else:
-                curr_frame_id += 1
+        :param masks: The binary masks [N, H, W].
+        :param offset: Is subtracted from the (x, y) coordinates of the masks.
+        :return: The bounding boxes [N, 4], all entries are -1 for empty masks.
+        """
+        rows = masks.any(axis=2)
+        cols = masks.any(axis=1)
+        non_empty = rows.any(axis=1)
+        y_min = rows.argmax(axis=1)
+        y_max = rows.shape[1] - 1 - rows[:, ::-1].argmax(axis=1)
+        x_min = cols.argmax(axis=1)
+        x_max = cols.shape[1] - 1 - cols[:, ::-1].argmax(axis=1)
+        bboxes = np.stack([x_min - offset[0], y_min - offset[1], x_max - x_min, y_max - y_min], axis=1)
+        bboxes[~non_empty] = -1
+        return bboxes
 
     @staticmethod
     def calc_gt_masks(chunk_dirs: List[str], dataset_objects: List[MeshObject], starting_frame_id: int = 0,
@@ -501,8 +1051,10 @@ def calc_gt_masks(chunk_dirs: List[str], dataset_objects: List[MeshObject], star
         for dir_counter, chunk_dir in enumerate(chunk_dirs):
             last_chunk_gt_fpath = os.path.join(chunk_dir, 'scene_gt.json')
             last_chunk_camera_fpath = os.path.join(chunk_dir, 'scene_camera.json')
-            scene_gt = _BopWriterUtility.load_json(last_chunk_gt_fpath, keys_to_int=True)
-            scene_camera = _BopWriterUtility.load_json(last_chunk_camera_fpath, keys_to_int=True)
+            # only the frames written during this run are needed
+            min_im_id = starting_frame_id if dir_counter == 0 else 0
+            scene_gt = _BopWriterUtility.load_chunk_json(last_chunk_gt_fpath, min_im_id)
+            scene_camera = _BopWriterUtility.load_chunk_json(last_chunk_camera_fpath, min_im_id)
 
             # Create folders for the output masks (if they do not exist yet).
             mask_dir_path = os.path.dirname(os.path.join(chunk_dir, 'mask', '000000_000000.png'))
@@ -511,11 +1063,8 @@ def calc_gt_masks(chunk_dirs: List[str], dataset_objects: List[MeshObject], star
             mask_visib_dir_path = os.path.dirname(os.path.join(chunk_dir, 'mask_visib', '000000_000000.png'))
             misc.ensure_dir(mask_visib_dir_path)
 
-            im_ids = sorted(scene_gt.keys())
-
             # append to existing output
-            if dir_counter == 0:
-                im_ids = im_ids[starting_frame_id:]
+            im_ids = sorted(im_id for im_id in scene_gt.keys() if im_id >= min_im_id)
 
             for im_counter, im_id in enumerate(im_ids):
                 if im_counter % 100 == 0:
@@ -584,22 +1133,23 @@ def calc_gt_info(chunk_dirs: List[str], dataset_objects: List[MeshObject], start
         for dir_counter, chunk_dir in enumerate(chunk_dirs):
             last_chunk_gt_fpath = os.path.join(chunk_dir, 'scene_gt.json')
             last_chunk_camera_fpath = os.path.join(chunk_dir, 'scene_camera.json')
-            scene_gt = _BopWriterUtility.load_json(last_chunk_gt_fpath, keys_to_int=True)
-            scene_camera = _BopWriterUtility.load_json(last_chunk_camera_fpath, keys_to_int=True)
+            # only the frames written during this run are needed
+            min_im_id = starting_frame_id if dir_counter == 0 else 0
+            scene_gt = _BopWriterUtility.load_chunk_json(last_chunk_gt_fpath, min_im_id)
+            scene_camera = _BopWriterUtility.load_chunk_json(last_chunk_camera_fpath, min_im_id)
+
+            # chunks, which are not full yet, can keep their annotations in JSON-lines sidecars
+            incremental = os.path.exists(_BopWriterUtility.sidecar_path(last_chunk_gt_fpath))
 
             # load existing gt info
-            if dir_counter == 0 and starting_frame_id > 0:
+            if dir_counter == 0 and starting_frame_id > 0 and not incremental:
                 misc.log(f"Loading gt info from existing chunk dir - {chunk_dir}")
-                scene_gt_info = _BopWriterUtility.load_json(os.path.join(chunk_dir, 'scene_gt_info.json'),
-                                                            keys_to_int=True)
+                scene_gt_info = _BopWriterUtility.load_chunk_json(os.path.join(chunk_dir, 'scene_gt_info.json'))
             else:
                 scene_gt_info = {}
 
-            im_ids = sorted(scene_gt.keys())
-
             # append to existing output
-            if dir_counter == 0:
-                im_ids = im_ids[starting_frame_id:]
+            im_ids = sorted(im_id for im_id in scene_gt.keys() if im_id >= min_im_id)
 
             for im_counter, im_id in enumerate(im_ids):
                 if im_counter % 100 == 0:
@@ -682,7 +1232,7 @@ def calc_gt_info(chunk_dirs: List[str], dataset_objects: List[MeshObject], start
             # Save the info for the current scene.
             scene_gt_info_path = os.path.join(chunk_dir, 'scene_gt_info.json')
             misc.ensure_dir(os.path.dirname(scene_gt_info_path))
-            inout.save_json(scene_gt_info_path, scene_gt_info)
+            _BopWriterUtility.save_chunk_json(scene_gt_info_path, scene_gt_info, incremental, chunk_is_full=False)
 
     @staticmethod
     def calc_gt_coco(chunk_dirs: List[str], dataset_objects: List[MeshObject], starting_frame_id: int = 0):
@@ -712,44 +1262,54 @@ def calc_gt_coco(chunk_dirs: List[str], dataset_objects: List[MeshObject], start
                 "date_created": datetime.datetime.utcnow().isoformat(' ')
             }
 
-            segmentation_id = 1
-
-            # load existing coco annotations
-            if dir_counter == 0 and starting_frame_id > 0:
-                misc.log(f"Loading coco annotations from existing chunk dir - {chunk_dir}")
-                coco_scene_output = _BopWriterUtility.load_json(os.path.join(chunk_dir, 'scene_gt_coco.json'))
-            else:
-                coco_scene_output = {
-                    "info": INFO,
-                    "licenses": [],
-                    "categories": CATEGORIES,
-                    "images": [],
-                    "annotations": []
-                }
-
-            # Load info about the GT poses (e.g. visibility) for the current scene.
-            last_chunk_gt_fpath = os.path.join(chunk_dir, 'scene_gt.json')
-            scene_gt = _BopWriterUtility.load_json(last_chunk_gt_fpath, keys_to_int=True)
-            last_chunk_gt_info_fpath = os.path.join(chunk_dir, 'scene_gt_info.json')
-            scene_gt_info = inout.load_json(last_chunk_gt_info_fpath, keys_to_int=True)
             # Output coco path
             coco_gt_path = os.path.join(chunk_dir, 'scene_gt_coco.json')
+            last_chunk_gt_fpath = os.path.join(chunk_dir, 'scene_gt.json')
+            # chunks, which are not full yet, append the annotations of their new frames to a JSON-lines sidecar
+            incremental = os.path.exists(_BopWriterUtility.sidecar_path(last_chunk_gt_fpath))
+            new_frames: Dict[int, Any] = {}
+
+            coco_scene_output = {
+                "info": INFO,
+                "licenses": [],
+                "categories": CATEGORIES,
+                "images": [],
+                "annotations": []
+            }
+            if incremental:
+                if not os.path.exists(coco_gt_path):
+                    # until the chunk is full, the JSON file only contains the header
+                    _BopWriterUtility.save_coco_json(coco_gt_path, coco_scene_output)
+                segmentation_id = _BopWriterUtility.get_next_coco_annotation_id(coco_gt_path)
+            else:
+                # load existing coco annotations
+                if dir_counter == 0 and starting_frame_id > 0:
+                    misc.log(f"Loading coco annotations from existing chunk dir - {chunk_dir}")
+                    coco_scene_output = _BopWriterUtility.load_chunk_coco(coco_gt_path)
+                segmentation_id = max((annotation["id"] for annotation in coco_scene_output["annotations"]),
+                                      default=0) + 1
+
+            # Load info about the GT poses (e.g. visibility) for the frames written during this run.
+            min_im_id = starting_frame_id if dir_counter == 0 else 0
+            scene_gt = _BopWriterUtility.load_chunk_json(last_chunk_gt_fpath, min_im_id)
+            last_chunk_gt_info_fpath = os.path.join(chunk_dir, 'scene_gt_info.json')
+            scene_gt_info = _BopWriterUtility.load_chunk_json(last_chunk_gt_info_fpath, min_im_id)
             misc.log(f'Calculating COCO annotations - {chunk_dir}')
 
             # Go through each view in scene_gt
-            for scene_view, inst_list in scene_gt.items():
-                im_id = int(scene_view)
+            for im_id in sorted(scene_gt.keys()):
+                inst_list = scene_gt[im_id]
 
                 # skip already existing annotations
-                if dir_counter == 0 and im_id < starting_frame_id:
+                if im_id < min_im_id:
                     continue
 
                 img_path = os.path.join(chunk_dir, 'rgb', '{im_id:06d}.jpg').format(im_id=im_id)
                 relative_img_path = os.path.relpath(img_path, os.path.dirname(coco_gt_path))
                 im_size = (bpy.context.scene.render.resolution_x, bpy.context.scene.render.resolution_y)
                 image_info = pycoco_utils.create_image_info(im_id, relative_img_path, im_size)
-                coco_scene_output["images"].append(image_info)
-                gt_info = scene_gt_info[scene_view]
+                annotations = []
+                gt_info = scene_gt_info[im_id]
 
                 # Go through each instance in view
                 for idx, inst in enumerate(inst_list):
@@ -778,9 +1338,19 @@ def calc_gt_coco(chunk_dirs: List[str], dataset_objects: List[MeshObject], start
                         ignore=ignore_gt)
 
                     if annotation_info is not None:
-                        coco_scene_output["annotations"].append(annotation_info)
+                        annotations.append(annotation_info)
 
                     segmentation_id += 1
 
-            with open(coco_gt_path, 'w', encoding='utf-8') as output_json_file:
-                json.dump(coco_scene_output, output_json_file)
+                if incremental:
+                    new_frames[im_id] = {"image": image_info, "annotations": annotations}
+                else:
+                    coco_scene_output["images"].append(image_info)
+                    coco_scene_output["annotations"].extend(annotations)
+
+            if incremental:
+                _BopWriterUtility.append_json_lines(_BopWriterUtility.sidecar_path(coco_gt_path), new_frames)
+            else:
+                _BopWriterUtility.save_coco_json(coco_gt_path, coco_scene_output)
+                if os.path.exists(_BopWriterUtility.sidecar_path(coco_gt_path)):
+                    os.remove(_BopWriterUtility.sidecar_path(coco_gt_path))
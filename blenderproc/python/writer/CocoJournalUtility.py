@@ -0,0 +1,311 @@
+""" Provides an append-only store for coco annotations, which is consolidated into a single coco file later on. """
+
+import glob
+import json
+import os
+import shutil
+from typing import Any, Dict, Iterator, List, Optional, TextIO
+
+
+class CocoAnnotationsJournal:
+    """ Stores coco annotations in an append-only journal instead of one large json file.
+
+    Each call of `append` writes a new shard, which contains one JSON line per image with the image info and all of
+    its annotations. The categories are kept in a registry, where new categories are appended, and the next free
+    image and annotation ids are kept in a small state file. Therefore, appending only costs as much as the new
+    annotations and not as much as the whole dataset.
+
+    The journal is stored in `<output_dir>/coco_journal/` and can be turned into a regular coco_annotations.json via
+    `consolidate` or via the command line: `blenderproc consolidate coco <output_dir>`. If coco_annotations.json is
+    appended to without the journal afterwards, the appended images are taken over by the next call of
+    `adopt_appended_entries`, so their ids are not given out twice and they are kept by the next consolidation.
+
+    This module does not depend on blender, such that the consolidation can run outside of it.
+    """
+
+    journal_dir_name = "coco_journal"
+    _state_file_name = "state.json"
+    _categories_file_name = "categories.jsonl"
+    _base_file_name = "base.json"
+
+    def __init__(self, output_dir: str):
+        """
+        :param output_dir: The coco output directory, the journal is stored in a sub folder of it.
+        """
+        self.output_dir = output_dir
+        self.journal_dir = os.path.join(output_dir, self.journal_dir_name)
+        self._state_path = os.path.join(self.journal_dir, self._state_file_name)
+        self._categories_path = os.path.join(self.journal_dir, self._categories_file_name)
+        self._base_path = os.path.join(self.journal_dir, self._base_file_name)
+
+        if os.path.exists(self._state_path):
+            with open(self._state_path, "r", encoding="utf-8") as f:
+                self._state = json.load(f)
+        else:
+            self._state = {"next_image_id": 0, "next_annotation_id": 1, "next_shard_id": 0, "info": None,
+                           "licenses": None, "consolidated_file": None}
+        self._category_ids = {category["id"] for category in self._read_json_lines(self._categories_path)}
+
+    def exists(self) -> bool:
+        """ Returns whether the journal has already been started.
+
+        :return: True, if at least one shard was appended before.
+        """
+        return os.path.exists(self._state_path)
+
+    @property
+    def next_image_id(self) -> int:
+        """ Returns the id, which will be given to the next appended image.
+
+        :return: The next free image id.
+        """
+        return self._state["next_image_id"]
+
+    @property
+    def next_annotation_id(self) -> int:
+        """ Returns the id, which will be given to the first annotation of the next appended image.
+
+        :return: The next free annotation id.
+        """
+        return self._state["next_annotation_id"]
+
+    def adopt_existing_file(self, coco_annotations_path: str):
+        """ Moves an existing coco annotations file into the journal, where it is used as the first part of the
+        consolidated file. The ids of the journal continue after the ones of the given file.
+
+        :param coco_annotations_path: The path to the existing coco_annotations.json.
+        """
+        if self.exists():
+            raise RuntimeError(f"The journal in {self.journal_dir} has already been started, an existing file can "
+                               f"only be adopted by a new journal.")
+        with open(coco_annotations_path, "r", encoding="utf-8") as f:
+            existing_coco_annotations = json.load(f)
+        os.makedirs(self.journal_dir, exist_ok=True)
+        shutil.move(coco_annotations_path, self._base_path)
+
+        if existing_coco_annotations["images"]:
+            self._state["next_image_id"] = max(image["id"] for image in existing_coco_annotations["images"]) + 1
+        if existing_coco_annotations["annotations"]:
+            self._state["next_annotation_id"] = max(annotation["id"] for annotation
+                                                    in existing_coco_annotations["annotations"]) + 1
+        self._state["info"] = existing_coco_annotations.get("info")
+        self._state["licenses"] = existing_coco_annotations.get("licenses")
+        self._register_categories(existing_coco_annotations["categories"])
+        self._save_state()
+
+    def adopt_appended_entries(self, coco_annotations_path: str):
+        """ Takes over the images, which were appended to the consolidated file without the journal.
+
+        The consolidated file is only read, if it was rewritten after the last consolidation. Its images with ids,
+        which the journal has not given out yet, are stored with their annotations as a new shard, and the next ids
+        continue after the ones of the file.
+
+        :param coco_annotations_path: The path to the consolidated coco_annotations.json.
+        """
+        if not self.exists() or not os.path.exists(coco_annotations_path) or \
+                self._file_signature(coco_annotations_path) == self._state.get("consolidated_file"):
+            return
+        with open(coco_annotations_path, "r", encoding="utf-8") as f:
+            coco_annotations = json.load(f)
+
+        appended_images = [image for image in coco_annotations["images"] if image["id"] >= self.next_image_id]
+        if appended_images:
+            annotations_per_image: Dict[int, List[Dict[str, Any]]] = {}
+            for annotation in coco_annotations["annotations"]:
+                annotations_per_image.setdefault(annotation["image_id"], []).append(annotation)
+            # the ids were already chosen when appending to the file, so they are kept
+            self._write_shard([{"image": image, "annotations": annotations_per_image.get(image["id"], [])}
+                               for image in appended_images])
+            self._state["next_shard_id"] += 1
+        self._register_categories(coco_annotations["categories"])
+        if coco_annotations["images"]:
+            self._state["next_image_id"] = max(self.next_image_id,
+                                               max(image["id"] for image in coco_annotations["images"]) + 1)
+        if coco_annotations["annotations"]:
+            self._state["next_annotation_id"] = max(self.next_annotation_id, max(
+                annotation["id"] for annotation in coco_annotations["annotations"]) + 1)
+        self._state["consolidated_file"] = self._file_signature(coco_annotations_path)
+        self._save_state()
+
+    def append(self, coco_annotations: Dict[str, Any]) -> str:
+        """ Appends the given coco annotations as a new shard.
+
+        The ids of the images and annotations are shifted, such that they continue after the already stored ones.
+
+        :param coco_annotations: The coco annotations of the new images, as returned by
+                                 `_CocoWriterUtility.generate_coco_annotations`.
+        :return: The path of the new shard.
+        """
+        os.makedirs(self.journal_dir, exist_ok=True)
+        image_id_offset = self._state["next_image_id"]
+        annotation_id_offset = self._state["next_annotation_id"] - 1
+
+        annotations_per_image: Dict[int, List[Dict[str, Any]]] = {}
+        for annotation in coco_annotations["annotations"]:
+            annotations_per_image.setdefault(annotation["image_id"], []).append(annotation)
+
+        lines = []
+        for image in coco_annotations["images"]:
+            image_annotations = annotations_per_image.get(image["id"], [])
+            for annotation in image_annotations:
+                annotation["id"] += annotation_id_offset
+                annotation["image_id"] += image_id_offset
+            image["id"] += image_id_offset
+            lines.append({"image": image, "annotations": image_annotations})
+        shard_path = self._write_shard(lines)
+
+        self._register_categories(coco_annotations["categories"])
+        if coco_annotations["images"]:
+            self._state["next_image_id"] = max(image["id"] for image in coco_annotations["images"]) + 1
+        if coco_annotations["annotations"]:
+            self._state["next_annotation_id"] = max(annotation["id"] for annotation
+                                                    in coco_annotations["annotations"]) + 1
+        self._state["next_shard_id"] += 1
+        if self._state["info"] is None:
+            self._state["info"] = coco_annotations.get("info")
+            self._state["licenses"] = coco_annotations.get("licenses")
+        self._save_state()
+        return shard_path
+
+    def consolidate(self, output_path: Optional[str] = None, indent: Optional[int] = None) -> str:
+        """ Writes all images, annotations and categories of the journal into a single coco annotations file.
+
+        The shards are streamed line by line, so only the annotations of a single image are kept in memory.
+
+        :param output_path: The path of the consolidated file. Default: <output_dir>/coco_annotations.json
+        :param indent: The indent used for the entries of the images and annotations lists, None for compact output.
+        :return: The path of the consolidated file.
+        """
+        if not self.exists():
+            raise RuntimeError(f"There is no coco journal in {self.output_dir}")
+        if output_path is None:
+            output_path = os.path.join(self.output_dir, "coco_annotations.json")
+
+        base = None
+        if os.path.exists(self._base_path):
+            with open(self._base_path, "r", encoding="utf-8") as f:
+                base = json.load(f)
+        categories = list(self._read_json_lines(self._categories_path))
+
+        with open(output_path + ".tmp", "w", encoding="utf-8") as f:
+            f.write("{")
+            f.write(f'"info": {json.dumps(self._state["info"])}, ')
+            f.write(f'"licenses": {json.dumps(self._state["licenses"])}, ')
+            f.write(f'"categories": {json.dumps(categories)}, ')
+            f.write('"images": ')
+            CocoAnnotationsJournal._write_json_list(
+                f, self._iterate_entries(base, "images", lambda line: [line["image"]]), indent)
+            f.write(', "annotations": ')
+            CocoAnnotationsJournal._write_json_list(
+                f, self._iterate_entries(base, "annotations", lambda line: line["annotations"]), indent)
+            f.write("}")
+        os.replace(output_path + ".tmp", output_path)
+        if os.path.abspath(output_path) == os.path.abspath(os.path.join(self.output_dir, "coco_annotations.json")):
+            # later appends to the consolidated file without the journal can be detected via its signature
+            self._state["consolidated_file"] = self._file_signature(output_path)
+            self._save_state()
+        return output_path
+
+    def shard_paths(self) -> List[str]:
+        """ Returns the paths of all complete shards.
+
+        :return: The shard paths in the order they were appended.
+        """
+        return sorted(glob.glob(os.path.join(self.journal_dir, "shard_*.jsonl")))
+
+    def _iterate_entries(self, base: Optional[Dict[str, Any]], key: str, entries_of_line) -> Iterator[Any]:
+        """ Iterates over all entries of the given type, first of the adopted file and then of all shards.
+
+        :param base: The content of the adopted coco annotations file, if there is one.
+        :param key: The coco key of the entries, "images" or "annotations".
+        :param entries_of_line: Returns the entries of the given type, which are stored in one line of a shard.
+        :return: An iterator over the entries.
+        """
+        if base is not None:
+            yield from base[key]
+        for shard_path in self.shard_paths():
+            for line in self._read_json_lines(shard_path):
+                yield from entries_of_line(line)
+
+    def _write_shard(self, lines: List[Dict[str, Any]]) -> str:
+        """ Writes the given lines as the next shard.
+
+        :param lines: One entry per image with the image info and all of its annotations.
+        :return: The path of the new shard.
+        """
+        os.makedirs(self.journal_dir, exist_ok=True)
+        shard_path = os.path.join(self.journal_dir, f"shard_{self._state['next_shard_id']:06d}.jsonl")
+        # the shard only gets its final name, when it is complete
+        with open(shard_path + ".tmp", "w", encoding="utf-8") as f:
+            for line in lines:
+                f.write(json.dumps(line) + "\n")
+        os.replace(shard_path + ".tmp", shard_path)
+        return shard_path
+
+    def _register_categories(self, categories: List[Dict[str, Any]]):
+        """ Appends all categories with a new id to the category registry.
+
+        :param categories: The categories to register.
+        """
+        new_categories = [category for category in categories if category["id"] not in self._category_ids]
+        if new_categories:
+            with open(self._categories_path, "a", encoding="utf-8") as f:
+                for category in new_categories:
+                    f.write(json.dumps(category) + "\n")
+                    self._category_ids.add(category["id"])
+
+    def _save_state(self):
+        """ Atomically writes the state of the journal. """
+        with open(self._state_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(self._state, f)
+        os.replace(self._state_path + ".tmp", self._state_path)
+
+    @staticmethod
+    def _file_signature(path: str) -> List[int]:
+        """ Returns the modification time and the size of the given file, which change whenever it is rewritten.
+
+        :param path: The path to the file.
+        :return: The modification time in nanoseconds and the size in bytes.
+        """
+        stat = os.stat(path)
+        return [stat.st_mtime_ns, stat.st_size]
+
+    @staticmethod
+    def _read_json_lines(path: str) -> Iterator[Any]:
+        """ Reads a JSON-lines file line by line, an incomplete last line is ignored.
+
+        :param path: The path to the file.
+        :return: An iterator over the parsed lines.
+        """
+        if not os.path.exists(path):
+            return
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.endswith("\n"):
+                    yield json.loads(line)
+
+    @staticmethod
+    def _write_json_list(f: TextIO, entries: Iterator[Any], indent: Optional[int]):
+        """ Writes the given entries as a json list, without collecting them first.
+
+        :param f: The file to write to.
+        :param entries: The entries of the list.
+        :param indent: The indent of the entries, None for compact output.
+        """
+        separator = "," if indent is None else ",\n" + " " * indent
+        f.write("[" if indent is None else "[\n" + " " * indent)
+        for i, entry in enumerate(entries):
+            if i > 0:
+                f.write(separator)
+            f.write(json.dumps(entry))
+        f.write("]" if indent is None else "\n]")
+
+
+def consolidate_coco_journal(output_dir: str, output_path: Optional[str] = None) -> str:
+    """ Consolidates the coco journal in the given output directory into a single coco annotations file.
+
+    :param output_dir: The output directory, which was given to `write_coco_annotations`.
+    :param output_path: The path of the consolidated file. Default: <output_dir>/coco_annotations.json
+    :return: The path of the consolidated file.
+    """
+    return CocoAnnotationsJournal(output_dir).consolidate(output_path)
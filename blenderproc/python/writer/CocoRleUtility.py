@@ -0,0 +1,124 @@
+""" Encodes and decodes binary masks in the run-length encoding (RLE) of COCO. Does not depend on blender. """
+
+from typing import Dict, List, Union
+
+import numpy as np
+
+
+def binary_mask_to_rle(binary_mask: np.ndarray, compressed: bool = False) -> Dict[str, Union[List[int], str]]:
+    """Converts a binary mask to COCOs run-length encoding (RLE) format. Instead of outputting
+    a mask image, you give a list of start pixels and how many pixels after each of those
+    starts are included in the mask.
+    :param binary_mask: a 2D binary numpy array where '1's represent the object
+    :param compressed: If True, the counts are compressed into a string, in the same way pycocotools does it.
+    :return: Mask in RLE format
+    """
+    flat_mask = np.asarray(binary_mask).ravel(order='F') != 0
+    if flat_mask.size == 0:
+        counts = np.zeros(0, dtype=np.int64)
+    else:
+        # the runs end, wherever the value changes
+        changes = np.flatnonzero(flat_mask[1:] != flat_mask[:-1]) + 1
+        counts = np.diff(np.concatenate([[0], changes, [flat_mask.size]]))
+        # the counts always begin with the number of zeros
+        if flat_mask[0]:
+            counts = np.concatenate([[0], counts])
+    return rle_from_counts(counts, list(binary_mask.shape), compressed)
+
+
+def rle_from_counts(counts: np.ndarray, size: List[int], compressed: bool = False) \
+        -> Dict[str, Union[List[int], str]]:
+    """ Builds an RLE dict from the given run lengths.
+
+    :param counts: The run lengths, beginning with the number of zeros.
+    :param size: The size of the mask [H, W].
+    :param compressed: If True, the counts are compressed into a string, in the same way pycocotools does it.
+    :return: Mask in RLE format
+    """
+    if compressed:
+        return {'counts': compress_rle_counts(counts), 'size': list(size)}
+    return {'counts': np.asarray(counts).tolist(), 'size': list(size)}
+
+
+def rle_to_binary_mask(rle: Dict[str, Union[List[int], str]]) -> np.ndarray:
+    """Converts a COCOs run-length encoding (RLE) to binary mask.
+    :param rle: Mask in RLE format, the counts can be given as list or as compressed string.
+    :return: a 2D binary numpy array where '1's represent the object
+    """
+    counts = rle.get('counts')
+    if isinstance(counts, (str, bytes)):
+        counts = decompress_rle_counts(counts)
+    counts = np.asarray(counts, dtype=np.int64)
+    num_pixels = int(np.prod(rle.get('size')))
+
+    # every second run consists of ones
+    binary_array = np.repeat(np.arange(len(counts)) % 2 == 1, counts)
+    if binary_array.size < num_pixels:
+        binary_array = np.concatenate([binary_array, np.zeros(num_pixels - binary_array.size, dtype=bool)])
+
+    binary_mask = binary_array[:num_pixels].reshape(*rle.get('size'), order='F')
+
+    return binary_mask
+
+
+def compress_rle_counts(counts: Union[List[int], np.ndarray]) -> str:
+    """ Compresses the run lengths into a string, the result is identical to the `counts` of pycocotools.
+
+    Starting with the third count, each count is stored as difference to the count two positions before. Each
+    value is then split into groups of 5 bits, which are stored as one character each, where the 6th bit marks
+    that more groups follow.
+
+    :param counts: The run lengths.
+    :return: The compressed counts.
+    """
+    values = np.asarray(counts, dtype=np.int64).copy()
+    if values.size == 0:
+        return ""
+    if values.size > 3:
+        values[3:] -= np.asarray(counts, dtype=np.int64)[1:-2]
+
+    # split all values into groups of 5 bits at once, 13 groups are enough for 64 bit values
+    max_groups = 13
+    shifts = 5 * np.arange(max_groups)
+    groups = (values[:, np.newaxis] >> shifts) & 0x1f
+    remainders = values[:, np.newaxis] >> (shifts + 5)
+    # a further group is needed, as long as the remainder is not just the sign extension of the current group
+    more = np.where(groups & 0x10, remainders != -1, remainders != 0)
+    num_groups = np.argmin(more, axis=1) + 1
+    chars = groups | np.where(more, 0x20, 0)
+    chars += 48
+    used = np.arange(max_groups)[np.newaxis, :] < num_groups[:, np.newaxis]
+    return chars[used].astype(np.uint8).tobytes().decode('ascii')
+
+
+def decompress_rle_counts(compressed_counts: Union[str, bytes]) -> np.ndarray:
+    """ Decompresses run lengths, which were compressed via `compress_rle_counts` or pycocotools.
+
+    :param compressed_counts: The compressed counts.
+    :return: The run lengths.
+    """
+    if isinstance(compressed_counts, str):
+        compressed_counts = compressed_counts.encode('ascii')
+    chars = np.frombuffer(compressed_counts, dtype=np.uint8).astype(np.int64) - 48
+    if chars.size == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    # the last group of each value has no continuation bit
+    is_last = (chars & 0x20) == 0
+    value_ends = np.flatnonzero(is_last) + 1
+    value_starts = np.concatenate([[0], value_ends[:-1]])
+    value_index = np.repeat(np.arange(len(value_ends)), value_ends - value_starts)
+    group_index = np.arange(chars.size) - value_starts[value_index]
+
+    values = np.zeros(len(value_ends), dtype=np.int64)
+    np.add.at(values, value_index, (chars & 0x1f) << (5 * group_index))
+    # negative values are sign extended from the highest bit of their last group
+    num_groups = value_ends - value_starts
+    is_negative = (chars[value_ends - 1] & 0x10) != 0
+    values[is_negative] -= np.left_shift(1, 5 * num_groups[is_negative])
+
+    # undo the differences to the count two positions before, which start with the third count
+    counts = values
+    counts[3::2] = np.cumsum(values[1::2])[1:]
+    counts[2::2] = np.cumsum(values[2::2])
+    return counts
@@ -1,12 +1,12 @@
 """Allows rendering the content of the scene in the coco file format."""
 
 import datetime
-from itertools import groupby
 import json
 import os
 import shutil
-from typing import Optional, Dict, Union, Tuple, List
+from typing import Optional, Dict, Union, Tuple, List, Any
 import csv
+from concurrent.futures import ThreadPoolExecutor
 
 import numpy as np
 from skimage import measure
@@ -15,6 +15,11 @@
 
 from blenderproc.python.utility.Utility import Utility
 from blenderproc.python.utility.LabelIdMapping import LabelIdMapping
+from blenderproc.python.writer.CocoJournalUtility import CocoAnnotationsJournal
+# the rle functions are implemented without blender, such that the scripts can use them as well
+# pylint: disable=unused-import
+from blenderproc.python.writer.CocoRleUtility import binary_mask_to_rle, rle_to_binary_mask, rle_from_counts
+# pylint: enable=unused-import
 
 
 def write_coco_annotations(output_dir: str, instance_segmaps: Optional[List[np.ndarray]] = None,
@@ -24,7 +29,8 @@ def write_coco_annotations(output_dir: str, instance_segmaps: Optional[List[np.n
                            append_to_existing_output: bool = True, segmap_output_key: str = "segmap",
                            segcolormap_output_key: str = "segcolormap", rgb_output_key: str = "colors",
                            jpg_quality: int = 95, label_mapping: Optional[LabelIdMapping] = None,
-                           file_prefix: str = "", indent: Optional[Union[int, str]] = None):
+                           file_prefix: str = "", indent: Optional[Union[int, str]] = None,
+                           num_threads: int = 1, use_journal: bool = False):
     """ Writes coco annotations in the following steps:
     1. Locate the seg images
     2. Locate the rgb maps
@@ -37,7 +43,9 @@ def write_coco_annotations(output_dir: str, instance_segmaps: Optional[List[np.n
     :param instance_attribute_maps: per-frame mappings with idx, class and optionally supercategory/bop_dataset_name
     :param colors: List of color images. Does not support stereo images, enter left and right inputs subsequently.
     :param color_file_format: Format to save color images in
-    :param mask_encoding_format: Encoding format of the binary masks. Default: 'rle'. Available: 'rle', 'polygon'.
+    :param mask_encoding_format: Encoding format of the binary masks. Default: 'rle'. Available: 'rle', 'polygon',
+                                 'compressed_rle'. 'compressed_rle' stores the counts as string in the same way
+                                 pycocotools does it, which results in much smaller annotation files.
     :param supercategory: name of the dataset/supercategory to filter for, e.g. a specific BOP dataset set
                           by 'bop_dataset_name' or any loaded object with specified 'cp_supercategory'
     :param append_to_existing_output: If true and if there is already a coco_annotations.json file in the output
@@ -60,6 +68,14 @@ def write_coco_annotations(output_dir: str, instance_segmaps: Optional[List[np.n
                    only insert newlines. None (the default) selects the most compact representation.
                    Using a positive integer indent indents that many spaces per level.
                    If indent is a string (such as "\t"), that string is used to indent each level.
+    :param num_threads: The number of threads, which compute the annotations of the frames in parallel.
+    :param use_journal: If true, the annotations are appended to an append-only journal in
+                        <output_dir>/coco_journal/ instead of rewriting coco_annotations.json. This keeps the cost
+                        of appending independent of the size of the dataset. The journal is turned into
+                        coco_annotations.json via `blenderproc consolidate coco <output_dir>`. An already existing
+                        coco_annotations.json is moved into a newly started journal. Once a journal exists, appends
+                        with use_journal=False also go into the journal, and coco_annotations.json is consolidated
+                        from it right away.
     """
     instance_segmaps = [] if instance_segmaps is None else list(instance_segmaps)
     colors = [] if colors is None else list(colors)
@@ -95,12 +111,27 @@ def write_coco_annotations(output_dir: str, instance_segmaps: Optional[List[np.n
                                f"ran the SegMapRenderer module with 'map_by' set to 'instance' before?")
 
     coco_annotations_path = os.path.join(output_dir, "coco_annotations.json")
+    journal = CocoAnnotationsJournal(output_dir)
+    # appends to a dataset with a journal always go through the journal, so the ids are not given out twice
+    if use_journal or (append_to_existing_output and journal.exists()):
+        if journal.exists() and not append_to_existing_output:
+            raise RuntimeError(f"The coco journal in {journal.journal_dir} already exists, either remove it or set "
+                               f"append_to_existing_output to True.")
+        if not journal.exists() and append_to_existing_output and os.path.exists(coco_annotations_path):
+            journal.adopt_existing_file(coco_annotations_path)
+        else:
+            journal.adopt_appended_entries(coco_annotations_path)
+        # the journal knows the next free id without reading any previous annotations
+        image_offset = journal.next_image_id
+        existing_coco_annotations = None
     # Calculate image numbering offset, if append_to_existing_output is activated and coco data exists
-    if append_to_existing_output and os.path.exists(coco_annotations_path):
+    elif append_to_existing_output and os.path.exists(coco_annotations_path):
+        journal = None
         with open(coco_annotations_path, 'r', encoding="utf-8") as fp:
             existing_coco_annotations = json.load(fp)
         image_offset = max(image["id"] for image in existing_coco_annotations["images"]) + 1
     else:
+        journal = None
         image_offset = 0
         existing_coco_annotations = None
 
@@ -165,46 +196,19 @@ def write_coco_annotations(output_dir: str, instance_segmaps: Optional[List[np.n
                                                                supercategory,
                                                                mask_encoding_format,
                                                                existing_coco_annotations,
-                                                               label_mapping)
-
-    print("Writing coco annotations to " + coco_annotations_path)
-    with open(coco_annotations_path, 'w', encoding="utf-8") as fp:
-        json.dump(coco_output, fp, indent=indent)
-
-
-def binary_mask_to_rle(binary_mask: np.ndarray) -> Dict[str, List[int]]:
-    """Converts a binary mask to COCOs run-length encoding (RLE) format. Instead of outputting
-    a mask image, you give a list of start pixels and how many pixels after each of those
-    starts are included in the mask.
-    :param binary_mask: a 2D binary numpy array where '1's represent the object
-    :return: Mask in RLE format
-    """
-    rle: Dict[str, List[int]] = {'counts': [], 'size': list(binary_mask.shape)}
-    counts = rle.get('counts')
-    for i, (value, elements) in enumerate(groupby(binary_mask.ravel(order='F'))):
-        if i == 0 and value == 1:
-            counts.append(0)
-        counts.append(len(list(elements)))
-    return rle
-
-
-def rle_to_binary_mask(rle: Dict[str, List[int]]) -> np.ndarray:
-    """Converts a COCOs run-length encoding (RLE) to binary mask.
-    :param rle: Mask in RLE format
-    :return: a 2D binary numpy array where '1's represent the object
-    """
-    binary_array = np.zeros(np.prod(rle.get('size')), dtype=bool)
-    counts: List[int] = rle.get('counts')
-
-    start = 0
-    for i in range(len(counts) - 1):
-        start += counts[i]
-        end = start + counts[i + 1]
-        binary_array[start:end] = (i + 1) % 2
-
-    binary_mask = binary_array.reshape(*rle.get('size'), order='F')
-
-    return binary_mask
+                                                               label_mapping,
+                                                               num_threads)
+
+    if journal is not None:
+        print("Appending coco annotations to " + journal.append(coco_output))
+        if not use_journal:
+            # the caller expects an up-to-date coco_annotations.json
+            print("Writing coco annotations to " + journal.consolidate(
+                coco_annotations_path, indent if isinstance(indent, int) and indent > 0 else None))
+    else:
+        print("Writing coco annotations to " + coco_annotations_path)
+        with open(coco_annotations_path, 'w', encoding="utf-8") as fp:
+            json.dump(coco_output, fp, indent=indent)
 
 
 class _CocoWriterUtility:
@@ -212,7 +216,7 @@ class _CocoWriterUtility:
     @staticmethod
     def generate_coco_annotations(inst_segmaps, inst_attribute_maps, image_paths, supercategory,
                                   mask_encoding_format, existing_coco_annotations=None,
-                                  label_mapping: LabelIdMapping = None):
+                                  label_mapping: LabelIdMapping = None, num_threads: int = 1):
         """Generates coco annotations for images
 
         :param inst_segmaps: List of instance segmentation maps
@@ -225,6 +229,7 @@ def generate_coco_annotations(inst_segmaps, inst_attribute_maps, image_paths, su
         :param label_mapping: The label mapping which should be used to label the categories based on their ids.
                               If None, is given then the `name` field in the csv files is used or - if not existing -
                               the category id itself is used.
+        :param num_threads: The number of threads, which compute the annotations of the frames in parallel.
         :return: dict containing coco annotations
         """
 
@@ -278,29 +283,36 @@ def generate_coco_annotations(inst_segmaps, inst_attribute_maps, image_paths, su
         images: List[Dict[str, Union[str, int]]] = []
         annotations: List[Dict[str, Union[str, int]]] = []
 
-        for inst_segmap, image_path, instance_2_category_map in zip(inst_segmaps, image_paths,
-                                                                    instance_2_category_maps):
+        frames = list(zip(inst_segmaps, image_paths, instance_2_category_maps))
+        frame_args = [(inst_segmap, list(instance_2_category_map.keys()), mask_encoding_format)
+                      for inst_segmap, _, instance_2_category_map in frames]
+        if num_threads > 1 and len(frames) > 1:
+            # threads instead of processes, as forking blender can deadlock, numpy releases the GIL for the heavy parts
+            with ThreadPoolExecutor(max_workers=min(num_threads, len(frames))) as executor:
+                frame_instances = list(executor.map(_CocoWriterUtility.calc_frame_instance_annotations,
+                                                    *zip(*frame_args)))
+        else:
+            frame_instances = [_CocoWriterUtility.calc_frame_instance_annotations(*args) for args in frame_args]
+
+        for (inst_segmap, image_path, instance_2_category_map), instances in zip(frames, frame_instances):
 
             # Add coco info for image
             image_id = len(images)
             images.append(_CocoWriterUtility.create_image_info(image_id, image_path, inst_segmap.shape))
 
-            # Go through all objects visible in this image
-            instances = np.unique(inst_segmap)
-            # Remove background
-            instances = np.delete(instances, np.where(instances == 0))
-            for inst in instances:
-                if inst in instance_2_category_map:
-                    # Calc object mask
-                    binary_inst_mask = np.where(inst_segmap == inst, 1, 0)
-                    # Add coco info for object in this image
-                    annotation = _CocoWriterUtility.create_annotation_info(len(annotations) + 1,
-                                                                           image_id,
-                                                                           instance_2_category_map[inst],
-                                                                           binary_inst_mask,
-                                                                           mask_encoding_format)
-                    if annotation is not None:
-                        annotations.append(annotation)
+            # Go through all objects visible in this image, the ids are assigned here to keep them consecutive
+            for inst, area, bounding_box, segmentation in instances:
+                annotations.append({
+                    "id": len(annotations) + 1,
+                    "image_id": image_id,
+                    "category_id": instance_2_category_map[inst],
+                    "iscrowd": 0,
+                    "area": area,
+                    "bbox": bounding_box,
+                    "segmentation": segmentation,
+                    "width": inst_segmap.shape[1],
+                    "height": inst_segmap.shape[0],
+                })
 
         new_coco_annotations = {
             "info": info,
@@ -316,6 +328,96 @@ def generate_coco_annotations(inst_segmaps, inst_attribute_maps, image_paths, su
 
         return new_coco_annotations
 
+    @staticmethod
+    def calc_frame_instance_annotations(inst_segmap: np.ndarray, instance_ids: List[int],
+                                        mask_encoding_format: str) -> List[Tuple[int, int, List[int], Any]]:
+        """ Computes area, bounding box and segmentation of all given instances visible in one frame.
+
+        Instead of building a full binary mask per instance, the pixels are sorted once by their instance id in
+        column-major order. This gives for each instance its pixels in the order of the coco RLE, from which area,
+        bounding box and runs of all instances are derived at once.
+
+        :param inst_segmap: The instance segmentation map of the frame [H, W].
+        :param instance_ids: The ids of the instances, which should be annotated. The background 0 is always skipped.
+        :param mask_encoding_format: Encoding format of the masks, 'rle', 'compressed_rle' or 'polygon'.
+        :return: For each visible instance in ascending order: its id, area, bounding box and segmentation.
+        """
+        if mask_encoding_format not in ['rle', 'compressed_rle', 'polygon']:
+            raise RuntimeError(f"Unknown encoding format: {mask_encoding_format}")
+        height, width = inst_segmap.shape
+        num_pixels = height * width
+
+        # column-major pixel indices sorted by instance id, the stable sort keeps the pixels of each instance in order
+        labels = np.asarray(inst_segmap).ravel(order='F')
+        pixel_order = np.argsort(labels, kind='stable')
+        sorted_labels = labels[pixel_order]
+        instances, starts, areas = np.unique(sorted_labels, return_index=True, return_counts=True)
+        ends = starts + areas
+
+        # bounding boxes of all instances, in column-major order the first and last pixel give the columns
+        rows = pixel_order % height
+        row_min = np.minimum.reduceat(rows, starts)
+        row_max = np.maximum.reduceat(rows, starts)
+        col_min = pixel_order[starts] // height
+        col_max = pixel_order[ends - 1] // height
+
+        if mask_encoding_format in ['rle', 'compressed_rle']:
+            # a new run begins, wherever the next pixel of the same instance is not the direct successor
+            run_begins = np.ones(num_pixels, dtype=bool)
+            run_begins[1:] = np.diff(pixel_order) != 1
+            run_begins[starts] = True
+            run_begin_indices = np.flatnonzero(run_begins)
+
+        selected_ids = set(int(inst) for inst in instance_ids)
+        results = []
+        for i, inst in enumerate(instances.tolist()):
+            # skip background and instances without category
+            if inst == 0 or inst not in selected_ids:
+                continue
+            bounding_box = [int(col_min[i]), int(row_min[i]), int(col_max[i] - col_min[i] + 1),
+                            int(row_max[i] - row_min[i] + 1)]
+            if mask_encoding_format in ['rle', 'compressed_rle']:
+                first, last = np.searchsorted(run_begin_indices, [starts[i], ends[i]])
+                run_starts = pixel_order[run_begin_indices[first:last]]
+                run_lengths = np.diff(np.append(run_begin_indices[first:last], ends[i]))
+                segmentation = _CocoWriterUtility.runs_to_rle(run_starts, run_lengths, (height, width),
+                                                              mask_encoding_format == 'compressed_rle')
+            else:
+                # only the bounding box plus a margin of one pixel is needed to find the contours
+                top, left = max(0, bounding_box[1] - 1), max(0, bounding_box[0] - 1)
+                bottom = min(height, bounding_box[1] + bounding_box[3] + 1)
+                right = min(width, bounding_box[0] + bounding_box[2] + 1)
+                binary_crop = (inst_segmap[top:bottom, left:right] == inst).astype(np.uint8)
+                segmentation = _CocoWriterUtility.binary_mask_to_polygon(binary_crop, tolerance=2)
+                if not segmentation:
+                    continue
+                for polygon in segmentation:
+                    polygon[0::2] = [x + left for x in polygon[0::2]]
+                    polygon[1::2] = [y + top for y in polygon[1::2]]
+            results.append((inst, int(areas[i]), bounding_box, segmentation))
+        return results
+
+    @staticmethod
+    def runs_to_rle(run_starts: np.ndarray, run_lengths: np.ndarray, size: Tuple[int, int],
+                    compressed: bool = False) -> Dict[str, Union[List[int], str]]:
+        """ Builds the coco RLE from the runs of ones of a mask.
+
+        :param run_starts: The column-major index of the first pixel of each run, in ascending order.
+        :param run_lengths: The length of each run.
+        :param size: The size of the mask [H, W].
+        :param compressed: If True, the counts are compressed into a string, in the same way pycocotools does it.
+        :return: Mask in RLE format, the same as returned by `binary_mask_to_rle`.
+        """
+        num_pixels = size[0] * size[1]
+        counts = np.empty(2 * len(run_starts) + 1, dtype=np.int64)
+        # the RLE alternates between the zeros in front of each run and the run itself
+        counts[0:-1:2] = run_starts - np.concatenate([[0], run_starts[:-1] + run_lengths[:-1]])
+        counts[1::2] = run_lengths
+        counts[-1] = num_pixels - (run_starts[-1] + run_lengths[-1]) if len(run_starts) else num_pixels
+        if counts[-1] == 0 and len(counts) > 1:
+            counts = counts[:-1]
+        return rle_from_counts(counts, list(size), compressed)
+
     @staticmethod
     def merge_coco_annotations(existing_coco_annotations, new_coco_annotations):
         """ Merges the two given coco annotation dicts into one.
@@ -393,6 +495,8 @@ def create_annotation_info(annotation_id: int, image_id: int, category_id: int,
 
         if mask_encoding_format == 'rle':
             segmentation = binary_mask_to_rle(binary_mask)
+        elif mask_encoding_format == 'compressed_rle':
+            segmentation = binary_mask_to_rle(binary_mask, compressed=True)
         elif mask_encoding_format == 'polygon':
             segmentation = _CocoWriterUtility.binary_mask_to_polygon(binary_mask, tolerance)
             if not segmentation:
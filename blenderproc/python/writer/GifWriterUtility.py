@@ -1,5 +1,6 @@
 """Allows to write a set of rendering as a gif animation for quick visualization."""
 
+from collections.abc import Sequence
 from typing import Dict, List, Union
 import os
 
@@ -35,7 +36,8 @@ def write_gif_animation(
     # From WriterUtility.py
     amount_of_frames = 0
     for data_block in output_data_dict.values():
-        if isinstance(data_block, list):
+        # per frame outputs, which can also be lazily loaded lists
+        if isinstance(data_block, Sequence) and not isinstance(data_block, str):
             amount_of_frames = max([amount_of_frames, len(data_block)])
 
     # From WriterUtility.py
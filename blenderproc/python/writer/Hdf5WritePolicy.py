@@ -0,0 +1,192 @@
+""" Provides a class describing how a single key is stored inside a .hdf5 container. """
+
+from typing import Optional, Tuple, Dict, Any, Union
+import zlib
+
+import numpy as np
+
+
+class Hdf5WritePolicy:
+    """ Describes how the data of a single key is stored in a .hdf5 container.
+
+    A policy combines the compression codec, the chunk shape, the shuffle filter and an optional downcast of float
+    data to float16. Different keys can use different policies, e.g. colors and segmaps compress well with gzip and
+    the shuffle filter, while float16 is precise enough for normals.
+
+    The codecs "blosc" and "zstd" require the `hdf5plugin` package, which also has to be imported when reading
+    the containers later on.
+    """
+
+    # maps each codec to the compression levels it supports
+    _valid_levels = {
+        None: None,
+        "lzf": None,
+        "gzip": range(0, 10),
+        "blosc": range(0, 10),
+        "zstd": range(1, 23)
+    }
+    _default_levels = {
+        "gzip": 4,
+        "blosc": 5,
+        "zstd": 3
+    }
+
+    def __init__(self, compression: Optional[str] = "gzip", compression_level: Optional[int] = None,
+                 chunk_shape: Optional[Tuple[int, ...]] = None, shuffle: bool = False, float16: bool = False):
+        """
+        :param compression: The codec to use, one of None/"none", "lzf", "gzip", "blosc" or "zstd".
+        :param compression_level: The compression level, if None is given the default level of the codec is used.
+                                  Only supported by "gzip" [0, 9], "blosc" [0, 9] and "zstd" [1, 22].
+        :param chunk_shape: The shape of the chunks along the leading dimensions of the data, e.g. (256, 256) to
+                            split an image [H, W, C] into tiles of 256x256 pixels with all channels. The remaining
+                            dimensions are not split. If None is given, hdf5 chooses the chunk shape.
+        :param shuffle: If True, the shuffle filter is applied before compressing, which often improves the
+                        compression ratio of multi byte data like float images.
+        :param float16: If True, float data is downcast to float16 before it is stored, this is useful for
+                        distance, depth and normal images.
+        """
+        if compression is not None and compression.lower() == "none":
+            compression = None
+        if compression is not None:
+            compression = compression.lower()
+        if compression not in self._valid_levels:
+            raise ValueError(f"Unknown compression: {compression}, options are: "
+                             f"{', '.join(str(codec) for codec in self._valid_levels)}")
+        if compression_level is not None:
+            valid_levels = self._valid_levels[compression]
+            if valid_levels is None:
+                raise ValueError(f"The compression {compression} does not support a compression level.")
+            if compression_level not in valid_levels:
+                raise ValueError(f"The compression level of {compression} has to be in [{valid_levels.start}, "
+                                 f"{valid_levels.stop - 1}], not {compression_level}.")
+        elif compression in self._default_levels:
+            compression_level = self._default_levels[compression]
+        if chunk_shape is not None and any(size < 1 for size in chunk_shape):
+            raise ValueError(f"All chunk sizes have to be positive: {chunk_shape}")
+
+        self.compression = compression
+        self.compression_level = compression_level
+        self.chunk_shape = tuple(chunk_shape) if chunk_shape is not None else None
+        self.shuffle = shuffle
+        self.float16 = float16
+
+    def requires_hdf5plugin(self) -> bool:
+        """ Returns whether the codec of this policy is provided by the hdf5plugin package.
+
+        :return: True, if hdf5plugin is needed to write (and read) data with this policy.
+        """
+        return self.compression in ["blosc", "zstd"]
+
+    def convert(self, data: np.ndarray) -> np.ndarray:
+        """ Applies the dtype conversion of this policy to the given data.
+
+        :param data: The data to store.
+        :return: The converted data.
+        """
+        if self.float16 and isinstance(data, np.ndarray) and data.dtype.kind == "f" and data.dtype != np.float16:
+            return data.astype(np.float16)
+        return data
+
+    def dataset_kwargs(self, data: np.ndarray) -> Dict[str, Any]:
+        """ Returns the arguments for `h5py.File.create_dataset`, which store the given data according to this policy.
+
+        :param data: The already converted data, which should be stored.
+        :return: The keyword arguments, which describe the chunking and the filters.
+        """
+        kwargs: Dict[str, Any] = {}
+        # strings and scalars can not be chunked or compressed
+        if data.dtype.char == 'S' or data.ndim == 0 or data.size == 0:
+            return kwargs
+
+        if self.chunk_shape is not None:
+            kwargs["chunks"] = self._chunks_for(data.shape)
+        if self.compression == "gzip":
+            kwargs["compression"] = "gzip"
+            kwargs["compression_opts"] = self.compression_level
+        elif self.compression == "lzf":
+            kwargs["compression"] = "lzf"
+        elif self.requires_hdf5plugin():
+            hdf5plugin = Hdf5WritePolicy._import_hdf5plugin()
+            if self.compression == "blosc":
+                # blosc brings its own shuffle, which is much faster than the one of hdf5
+                shuffle = hdf5plugin.Blosc.SHUFFLE if self.shuffle else hdf5plugin.Blosc.NOSHUFFLE
+                kwargs.update(hdf5plugin.Blosc(cname="zstd", clevel=self.compression_level, shuffle=shuffle))
+            else:
+                kwargs.update(hdf5plugin.Zstd(clevel=self.compression_level))
+        if self.shuffle and self.compression != "blosc":
+            kwargs["shuffle"] = True
+        return kwargs
+
+    def write(self, file, key: str, data: Union[np.ndarray, np.bytes_],
+              precompressed_chunk: Optional[bytes] = None):
+        """ Stores the given data at the given key in the given hdf5 file.
+
+        :param file: The hdf5 file handle. Type: hdf5.File
+        :param key: The key at which the data should be stored in the hdf5 file.
+        :param data: The data to store, must already be converted via `convert`.
+        :param precompressed_chunk: The result of `precompress` for the given data, if available.
+        """
+        if precompressed_chunk is not None:
+            # the whole array is stored as one chunk, which was already filtered the same way hdf5 would do it
+            dataset = file.create_dataset(key, shape=data.shape, dtype=data.dtype, chunks=data.shape,
+                                          **self.dataset_kwargs(data))
+            dataset.id.write_direct_chunk((0,) * data.ndim, precompressed_chunk)
+        elif data.dtype.char == 'S':
+            file.create_dataset(key, data=data, dtype=data.dtype)
+        else:
+            file.create_dataset(key, data=data, **self.dataset_kwargs(data))
+
+    def precompress(self, data: np.ndarray) -> Optional[bytes]:
+        """ Runs the filter pipeline of hdf5 on the given data, if this is possible without hdf5.
+
+        This is only possible for gzip policies without explicit chunk shape, where the whole array is stored as a
+        single chunk. As zlib releases the GIL, this can be used to compress in multiple threads at the same time.
+
+        :param data: The already converted data, which should be stored.
+        :return: The compressed chunk or None, if this policy or the data does not allow compressing outside of hdf5.
+        """
+        # only non-empty numeric arrays, which fit into a single chunk, can be precompressed
+        if self.compression != "gzip" or self.chunk_shape is not None or data.dtype.kind not in "biuf" \
+                or data.ndim == 0 or not 0 < data.nbytes < 2 ** 32:
+            return None
+        chunk = np.ascontiguousarray(data)
+        if self.shuffle and chunk.itemsize > 1:
+            # the shuffle filter of hdf5 stores the first byte of all elements, then the second byte and so on
+            chunk = np.ascontiguousarray(chunk.reshape(-1).view(np.uint8).reshape(-1, chunk.itemsize).T)
+        return zlib.compress(chunk.data, self.compression_level)
+
+    def _chunks_for(self, shape: Tuple[int, ...]) -> Tuple[int, ...]:
+        """ Determines the chunk shape for data with the given shape.
+
+        :param shape: The shape of the data.
+        :return: The chunk shape, which never exceeds the data shape.
+        """
+        leading = tuple(min(chunk_size, size) for chunk_size, size in zip(self.chunk_shape, shape))
+        return leading + tuple(shape[len(leading):])
+
+    @staticmethod
+    def _import_hdf5plugin():
+        """ Imports the hdf5plugin package, which provides the blosc and zstd filters.
+
+        :return: The hdf5plugin module.
+        """
+        try:
+            # pylint: disable=import-outside-toplevel
+            import hdf5plugin
+            # pylint: enable=import-outside-toplevel
+        except ImportError as e:
+            raise ImportError("The blosc and zstd compressions require the hdf5plugin package, install it via: "
+                              "blenderproc pip install hdf5plugin") from e
+        return hdf5plugin
+
+    def __repr__(self) -> str:
+        parts = [str(self.compression)]
+        if self.compression_level is not None:
+            parts.append(f"level={self.compression_level}")
+        if self.chunk_shape is not None:
+            parts.append(f"chunks={self.chunk_shape}")
+        if self.shuffle:
+            parts.append("shuffle")
+        if self.float16:
+            parts.append("float16")
+        return f"Hdf5WritePolicy({', '.join(parts)})"
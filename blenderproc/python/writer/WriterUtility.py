@@ -2,7 +2,15 @@
 
 
 import os
-from typing import List, Dict, Union, Any, Set, Tuple
+from collections import OrderedDict
+from collections.abc import Sequence
+from concurrent.futures import ThreadPoolExecutor, Future
+import tempfile
+import threading
+from types import TracebackType
+import warnings
+import weakref
+from typing import List, Dict, Union, Any, Set, Tuple, Optional, Type, Callable
 import json
 
 import csv
@@ -13,20 +21,30 @@
 
 from blenderproc.python.postprocessing.PostProcessingUtility import trim_redundant_channels, \
     segmentation_mapping
-from blenderproc.python.postprocessing.PostProcessingUtility import dist2depth, depth2dist
+from blenderproc.python.postprocessing.PostProcessingUtility import dist2depth, depth2dist, \
+    vector_field_to_optical_flow
 from blenderproc.python.types.EntityUtility import Entity
+from blenderproc.python.utility.SetupUtility import SetupUtility
 from blenderproc.python.utility.BlenderUtility import load_image
 from blenderproc.python.utility.Utility import resolve_path, Utility, NumpyEncoder
 from blenderproc.python.utility.MathUtility import change_coordinate_frame_of_point, \
     change_source_coordinate_frame_of_transformation_matrix, change_target_coordinate_frame_of_transformation_matrix
 from blenderproc.python.camera import CameraUtility
+from blenderproc.python.modules.main.GlobalStorage import GlobalStorage
+from blenderproc.python.writer.Hdf5WritePolicy import Hdf5WritePolicy
 
 
 def write_hdf5(output_dir_path: str, output_data_dict: Dict[str, List[Union[np.ndarray, list, dict]]],
-               append_to_existing_output: bool = False, stereo_separate_keys: bool = False):
+               append_to_existing_output: bool = False, stereo_separate_keys: bool = False,
+               write_policies: Optional[Dict[str, Hdf5WritePolicy]] = None, frames_per_shard: Optional[int] = None):
     """
     Saves the information provided inside of the output_data_dict into a .hdf5 container
 
+    By default, one .hdf5 container is written per frame. If frames_per_shard is set, the frames are instead packed
+    into shards, where each shard contains up to frames_per_shard frames. Inside a shard, the data of each key is
+    stacked along the first dimension and the dataset `frame_ids` holds the global frame id of each entry. Additionally,
+    the file `shard_index.hdf5` maps each global frame id to its shard and its offset inside the shard.
+
     :param output_dir_path: The folder path in which the .hdf5 containers will be generated
     :param output_data_dict: The container, which keeps the different images, which should be saved to disc.
                              Each key will be saved as its own key in the .hdf5 container.
@@ -37,104 +55,351 @@ def write_hdf5(output_dir_path: str, output_data_dict: Dict[str, List[Union[np.n
                                  won't be saved in one tensor [2, img_x, img_y, channels], where the img[0] is the
                                  left image and img[1] the right. They will be saved in separate keys: for example
                                  for colors in colors_0 and colors_1.
+    :param write_policies: Maps keys to the policy describing how they should be stored, e.g. which compression
+                           should be used. All keys without policy are compressed with gzip.
+    :param frames_per_shard: If given, up to this many frames are packed into one shard container. When appending,
+                             the last shard is filled up first, otherwise the shards of earlier runs are removed.
     """
+    _WriterUtility.make_sure_write_policies_are_supported(write_policies)
+    if frames_per_shard is not None and frames_per_shard < 1:
+        raise ValueError(f"A shard has to contain at least one frame, not {frames_per_shard}.")
 
     if not os.path.exists(output_dir_path):
         os.makedirs(output_dir_path)
 
     amount_of_frames = 0
     for data_block in output_data_dict.values():
-        if isinstance(data_block, list):
+        if isinstance(data_block, (list, LazyFrameList)):
             amount_of_frames = max([amount_of_frames, len(data_block)])
 
+    if amount_of_frames != bpy.context.scene.frame_end - bpy.context.scene.frame_start:
+        raise Exception("The amount of images stored in the output_data_dict does not correspond with the amount"
+                        "of images specified by frame_start to frame_end.")
+
+    is_stereo = bpy.context.scene.render.use_multiview
+    if frames_per_shard is not None:
+        frames = [_WriterUtility.extract_frame_data(output_data_dict, frame) for frame in range(amount_of_frames)]
+        _WriterUtility.write_hdf5_shards(output_dir_path, frames, frames_per_shard, append_to_existing_output,
+                                         stereo_separate_keys, is_stereo, write_policies)
+        return
+
     # if append to existing output is turned on the existing folder is searched for the highest occurring
     # index, which is then used as starting point for this run
     if append_to_existing_output:
-        frame_offset = 0
-        # Look for hdf5 file with highest index
-        for path in os.listdir(output_dir_path):
-            if path.endswith(".hdf5"):
-                index = path[:-len(".hdf5")]
-                if index.isdigit():
-                    frame_offset = max(frame_offset, int(index) + 1)
+        frame_offset = _WriterUtility.find_next_hdf5_index(output_dir_path)
     else:
         frame_offset = 0
 
-    if amount_of_frames != bpy.context.scene.frame_end - bpy.context.scene.frame_start:
-        raise Exception("The amount of images stored in the output_data_dict does not correspond with the amount"
-                        "of images specified by frame_start to frame_end.")
-
     for frame in range(bpy.context.scene.frame_start, bpy.context.scene.frame_end):
         # for each frame a new .hdf5 file is generated
         hdf5_path = os.path.join(output_dir_path, str(frame + frame_offset) + ".hdf5")
-        with h5py.File(hdf5_path, "w") as file:
-            # Go through all the output types
-            print(f"Merging data for frame {frame} into {hdf5_path}")
-
-            adjusted_frame = frame - bpy.context.scene.frame_start
-            for key, data_block in output_data_dict.items():
-                if adjusted_frame < len(data_block):
-                    # get the current data block for the current frame
-                    used_data_block = data_block[adjusted_frame]
-                    if stereo_separate_keys and (bpy.context.scene.render.use_multiview or
-                                                 used_data_block.shape[0] == 2):
-                        # stereo mode was activated
-                        _WriterUtility.write_to_hdf_file(file, key + "_0", data_block[adjusted_frame][0])
-                        _WriterUtility.write_to_hdf_file(file, key + "_1", data_block[adjusted_frame][1])
-                    else:
-                        _WriterUtility.write_to_hdf_file(file, key, data_block[adjusted_frame])
-                else:
-                    raise Exception(f"There are more frames {adjusted_frame} then there are blocks of information "
-                                    f" {len(data_block)} in the given list for key {key}.")
-            blender_proc_version = Utility.get_current_version()
-            if blender_proc_version is not None:
-                _WriterUtility.write_to_hdf_file(file, "blender_proc_version", np.string_(blender_proc_version))
+        print(f"Merging data for frame {frame} into {hdf5_path}")
+        adjusted_frame = frame - bpy.context.scene.frame_start
+        frame_data = _WriterUtility.extract_frame_data(output_data_dict, adjusted_frame)
+        _WriterUtility.write_hdf5_frame(hdf5_path, frame_data, stereo_separate_keys, is_stereo, write_policies)
+
+
+class Hdf5StreamWriter:
+    """ Writes frames into .hdf5 containers in the background, as soon as they are handed over.
+
+    In contrast to `write_hdf5`, the compression and the writing to disc happen on a pool of worker threads, such that
+    the main thread can directly continue with building the next scene. The compression is done via zlib, which
+    releases the GIL, and the compressed chunks are then written directly into the containers. The resulting files
+    are identical in layout to the ones written by `write_hdf5` and can be read with any hdf5 reader.
+
+    Each file is first written to a temporary path and then renamed, so a container with a final name is always
+    complete.
+
+    Usage:
+
+    .. code-block:: python
+
+        with bproc.writer.Hdf5StreamWriter("output/") as writer:
+            for scene in range(10):
+                # ... build the scene
+                data = bproc.renderer.render()
+                writer.write(data)
+
+    The data handed over to the writer must not be changed afterwards, as it is only read once the worker threads
+    get to it.
+
+    Per-key compression and chunking can be configured via write policies, however only gzip policies without
+    explicit chunk shape can be compressed outside of hdf5 and therefore fully in parallel.
+    """
+
+    def __init__(self, output_dir_path: str, append_to_existing_output: bool = False,
+                 stereo_separate_keys: bool = False, num_worker_threads: int = 4, max_queued_frames: int = 16,
+                 compression_level: Optional[int] = None,
+                 write_policies: Optional[Dict[str, Hdf5WritePolicy]] = None):
+        """
+        :param output_dir_path: The folder path in which the .hdf5 containers will be generated
+        :param append_to_existing_output: If this is True, the output_dir_path folder will be scanned for pre-existing
+                                          .hdf5 containers and the numbering of the newly added containers, will start
+                                          right where the last run left off.
+        :param stereo_separate_keys: If this is True and the rendering was done in stereo mode, than the stereo images
+                                     will be saved in separate keys, see `write_hdf5`.
+        :param num_worker_threads: The number of threads, which compress and write the frames.
+        :param max_queued_frames: The maximum number of frames, which are waiting to be written. If this limit is
+                                  reached, handing over a new frame blocks until a worker finished a frame.
+        :param compression_level: Deprecated, use write_policies instead. If given, all keys without policy are
+                                  compressed with gzip and this level in the range of [0, 9].
+        :param write_policies: Maps keys to the policy describing how they should be stored, e.g. which compression
+                               should be used. All keys without policy are compressed with gzip.
+        """
+        if num_worker_threads < 1:
+            raise ValueError(f"At least one worker thread is needed, not {num_worker_threads}.")
+        if max_queued_frames < 1:
+            raise ValueError(f"At least one frame has to be allowed in the queue, not {max_queued_frames}.")
+
+        self._output_dir_path = output_dir_path
+        if not os.path.exists(output_dir_path):
+            os.makedirs(output_dir_path)
+        self._next_index = _WriterUtility.find_next_hdf5_index(output_dir_path) if append_to_existing_output else 0
+        self._stereo_separate_keys = stereo_separate_keys
+        _WriterUtility.make_sure_write_policies_are_supported(write_policies)
+        self._write_policies = write_policies
+        self._default_write_policy = None
+        if compression_level is not None:
+            warnings.warn("The compression_level of the Hdf5StreamWriter is deprecated and will be removed, use "
+                          "write_policies with a bproc.writer.Hdf5WritePolicy per key instead.", DeprecationWarning,
+                          stacklevel=2)
+            self._default_write_policy = Hdf5WritePolicy("gzip", compression_level)
+        self._executor = ThreadPoolExecutor(max_workers=num_worker_threads, thread_name_prefix="Hdf5StreamWriter")
+        self._free_slots = threading.BoundedSemaphore(max_queued_frames)
+        self._pending: List[Future] = []
+
+    def write_frame(self, frame_data: Dict[str, Union[np.ndarray, list, dict]]) -> str:
+        """ Hands over the data of a single frame, which is then written into its own .hdf5 container.
+
+        :param frame_data: Maps each key to the data of this frame, e.g. {"colors": np.ndarray, "depth": np.ndarray}
+        :return: The path of the .hdf5 container the frame will be written to.
+        """
+        hdf5_path = os.path.join(self._output_dir_path, str(self._next_index) + ".hdf5")
+        self._next_index += 1
+        # the blender state is only accessed here on the main thread
+        is_stereo = bpy.context.scene.render.use_multiview
+
+        write_policies = self._write_policies
+        if self._default_write_policy is not None:
+            write_policies = {key: self._default_write_policy for key in frame_data}
+            write_policies.update(self._write_policies or {})
+
+        # block until there is space in the queue, this avoids piling up the data of too many frames in memory
+        self._free_slots.acquire()
+        try:
+            future = self._executor.submit(_WriterUtility.write_hdf5_frame, hdf5_path, frame_data,
+                                           self._stereo_separate_keys, is_stereo, write_policies, True)
+        except BaseException:
+            self._free_slots.release()
+            raise
+        future.add_done_callback(lambda _: self._free_slots.release())
+        self._pending.append(future)
+        self._raise_finished_errors()
+        return hdf5_path
+
+    def write(self, output_data_dict: Dict[str, List[Union[np.ndarray, list, dict]]]) -> List[str]:
+        """ Hands over the data of all frames, as it is returned by the renderer.
+
+        :param output_data_dict: The container, which keeps the different images, which should be saved to disc.
+                                 Each key will be saved as its own key in the .hdf5 container.
+        :return: The paths of the .hdf5 containers, one per frame.
+        """
+        amount_of_frames = 0
+        for data_block in output_data_dict.values():
+            if isinstance(data_block, (list, LazyFrameList)):
+                amount_of_frames = max([amount_of_frames, len(data_block)])
+
+        return [self.write_frame(_WriterUtility.extract_frame_data(output_data_dict, frame))
+                for frame in range(amount_of_frames)]
+
+    def wait(self):
+        """ Blocks until all handed over frames have been written.
+
+        Errors which occurred on a worker thread are raised here.
+        """
+        pending, self._pending = self._pending, []
+        for future in pending:
+            future.result()
+
+    def close(self):
+        """ Waits for all frames to be written and stops the worker threads. """
+        try:
+            self.wait()
+        finally:
+            self._executor.shutdown(wait=True)
+
+    def _raise_finished_errors(self):
+        """ Raises the errors of already finished frames as early as possible and forgets about finished frames. """
+        still_pending = []
+        for future in self._pending:
+            if future.done():
+                future.result()
+            else:
+                still_pending.append(future)
+        self._pending = still_pending
+
+    def __enter__(self) -> "Hdf5StreamWriter":
+        return self
+
+    def __exit__(self, exc_type: Optional[Type[BaseException]], exc_value: Optional[BaseException],
+                 traceback: Optional[TracebackType]):
+        self.close()
+
+
+class LazyFrameList(Sequence):
+    """ A list of per frame outputs, where each frame is only loaded from disc when it is accessed for the first time.
+
+    It can be used like the lists returned by the renderer, e.g. `data["colors"][3]` or `len(data["colors"])`.
+    The most recently accessed frames are kept in memory, all older frames are loaded again, when they are accessed.
+    Outputs stored as .npy files are memory mapped instead of read into memory.
+
+    The underlying files are only removed when `release()` is called. Functions, which expect a real list, can be
+    used with `to_list()`.
+
+    Files in the temporary directory are moved to a separate directory per render call, so they are not overwritten
+    by the next render call. Files in another directory stay where they are, so the list is invalidated by the next
+    render call, after which accessing it raises an error.
+    """
+
+    def __init__(self, paths: List[str], load_frame: Callable[[str], Any], max_cached_frames: int = 8):
+        """
+        :param paths: The path of the output file of each frame.
+        :param load_frame: Loads the output of one frame given the path of its file.
+        :param max_cached_frames: The number of frames, which are kept in memory after they were accessed.
+        """
+        self._paths = paths
+        self._load_frame = load_frame
+        self._max_cached_frames = max_cached_frames
+        self._cache: "OrderedDict[int, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._invalidated = False
+
+    def __len__(self) -> int:
+        return len(self._paths)
+
+    def __getitem__(self, index: Union[int, slice]) -> Any:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(f"Frame {index} is out of range, there are only {len(self)} frames.")
+        if self._invalidated:
+            raise RuntimeError("The files of this lazily loaded list may have been overwritten by a later render "
+                               "call. Use to_list() before rendering again, if the frames are still needed.")
+
+        with self._lock:
+            if index in self._cache:
+                self._cache.move_to_end(index)
+                return self._cache[index]
+        data = self._load_frame(self._paths[index])
+        with self._lock:
+            self._cache[index] = data
+            while len(self._cache) > self._max_cached_frames:
+                self._cache.popitem(last=False)
+        return data
+
+    def to_list(self) -> List[Any]:
+        """ Loads all frames.
+
+        :return: A list containing the output of each frame.
+        """
+        return [self[i] for i in range(len(self))]
+
+    def invalidate(self):
+        """ Marks the list as invalid, as its files are overwritten by another render call. """
+        with self._lock:
+            self._cache.clear()
+            self._invalidated = True
+
+    def release(self):
+        """ Removes the output files of all frames and forgets all cached frames. """
+        with self._lock:
+            self._cache.clear()
+        for path in self._paths:
+            for used_path in [path, *_WriterUtility.get_stereo_path_pair(path)]:
+                if os.path.exists(used_path):
+                    os.remove(used_path)
+
+    def __repr__(self) -> str:
+        return f"LazyFrameList({len(self)} frames, {len(self._cache)} loaded)"
 
 
 class _WriterUtility:
 
+    hdf5_shard_index_name = "shard_index.hdf5"
+    # The lazily loaded lists, whose files are overwritten by the next render call
+    overwritable_lazy_frame_lists: "weakref.WeakSet[LazyFrameList]" = weakref.WeakSet()
+
     @staticmethod
-    def load_registered_outputs(keys: Set[str], keys_with_alpha_channel: Set[str] = None) -> \
-            Dict[str, Union[np.ndarray, List[np.ndarray]]]:
+    def load_registered_outputs(keys: Set[str], keys_with_alpha_channel: Set[str] = None, lazy: bool = False,
+                                max_cached_frames: int = 8) -> \
+            Dict[str, Union[np.ndarray, List[np.ndarray], LazyFrameList]]:
         """
         Loads registered outputs with specified keys
 
         :param keys: set of output_key types to load
         :param keys_with_alpha_channel: A set containing all keys whose alpha channels should be loaded.
+        :param lazy: If True, per frame outputs are returned as `LazyFrameList`, which only load each frame when it
+                     is accessed. Semantic segmentation outputs are always loaded directly, as they depend on the
+                     current state of the objects.
+        :param max_cached_frames: The number of frames each `LazyFrameList` keeps in memory.
         :return: dict of lists of raw loaded outputs. Keys are e.g. 'distance', 'colors', 'normals', 'segmap'
         """
-        output_data_dict: Dict[str, Union[np.ndarray, List[np.ndarray]]] = {}
+        output_data_dict: Dict[str, Union[np.ndarray, List[np.ndarray], LazyFrameList]] = {}
         reg_outputs = Utility.get_registered_outputs()
+        # the directory to which the lazily loaded files of this call are moved
+        lazy_dir = None
+        # the conversion between depth and distance has to use the camera intrinsics of the rendering
+        K = None
+        if any(reg_out['key'] in keys and (reg_out.get("convert_to_depth") or reg_out.get("convert_to_distance"))
+               for reg_out in reg_outputs):
+            K = CameraUtility.get_intrinsics_as_K_matrix()
+            region = GlobalStorage.get("render_region") if GlobalStorage.is_in_storage("render_region") else None
+            if region is not None:
+                # the images are cropped to the render region, so the principal point moves
+                K = K.copy()
+                K[0, 2] -= region[0]
+                K[1, 2] -= region[1]
         for reg_out in reg_outputs:
             if reg_out['key'] in keys:
                 key_has_alpha_channel = keys_with_alpha_channel is not None and reg_out[
                     'key'] in keys_with_alpha_channel
-                if '%' in reg_out['path']:
+                is_semantic_segmentation = "is_semantic_segmentation" in reg_out \
+                                           and reg_out["is_semantic_segmentation"] \
+                                           and "semantic_segmentation_mapping" in reg_out \
+                                           and "semantic_segmentation_default_values" in reg_out
+                if '%' in reg_out['path'] and lazy and not is_semantic_segmentation:
+                    # per frame outputs, which are loaded on access
+                    paths = [resolve_path(reg_out['path'] % frame_id)
+                             for frame_id in range(bpy.context.scene.frame_start, bpy.context.scene.frame_end)]
+                    in_temp_dir = os.path.dirname(os.path.abspath(reg_out['path'])) == \
+                                  os.path.abspath(Utility.get_temporary_directory())
+                    if in_temp_dir:
+                        # move the files out of the way of the next render call, so they can be memory mapped
+                        if lazy_dir is None:
+                            lazy_dir = tempfile.mkdtemp(prefix="lazy_", dir=Utility.get_temporary_directory())
+                        paths = _WriterUtility.move_frame_files(paths, lazy_dir)
+
+                    def load_frame(output_path: str, used_reg_out: Dict[str, Any] = reg_out,
+                                   used_key_has_alpha_channel: bool = key_has_alpha_channel,
+                                   mmap: bool = in_temp_dir) -> np.ndarray:
+                        return _WriterUtility.load_frame_output(output_path, used_reg_out, used_key_has_alpha_channel,
+                                                                K, remove=False, mmap=mmap)
+
+                    lazy_frame_list = LazyFrameList(paths, load_frame, max_cached_frames)
+                    if not in_temp_dir:
+                        _WriterUtility.overwritable_lazy_frame_lists.add(lazy_frame_list)
+                    output_data_dict[reg_out['key']] = lazy_frame_list
+                elif '%' in reg_out['path']:
                     # per frame outputs
                     for frame_id in range(bpy.context.scene.frame_start, bpy.context.scene.frame_end):
                         output_path = resolve_path(reg_out['path'] % frame_id)
-                        if os.path.exists(output_path):
-                            output_file = _WriterUtility.load_output_file(output_path, key_has_alpha_channel)
-                        else:
-                            # check for stereo files
-                            output_paths = _WriterUtility.get_stereo_path_pair(output_path)
-                            # convert to a tensor of shape [2, img_x, img_y, channels]
-                            # output_file[0] is the left image and output_file[1] the right image
-                            output_file = np.array(
-                                [_WriterUtility.load_output_file(path, key_has_alpha_channel) for path in
-                                 output_paths])
-                        # For outputs like distance or depth, we automatically trim the last channel here
-                        if "trim_redundant_channels" in reg_out and reg_out["trim_redundant_channels"]:
-                            output_file = trim_redundant_channels(output_file)
-                        if "convert_to_depth" in reg_out and reg_out["convert_to_depth"]:
-                            output_file = dist2depth(output_file)
-                        if "convert_to_distance" in reg_out and reg_out["convert_to_distance"]:
-                            output_file = depth2dist(output_file)
+                        output_file = _WriterUtility.load_frame_output(output_path, reg_out, key_has_alpha_channel,
+                                                                       K)
 
                         # semantic seg must be last
-                        if "is_semantic_segmentation" in reg_out and reg_out["is_semantic_segmentation"]\
-                                and "semantic_segmentation_mapping" in reg_out \
-                                and "semantic_segmentation_default_values" in reg_out:
+                        if is_semantic_segmentation:
                             output_file = segmentation_mapping(output_file,
                                                                reg_out["semantic_segmentation_mapping"],
                                                                reg_out["semantic_segmentation_default_values"])
@@ -150,6 +415,312 @@ def load_registered_outputs(keys: Set[str], keys_with_alpha_channel: Set[str] =
 
         return output_data_dict
 
+    @staticmethod
+    def move_frame_files(paths: List[str], target_dir: str) -> List[str]:
+        """ Moves the output files of all frames into the given directory, including their stereo pairs.
+
+        :param paths: The path of the output file of each frame.
+        :param target_dir: The directory to move the files to.
+        :return: The new paths.
+        """
+        new_paths = []
+        for path in paths:
+            new_path = os.path.join(target_dir, os.path.basename(path))
+            if os.path.exists(path):
+                os.replace(path, new_path)
+            else:
+                for stereo_path, new_stereo_path in zip(_WriterUtility.get_stereo_path_pair(path),
+                                                        _WriterUtility.get_stereo_path_pair(new_path)):
+                    if os.path.exists(stereo_path):
+                        os.replace(stereo_path, new_stereo_path)
+            new_paths.append(new_path)
+        return new_paths
+
+    @staticmethod
+    def invalidate_overwritable_lazy_frame_lists():
+        """ Invalidates all lazily loaded lists, whose files are overwritten by the next render call. """
+        for lazy_frame_list in list(_WriterUtility.overwritable_lazy_frame_lists):
+            lazy_frame_list.invalidate()
+        _WriterUtility.overwritable_lazy_frame_lists.clear()
+
+    @staticmethod
+    def load_frame_output(output_path: str, reg_out: Dict[str, Any], key_has_alpha_channel: bool,
+                          K: Optional[np.ndarray] = None, remove: bool = True,
+                          mmap: bool = False) -> Union[np.ndarray, List[Any]]:
+        """ Loads the output of a single frame and applies the postprocessing steps registered with the output.
+
+        :param output_path: The path of the output file, if it does not exist the stereo pair of it is loaded.
+        :param reg_out: The registered output entry.
+        :param key_has_alpha_channel: Whether to load the alpha channel as well.
+        :param K: The camera intrinsics used for converting between depth and distance.
+        :param remove: Whether to delete the file after loading.
+        :param mmap: Whether .npy files should be memory mapped instead of being read.
+        :return: The loaded output.
+        """
+        if os.path.exists(output_path):
+            output_file = _WriterUtility.load_output_file(output_path, key_has_alpha_channel, remove, mmap)
+        else:
+            # check for stereo files
+            output_paths = _WriterUtility.get_stereo_path_pair(output_path)
+            # convert to a tensor of shape [2, img_x, img_y, channels]
+            # output_file[0] is the left image and output_file[1] the right image
+            output_file = np.array(
+                [_WriterUtility.load_output_file(path, key_has_alpha_channel, remove, mmap) for path in
+                 output_paths])
+        # For outputs like distance or depth, we automatically trim the last channel here
+        if "trim_redundant_channels" in reg_out and reg_out["trim_redundant_channels"]:
+            output_file = trim_redundant_channels(output_file)
+        if "convert_to_depth" in reg_out and reg_out["convert_to_depth"]:
+            output_file = dist2depth(output_file, K)
+        if "convert_to_distance" in reg_out and reg_out["convert_to_distance"]:
+            output_file = depth2dist(output_file, K)
+        if "optical_flow_direction" in reg_out:
+            output_file = vector_field_to_optical_flow(
+                output_file, reg_out["optical_flow_direction"], reg_out["blender_image_coordinate_style"])
+        return output_file
+
+    @staticmethod
+    def find_next_hdf5_index(output_dir_path: str) -> int:
+        """ Returns the index following the highest index of all .hdf5 containers in the given folder.
+
+        :param output_dir_path: The folder which is scanned for .hdf5 containers.
+        :return: The index at which new containers should start, zero if there are no containers yet.
+        """
+        next_index = 0
+        for path in os.listdir(output_dir_path):
+            if path.endswith(".hdf5"):
+                index = path[:-len(".hdf5")]
+                if index.isdigit():
+                    next_index = max(next_index, int(index) + 1)
+        return next_index
+
+    @staticmethod
+    def extract_frame_data(output_data_dict: Dict[str, List[Union[np.ndarray, list, dict]]],
+                           frame: int) -> Dict[str, Union[np.ndarray, list, dict]]:
+        """ Collects the data of the given frame from all keys of the given output_data_dict.
+
+        :param output_data_dict: Maps each key to a list containing the data of each frame.
+        :param frame: The frame index relative to the first frame.
+        :return: Maps each key to the data of the given frame.
+        """
+        frame_data = {}
+        for key, data_block in output_data_dict.items():
+            if frame < len(data_block):
+                # get the current data block for the current frame
+                frame_data[key] = data_block[frame]
+            else:
+                raise Exception(f"There are more frames {frame} then there are blocks of information "
+                                f" {len(data_block)} in the given list for key {key}.")
+        return frame_data
+
+    @staticmethod
+    def make_sure_write_policies_are_supported(write_policies: Optional[Dict[str, Hdf5WritePolicy]]):
+        """ Installs the packages required by the given write policies.
+
+        :param write_policies: Maps keys to their write policy.
+        """
+        if write_policies is not None and any(policy.requires_hdf5plugin() for policy in write_policies.values()):
+            SetupUtility.setup_pip(["hdf5plugin"])
+
+    @staticmethod
+    def get_write_policy(write_policies: Optional[Dict[str, Hdf5WritePolicy]], key: str) -> Hdf5WritePolicy:
+        """ Returns the write policy which should be used for the given key.
+
+        :param write_policies: Maps keys to their write policy.
+        :param key: The key, for stereo images which are stored in separate keys the suffix "_0"/"_1" is ignored.
+        :return: The policy registered for the key or the default gzip policy.
+        """
+        if write_policies is not None:
+            if key in write_policies:
+                return write_policies[key]
+            if key[-2:] in ["_0", "_1"] and key[:-2] in write_policies:
+                return write_policies[key[:-2]]
+        return Hdf5WritePolicy()
+
+    @staticmethod
+    def write_hdf5_frame(hdf5_path: str, frame_data: Dict[str, Union[np.ndarray, list, dict]],
+                         stereo_separate_keys: bool, is_stereo: bool,
+                         write_policies: Optional[Dict[str, Hdf5WritePolicy]] = None, precompress: bool = False):
+        """ Writes the data of one frame into a new .hdf5 container.
+
+        This function does not access any blender state and can therefore also be called from worker threads.
+
+        :param hdf5_path: The path of the .hdf5 container, which will be created.
+        :param frame_data: Maps each key to the data of this frame.
+        :param stereo_separate_keys: If True, stereo images are stored in two separate keys: key_0 and key_1.
+        :param is_stereo: Whether the rendering was done in stereo mode.
+        :param write_policies: Maps keys to the policy describing how they should be stored.
+        :param precompress: If True, the data is compressed via zlib before it is handed over to hdf5, wherever the
+                            write policy allows it. As zlib releases the GIL, this allows compressing in parallel
+                            threads. The container is then first written to a temporary path and renamed afterwards.
+        """
+        entries = _WriterUtility.split_stereo_entries(frame_data, stereo_separate_keys, is_stereo)
+        blender_proc_version = Utility.get_current_version()
+        if blender_proc_version is not None:
+            entries.append(("blender_proc_version", np.string_(blender_proc_version)))
+
+        if not precompress:
+            with h5py.File(hdf5_path, "w") as file:
+                for key, data in entries:
+                    _WriterUtility.write_to_hdf_file(file, key, data,
+                                                     policy=_WriterUtility.get_write_policy(write_policies, key))
+            return
+
+        # compress everything before the file is opened, h5py holds a global lock while it is working
+        compressed_entries = []
+        for key, data in entries:
+            policy = _WriterUtility.get_write_policy(write_policies, key)
+            data = policy.convert(_WriterUtility.prepare_data_for_hdf_file(key, data))
+            compressed_entries.append((key, data, policy, policy.precompress(data)))
+
+        temp_path = hdf5_path + ".tmp"
+        with h5py.File(temp_path, "w") as file:
+            for key, data, policy, compressed_chunk in compressed_entries:
+                policy.write(file, key, data, compressed_chunk)
+        os.replace(temp_path, hdf5_path)
+
+    @staticmethod
+    def split_stereo_entries(frame_data: Dict[str, Union[np.ndarray, list, dict]], stereo_separate_keys: bool,
+                             is_stereo: bool) -> List[Tuple[str, Union[np.ndarray, list, dict]]]:
+        """ Lists the entries, which should be written for the given frame.
+
+        :param frame_data: Maps each key to the data of this frame.
+        :param stereo_separate_keys: If True, stereo images are split into two separate keys: key_0 and key_1.
+        :param is_stereo: Whether the rendering was done in stereo mode.
+        :return: A list of key and data pairs.
+        """
+        entries = []
+        for key, data in frame_data.items():
+            if stereo_separate_keys and (is_stereo or data.shape[0] == 2):
+                # stereo mode was activated
+                entries.append((key + "_0", data[0]))
+                entries.append((key + "_1", data[1]))
+            else:
+                entries.append((key, data))
+        return entries
+
+    @staticmethod
+    def read_hdf5_shard_index(output_dir_path: str) -> np.ndarray:
+        """ Reads the index of a sharded output, which maps each global frame id to its shard and offset.
+
+        :param output_dir_path: The folder containing the shards.
+        :return: An int64 array of shape [N, 3], where each row contains the frame id, the shard id and the offset
+                 of the frame inside of its shard. The array is empty if there is no index yet.
+        """
+        index_path = os.path.join(output_dir_path, _WriterUtility.hdf5_shard_index_name)
+        if not os.path.exists(index_path):
+            return np.zeros((0, 3), dtype=np.int64)
+        with h5py.File(index_path, "r") as file:
+            return np.array(file["shard_index"], dtype=np.int64)
+
+    @staticmethod
+    def remove_hdf5_shards(output_dir_path: str):
+        """ Removes the shards and the shard index, which have been written by an earlier run.
+
+        :param output_dir_path: The folder containing the shards.
+        """
+        for file_name in os.listdir(output_dir_path):
+            if file_name == _WriterUtility.hdf5_shard_index_name or \
+                    (file_name.startswith("shard_") and file_name.endswith(".hdf5")):
+                os.remove(os.path.join(output_dir_path, file_name))
+
+    @staticmethod
+    def write_hdf5_shards(output_dir_path: str, frames: List[Dict[str, Union[np.ndarray, list, dict]]],
+                          frames_per_shard: int, append_to_existing_output: bool, stereo_separate_keys: bool,
+                          is_stereo: bool, write_policies: Optional[Dict[str, Hdf5WritePolicy]] = None):
+        """ Packs the given frames into shard containers, each holding up to frames_per_shard frames.
+
+        :param output_dir_path: The folder in which the shards are written.
+        :param frames: The data of each frame, mapping each key to the data of this frame.
+        :param frames_per_shard: The maximum number of frames per shard.
+        :param append_to_existing_output: If True, the numbering continues after the last frame in the existing index
+                                          and the last shard is filled up before a new shard is started. Otherwise,
+                                          the shards of earlier runs are removed.
+        :param stereo_separate_keys: If True, stereo images are stored in two separate keys: key_0 and key_1.
+        :param is_stereo: Whether the rendering was done in stereo mode.
+        :param write_policies: Maps keys to the policy describing how they should be stored.
+        """
+        if append_to_existing_output:
+            shard_index = _WriterUtility.read_hdf5_shard_index(output_dir_path)
+        else:
+            # shards of an earlier run would otherwise be mixed with the new ones, once they are appended to
+            _WriterUtility.remove_hdf5_shards(output_dir_path)
+            shard_index = np.zeros((0, 3), dtype=np.int64)
+        if len(shard_index) > 0:
+            next_frame_id = int(shard_index[-1, 0]) + 1
+            shard_id = int(shard_index[-1, 1])
+            offset = int(shard_index[-1, 2]) + 1
+        else:
+            next_frame_id, shard_id, offset = 0, 0, 0
+
+        new_rows = []
+        frame_index = 0
+        while frame_index < len(frames):
+            if offset >= frames_per_shard:
+                shard_id += 1
+                offset = 0
+            shard_frames = frames[frame_index:frame_index + frames_per_shard - offset]
+            shard_path = os.path.join(output_dir_path, f"shard_{shard_id:06d}.hdf5")
+            print(f"Writing frames {next_frame_id} to {next_frame_id + len(shard_frames) - 1} into {shard_path}")
+            # only reopen a shard, if it was filled by a previous run
+            with h5py.File(shard_path, "a" if offset > 0 else "w") as file:
+                if offset == 0:
+                    file.attrs["layout"] = "sharded"
+                    file.attrs["frames_per_shard"] = frames_per_shard
+                    blender_proc_version = Utility.get_current_version()
+                    if blender_proc_version is not None:
+                        file.attrs["blender_proc_version"] = blender_proc_version
+                for frame_data in shard_frames:
+                    entries = _WriterUtility.split_stereo_entries(frame_data, stereo_separate_keys, is_stereo)
+                    entries.append(("frame_ids", np.array(next_frame_id, dtype=np.int64)))
+                    for key, data in entries:
+                        _WriterUtility.append_to_stacked_hdf_dataset(
+                            file, key, data, offset, _WriterUtility.get_write_policy(write_policies, key))
+                    new_rows.append([next_frame_id, shard_id, offset])
+                    next_frame_id += 1
+                    offset += 1
+            frame_index += len(shard_frames)
+
+        index_path = os.path.join(output_dir_path, _WriterUtility.hdf5_shard_index_name)
+        shard_index = np.concatenate([shard_index, np.array(new_rows, dtype=np.int64).reshape(-1, 3)], axis=0)
+        # the index is replaced at once, so it never references frames that have not been written
+        with h5py.File(index_path + ".tmp", "w") as file:
+            file.create_dataset("shard_index", data=shard_index)
+        os.replace(index_path + ".tmp", index_path)
+
+    @staticmethod
+    def append_to_stacked_hdf_dataset(file, key: str, data: Union[np.ndarray, list, dict], offset: int,
+                                      policy: Hdf5WritePolicy):
+        """ Stores the given data at the given offset of a dataset, which stacks the data of multiple frames.
+
+        :param file: The hdf5 file handle. Type: hdf5.File
+        :param key: The key of the stacked dataset.
+        :param data: The data of the current frame.
+        :param offset: The position along the first dimension at which the data should be stored.
+        :param policy: Describes how the data is stored.
+        """
+        data = policy.convert(_WriterUtility.prepare_data_for_hdf_file(key, data))
+        if key not in file:
+            if offset > 0:
+                raise ValueError(f"The key {key} is not present in the earlier frames of the shard {file.filename}, "
+                                 f"all frames of a shard need to have the same keys.")
+            if data.dtype.char == 'S':
+                # json strings have a different length in each frame
+                file.create_dataset(key, shape=(0,), maxshape=(None,), dtype=h5py.special_dtype(vlen=bytes))
+            else:
+                kwargs = policy.dataset_kwargs(data)
+                chunks = kwargs.pop("chunks", data.shape)
+                # chunks can not be larger than the maximum shape, so empty dimensions have to be resizable
+                maxshape = tuple(size if size > 0 else None for size in data.shape)
+                file.create_dataset(key, shape=(0,) + data.shape, maxshape=(None,) + maxshape, dtype=data.dtype,
+                                    chunks=(1,) + tuple(max(1, size) for size in chunks), **kwargs)
+        dataset = file[key]
+        if dataset.shape[1:] != data.shape and dataset.dtype.char != 'O':
+            raise ValueError(f"The shape of {key} {data.shape} does not match the shape of the earlier frames in the "
+                             f"shard {file.filename} {dataset.shape[1:]}.")
+        dataset.resize(offset + 1, axis=0)
+        dataset[offset] = data.tobytes() if dataset.dtype.char == 'O' else data
+
     @staticmethod
     def get_stereo_path_pair(file_path: str) -> Tuple[str, str]:
         """
@@ -166,12 +737,13 @@ def get_stereo_path_pair(file_path: str) -> Tuple[str, str]:
 
     @staticmethod
     def load_output_file(file_path: str, load_alpha_channel: bool = False,
-                         remove: bool = True) -> Union[np.ndarray, List[Any]]:
+                         remove: bool = True, mmap: bool = False) -> Union[np.ndarray, List[Any]]:
         """ Tries to read in the file with the given path into a numpy array.
 
         :param file_path: The file path. Type: string.
         :param load_alpha_channel: Whether to load the alpha channel as well. Type: bool. Default: False
         :param remove: Whether to delete file after loading.
+        :param mmap: Whether .npy files should be memory mapped in read-only mode instead of being read.
         :return: Loaded data from the file as numpy array if possible.
         """
         if not os.path.exists(file_path):
@@ -182,6 +754,8 @@ def load_output_file(file_path: str, load_alpha_channel: bool = False,
         if file_ending in ["exr", "png", "jpg"]:
             # num_channels is 4 if transparent_background is true in config
             output = load_image(file_path, num_channels=3 + (1 if load_alpha_channel else 0))
+        elif file_ending == "npy" and mmap:
+            output = np.load(file_path, mmap_mode='r')
         elif file_ending in ["npy", "npz"]:
             output = np.load(file_path)
         elif file_ending in ["csv"]:
@@ -341,12 +915,28 @@ def _get_shapenet_attribute(shapenet_obj: bpy.types.Object, attribute_name: str,
                                                    world_frame_change)
 
     @staticmethod
-    def write_to_hdf_file(file, key: str, data: Union[np.ndarray, list, dict], compression: str = "gzip"):
+    def write_to_hdf_file(file, key: str, data: Union[np.ndarray, list, dict], compression: str = "gzip",
+                          policy: Optional[Hdf5WritePolicy] = None):
         """ Adds the given data as a new entry to the given hdf5 file.
 
         :param file: The hdf5 file handle. Type: hdf5.File
         :param key: The key at which the data should be stored in the hdf5 file.
         :param data: The data to store.
+        :param compression: The compression to use, only used if no policy is given.
+        :param policy: Describes how the data is stored, e.g. compression, chunking and dtype conversion.
+        """
+        if policy is None:
+            policy = Hdf5WritePolicy(compression)
+        data = policy.convert(_WriterUtility.prepare_data_for_hdf_file(key, data))
+        policy.write(file, key, data)
+
+    @staticmethod
+    def prepare_data_for_hdf_file(key: str, data: Union[np.ndarray, list, dict]) -> Union[np.ndarray, np.bytes_]:
+        """ Converts the given data into a type, which can be stored in a hdf5 file.
+
+        :param key: The key at which the data should be stored in the hdf5 file.
+        :param data: The data to store.
+        :return: The data as numpy array, dicts are serialized to json strings.
         """
         if not isinstance(data, np.ndarray) and not isinstance(data, np.bytes_):
             if isinstance(data, (list, dict)):
@@ -358,8 +948,4 @@ def write_to_hdf_file(file, key: str, data: Union[np.ndarray, list, dict], compr
             else:
                 raise Exception(
                     f"This fct. expects the data for key {key} to be a np.ndarray, list or dict not a {type(data)}!")
-
-        if data.dtype.char == 'S':
-            file.create_dataset(key, data=data, dtype=data.dtype)
-        else:
-            file.create_dataset(key, data=data, compression=compression)
+        return data
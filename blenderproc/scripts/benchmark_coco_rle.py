@@ -0,0 +1,138 @@
+""" Benchmarks the coco RLE encoding and decoding on synthetic object masks.
+
+Run it via:
+
+    blenderproc benchmark coco_rle --resolution 1920 1080 --masks 20
+"""
+
+import argparse
+import json
+import time
+from itertools import groupby
+from typing import Callable, Dict, List
+
+import numpy as np
+
+from blenderproc.python.writer.CocoRleUtility import binary_mask_to_rle, rle_to_binary_mask
+
+
+def groupby_binary_mask_to_rle(binary_mask: np.ndarray) -> Dict[str, List[int]]:
+    """ The previous pure python encoder, which is used as reference.
+
+    :param binary_mask: a 2D binary numpy array where '1's represent the object
+    :return: Mask in RLE format
+    """
+    rle: Dict[str, List[int]] = {'counts': [], 'size': list(binary_mask.shape)}
+    counts = rle.get('counts')
+    for i, (value, elements) in enumerate(groupby(binary_mask.ravel(order='F'))):
+        if i == 0 and value == 1:
+            counts.append(0)
+        counts.append(len(list(elements)))
+    return rle
+
+
+def loop_rle_to_binary_mask(rle: Dict[str, List[int]]) -> np.ndarray:
+    """ The previous pure python decoder, which is used as reference.
+
+    :param rle: Mask in RLE format
+    :return: a 2D binary numpy array where '1's represent the object
+    """
+    binary_array = np.zeros(np.prod(rle.get('size')), dtype=bool)
+    counts: List[int] = rle.get('counts')
+
+    start = 0
+    for i in range(len(counts) - 1):
+        start += counts[i]
+        end = start + counts[i + 1]
+        binary_array[start:end] = (i + 1) % 2
+
+    return binary_array.reshape(*rle.get('size'), order='F')
+
+
+def generate_masks(width: int, height: int, num_masks: int, rng: np.random.Generator) -> List[np.ndarray]:
+    """ Generates object masks, which consist of a few overlapping ellipses with a noisy border.
+
+    :param width: The width of the masks.
+    :param height: The height of the masks.
+    :param num_masks: The number of masks to generate.
+    :param rng: The random number generator to use.
+    :return: The binary masks.
+    """
+    ys, xs = np.mgrid[0:height, 0:width]
+    masks = []
+    for _ in range(num_masks):
+        mask = np.zeros((height, width), dtype=np.uint8)
+        for _ in range(3):
+            center = rng.uniform([0, 0], [width, height])
+            radius = rng.uniform(20, min(width, height) / 4, size=2)
+            distance = ((xs - center[0]) / radius[0]) ** 2 + ((ys - center[1]) / radius[1]) ** 2
+            mask[distance + rng.normal(scale=0.05, size=distance.shape) < 1] = 1
+        masks.append(mask)
+    return masks
+
+
+def time_function(function: Callable, inputs: List) -> float:
+    """ Measures the time needed to apply the given function to all inputs.
+
+    :param function: The function to benchmark.
+    :param inputs: The inputs to apply the function to.
+    :return: The average time per input in milliseconds.
+    """
+    begin = time.perf_counter()
+    for value in inputs:
+        function(value)
+    return (time.perf_counter() - begin) / len(inputs) * 1000
+
+
+def cli():
+    """
+    Command line function
+    """
+    parser = argparse.ArgumentParser("Benchmarks the coco RLE encoding and decoding on synthetic object masks.")
+    parser.add_argument('--resolution', nargs=2, type=int, default=[1920, 1080], help="Width and height.")
+    parser.add_argument('--masks', type=int, default=20, help="The number of masks to encode and decode.")
+    args = parser.parse_args()
+
+    masks = generate_masks(args.resolution[0], args.resolution[1], args.masks, np.random.default_rng(0))
+    rles = [binary_mask_to_rle(mask) for mask in masks]
+    compressed_rles = [binary_mask_to_rle(mask, compressed=True) for mask in masks]
+
+    # make sure all implementations agree, before measuring them
+    for mask, rle, compressed_rle in zip(masks, rles, compressed_rles):
+        if rle != groupby_binary_mask_to_rle(mask):
+            raise RuntimeError("The vectorized encoder does not match the previous implementation.")
+        if not np.array_equal(rle_to_binary_mask(compressed_rle), mask.astype(bool)):
+            raise RuntimeError("The compressed RLE does not round trip.")
+
+    results = [
+        ("encode (previous)", time_function(groupby_binary_mask_to_rle, masks)),
+        ("encode", time_function(binary_mask_to_rle, masks)),
+        ("encode compressed", time_function(lambda mask: binary_mask_to_rle(mask, compressed=True), masks)),
+        ("decode (previous)", time_function(loop_rle_to_binary_mask, rles)),
+        ("decode", time_function(rle_to_binary_mask, rles)),
+        ("decode compressed", time_function(rle_to_binary_mask, compressed_rles))
+    ]
+    try:
+        # pylint: disable=import-outside-toplevel
+        from pycocotools import mask as mask_utils
+        # pylint: enable=import-outside-toplevel
+        fortran_masks = [np.asfortranarray(mask) for mask in masks]
+        results.append(("encode pycocotools", time_function(mask_utils.encode, fortran_masks)))
+        for compressed_rle, fortran_mask in zip(compressed_rles, fortran_masks):
+            if compressed_rle["counts"] != mask_utils.encode(fortran_mask)["counts"].decode("ascii"):
+                raise RuntimeError("The compressed RLE does not match the one of pycocotools.")
+    except ImportError:
+        print("pycocotools is not installed, skipping the comparison with it.")
+
+    print(f"{args.masks} masks with {args.resolution[0]}x{args.resolution[1]} pixels")
+    print(f"{'':<22}{'time per mask [ms]':>20}")
+    for name, duration in results:
+        print(f"{name:<22}{duration:>20.3f}")
+    rle_size = sum(len(json.dumps(rle)) for rle in rles)
+    compressed_size = sum(len(json.dumps(rle)) for rle in compressed_rles)
+    print(f"json size: {rle_size / 1e3:.1f} kB uncompressed, {compressed_size / 1e3:.1f} kB compressed "
+          f"({rle_size / compressed_size:.1f}x smaller)")
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,158 @@
+""" Benchmarks the different hdf5 write policies on synthetic renderer outputs.
+
+Run it via:
+
+    blenderproc benchmark hdf5 --resolution 1920 1080 --frames 10
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from typing import Dict, List, Tuple
+
+import h5py
+import numpy as np
+
+from blenderproc.python.writer.Hdf5WritePolicy import Hdf5WritePolicy
+
+
+def generate_frame(width: int, height: int, num_objects: int, rng: np.random.Generator) -> Dict[str, np.ndarray]:
+    """ Generates data, which roughly resembles the outputs of the renderer for one frame.
+
+    The images consist of a few rectangular objects placed in front of a background plane, which gives them the
+    large constant regions and the sharp edges real renderings have.
+
+    :param width: The width of the images.
+    :param height: The height of the images.
+    :param num_objects: The number of objects visible in the images.
+    :param rng: The random number generator to use.
+    :return: Maps the keys colors, depth, normals and instance_segmaps to their image.
+    """
+    ys, xs = np.mgrid[0:height, 0:width].astype(np.float32)
+    depth = 3.0 + 0.5 * ys / height
+    normals = np.zeros((height, width, 3), dtype=np.float32)
+    normals[:, :, 2] = 1.0
+    segmap = np.zeros((height, width), dtype=np.uint8)
+    colors = np.empty((height, width, 3), dtype=np.float32)
+    colors[:] = [0.4, 0.4, 0.45]
+
+    for object_id in range(1, num_objects + 1):
+        x_0, y_0 = rng.integers(0, width - 1), rng.integers(0, height - 1)
+        x_1, y_1 = min(width, x_0 + rng.integers(20, width // 4)), min(height, y_0 + rng.integers(20, height // 4))
+        region = (slice(y_0, y_1), slice(x_0, x_1))
+        object_depth = rng.uniform(0.5, 2.5) + 0.1 * (xs[region] - x_0) / width
+        depth[region] = object_depth
+        normal = rng.normal(size=3)
+        normals[region] = normal / np.linalg.norm(normal)
+        segmap[region] = object_id
+        colors[region] = rng.uniform(0, 1, size=3) * (0.7 + 0.3 * np.cos(ys[region] / 7.0))[:, :, None]
+
+    # add some sampling noise to the color image
+    colors += rng.normal(scale=0.02, size=colors.shape).astype(np.float32)
+    return {
+        "colors": (np.clip(colors, 0, 1) * 255).astype(np.uint8),
+        "depth": depth.astype(np.float32),
+        "normals": normals,
+        "instance_segmaps": segmap
+    }
+
+
+def default_policies() -> List[Tuple[str, Dict[str, Hdf5WritePolicy]]]:
+    """ Returns the policy configurations, which should be compared.
+
+    :return: A list of named configurations, each mapping keys to their policy.
+    """
+    keys = ["colors", "depth", "normals", "instance_segmaps"]
+
+    def same_for_all(policy: Hdf5WritePolicy) -> Dict[str, Hdf5WritePolicy]:
+        return {key: policy for key in keys}
+
+    configurations = [
+        ("none", same_for_all(Hdf5WritePolicy(None))),
+        ("lzf", same_for_all(Hdf5WritePolicy("lzf"))),
+        ("gzip-1", same_for_all(Hdf5WritePolicy("gzip", 1))),
+        ("gzip-4 (default)", same_for_all(Hdf5WritePolicy("gzip", 4))),
+        ("gzip-9", same_for_all(Hdf5WritePolicy("gzip", 9))),
+        ("gzip-4 shuffle", same_for_all(Hdf5WritePolicy("gzip", 4, shuffle=True))),
+        ("gzip-4 shuffle tiles", same_for_all(Hdf5WritePolicy("gzip", 4, chunk_shape=(256, 256), shuffle=True))),
+        ("gzip-4 shuffle float16", {
+            "colors": Hdf5WritePolicy("gzip", 4, shuffle=True),
+            "depth": Hdf5WritePolicy("gzip", 4, shuffle=True, float16=True),
+            "normals": Hdf5WritePolicy("gzip", 4, shuffle=True, float16=True),
+            "instance_segmaps": Hdf5WritePolicy("gzip", 4)
+        }),
+        ("lzf shuffle float16", {
+            "colors": Hdf5WritePolicy("lzf", shuffle=True),
+            "depth": Hdf5WritePolicy("lzf", shuffle=True, float16=True),
+            "normals": Hdf5WritePolicy("lzf", shuffle=True, float16=True),
+            "instance_segmaps": Hdf5WritePolicy("lzf")
+        })
+    ]
+    try:
+        # pylint: disable=import-outside-toplevel,unused-import
+        import hdf5plugin
+        # pylint: enable=import-outside-toplevel,unused-import
+        configurations.append(("blosc-zstd-5 shuffle", same_for_all(Hdf5WritePolicy("blosc", 5, shuffle=True))))
+        configurations.append(("zstd-3", same_for_all(Hdf5WritePolicy("zstd", 3))))
+    except ImportError:
+        print("hdf5plugin is not installed, skipping the blosc and zstd policies.")
+    return configurations
+
+
+def benchmark(frames: List[Dict[str, np.ndarray]], policies: Dict[str, Hdf5WritePolicy], output_dir: str,
+              precompress: bool) -> Tuple[float, int]:
+    """ Writes all given frames with the given policies.
+
+    :param frames: The data of all frames.
+    :param policies: Maps each key to its write policy.
+    :param output_dir: The directory, in which the containers are written.
+    :param precompress: If True, the data is compressed outside of hdf5, where the policy allows it.
+    :return: The time needed to write all frames and the total size of the written containers in bytes.
+    """
+    total_size = 0
+    begin = time.perf_counter()
+    for frame_id, frame in enumerate(frames):
+        path = os.path.join(output_dir, f"{frame_id}.hdf5")
+        with h5py.File(path, "w") as file:
+            for key, data in frame.items():
+                policy = policies[key]
+                data = policy.convert(data)
+                policy.write(file, key, data, policy.precompress(data) if precompress else None)
+    duration = time.perf_counter() - begin
+    for frame_id in range(len(frames)):
+        path = os.path.join(output_dir, f"{frame_id}.hdf5")
+        total_size += os.path.getsize(path)
+        os.remove(path)
+    return duration, total_size
+
+
+def cli():
+    """
+    Command line function
+    """
+    parser = argparse.ArgumentParser("Benchmarks the hdf5 write policies on synthetic renderer outputs.")
+    parser.add_argument('--resolution', nargs=2, type=int, default=[1920, 1080], help="Width and height.")
+    parser.add_argument('--frames', type=int, default=5, help="The number of frames to write per policy.")
+    parser.add_argument('--objects', type=int, default=30, help="The number of objects visible in each frame.")
+    parser.add_argument('--precompress', action='store_true',
+                        help="Compress the data via zlib outside of hdf5, like the Hdf5StreamWriter does.")
+    parser.add_argument('--output_dir', default=None,
+                        help="The directory in which the test containers are written. Default: a temporary dir")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    frames = [generate_frame(args.resolution[0], args.resolution[1], args.objects, rng) for _ in range(args.frames)]
+    raw_size = sum(data.nbytes for frame in frames for data in frame.values())
+
+    print(f"Writing {args.frames} frames with {raw_size / args.frames / 1e6:.1f} MB of raw data each")
+    print(f"{'policy':<28}{'time [s]':>10}{'write [MB/s]':>14}{'size [MB]':>12}{'ratio':>8}")
+    with tempfile.TemporaryDirectory(dir=args.output_dir) as output_dir:
+        for name, policies in default_policies():
+            duration, total_size = benchmark(frames, policies, output_dir, args.precompress)
+            print(f"{name:<28}{duration:>10.3f}{raw_size / duration / 1e6:>14.1f}{total_size / 1e6:>12.2f}"
+                  f"{raw_size / total_size:>8.2f}")
+
+
+if __name__ == "__main__":
+    cli()
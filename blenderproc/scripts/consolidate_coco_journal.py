@@ -0,0 +1,28 @@
+""" Consolidates a coco annotations journal into a single coco annotations file. """
+
+import argparse
+
+from blenderproc.python.writer.CocoJournalUtility import CocoAnnotationsJournal
+
+
+def cli():
+    """
+    Command line function
+    """
+    parser = argparse.ArgumentParser("Consolidates the coco journal, written by write_coco_annotations with "
+                                     "use_journal=True, into a single coco_annotations.json.")
+    parser.add_argument('output_dir', help="The output directory of the coco writer, which contains the coco_journal "
+                                           "folder.")
+    parser.add_argument('--output', default=None, help="The path of the consolidated file. "
+                                                       "Default: <output_dir>/coco_annotations.json")
+    parser.add_argument('--indent', type=int, default=None, help="Indent the images and annotations entries.")
+    args = parser.parse_args()
+
+    journal = CocoAnnotationsJournal(args.output_dir)
+    print(f"Consolidating {len(journal.shard_paths())} shards from {journal.journal_dir}")
+    output_path = journal.consolidate(args.output, args.indent)
+    print(f"Wrote coco annotations to {output_path}")
+
+
+if __name__ == "__main__":
+    cli()
@@ -8,9 +8,9 @@
 import numpy as np
 
 try:
-    from visHdf5Files import vis_data
+    from visHdf5Files import vis_data, is_sharded_container, iterate_shard_frames
 except ModuleNotFoundError:
-    from blenderproc.scripts.visHdf5Files import vis_data
+    from blenderproc.scripts.visHdf5Files import vis_data, is_sharded_container, iterate_shard_frames
 
 
 def save_array_as_image(array, key, file_path):
@@ -18,8 +18,32 @@ def save_array_as_image(array, key, file_path):
     vis_data(key, array, None, "", save_to_file=file_path)
 
 
+def save_frame_as_images(data, base_name: str):
+    """ Save all image keys of one frame as separate images
+
+    :param data: Maps each key to the data of this frame, e.g. an opened hdf5 file.
+    :param base_name: The prefix of the image paths.
+    """
+    for key, val in data.items():
+        val = np.array(val)
+        if np.issubdtype(val.dtype, np.string_) or len(val.shape) == 1:
+            pass  # metadata
+        else:
+            print(f"key: {key} {val.shape} {val.dtype.name}")
+
+            if val.shape[0] != 2:
+                # mono image
+                file_path = f'{base_name}_{key}.png'
+                save_array_as_image(val, key, file_path)
+            else:
+                # stereo image
+                for image_index, image_value in enumerate(val):
+                    file_path = f'{base_name}_{key}_{image_index}.png'
+                    save_array_as_image(image_value, key, file_path)
+
+
 def convert_hdf(base_file_path: str, output_folder: Optional[str] = None):
-    """ Convert a hdf5 file to images """
+    """ Convert a hdf5 file to images, in case of a shard the images of all contained frames are saved """
     if os.path.exists(base_file_path):
         if os.path.isfile(base_file_path):
             base_name = str(os.path.basename(base_file_path)).split('.', maxsplit=1)[0]
@@ -27,22 +51,11 @@ def convert_hdf(base_file_path: str, output_folder: Optional[str] = None):
                 base_name = os.path.join(output_folder, base_name)
             with h5py.File(base_file_path, 'r') as data:
                 print(f"{base_file_path}:")
-                for key, val in data.items():
-                    val = np.array(val)
-                    if np.issubdtype(val.dtype, np.string_) or len(val.shape) == 1:
-                        pass  # metadata
-                    else:
-                        print(f"key: {key} {val.shape} {val.dtype.name}")
-
-                        if val.shape[0] != 2:
-                            # mono image
-                            file_path = f'{base_name}_{key}.png'
-                            save_array_as_image(val, key, file_path)
-                        else:
-                            # stereo image
-                            for image_index, image_value in enumerate(val):
-                                file_path = f'{base_name}_{key}_{image_index}.png'
-                                save_array_as_image(image_value, key, file_path)
+                if is_sharded_container(data):
+                    for frame_id, frame_data in iterate_shard_frames(data):
+                        save_frame_as_images(frame_data, f"{base_name}_{frame_id}")
+                else:
+                    save_frame_as_images(data, base_name)
         else:
             print("The path is not a file")
     else:
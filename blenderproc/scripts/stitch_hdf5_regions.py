@@ -0,0 +1,73 @@
+""" Stitches the .hdf5 containers of several render regions of the same frames into containers of the whole images. """
+
+import argparse
+import json
+import os
+from typing import Any, Dict
+
+import h5py
+import numpy as np
+
+from blenderproc.python.renderer.RegionStitchingUtility import stitch_frame_regions
+from blenderproc.python.writer.Hdf5WritePolicy import Hdf5WritePolicy
+
+
+def load_hdf5_frame(path: str) -> Dict[str, Any]:
+    """ Loads all entries of a .hdf5 container written by `write_hdf5`, json strings are parsed.
+
+    :param path: The path to the .hdf5 container.
+    :return: Maps each key to its data.
+    """
+    frame: Dict[str, Any] = {}
+    with h5py.File(path, "r") as file:
+        for key in file.keys():
+            value = np.array(file[key])
+            if value.dtype.char == 'S' and value.ndim == 0:
+                try:
+                    value = json.loads(value.item().decode("utf-8"))
+                except ValueError:
+                    # e.g. the version of blenderproc
+                    pass
+            frame[key] = value
+    return frame
+
+
+def write_hdf5_frame(path: str, frame: Dict[str, Any]):
+    """ Writes the given entries into a new .hdf5 container, lists and dicts are stored as json strings.
+
+    :param path: The path of the new .hdf5 container.
+    :param frame: Maps each key to its data.
+    """
+    policy = Hdf5WritePolicy()
+    with h5py.File(path, "w") as file:
+        for key, value in frame.items():
+            if isinstance(value, (list, dict)):
+                value = np.bytes_(json.dumps(value))
+            policy.write(file, key, policy.convert(np.asarray(value)))
+
+
+def cli():
+    """
+    Command line function
+    """
+    parser = argparse.ArgumentParser("Stitches the .hdf5 containers of several render regions, which were written "
+                                     "by write_hdf5 after rendering with set_render_region, into containers of the "
+                                     "whole images.")
+    parser.add_argument('output_dir', help="The directory, in which the stitched containers are written.")
+    parser.add_argument('region_dirs', nargs='+', help="The output directories of write_hdf5 of all regions, the "
+                                                       "containers with the same name are stitched together.")
+    args = parser.parse_args()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    file_names = sorted(name for name in os.listdir(args.region_dirs[0]) if name.endswith(".hdf5"))
+    for file_name in file_names:
+        frame_regions = [load_hdf5_frame(os.path.join(region_dir, file_name)) for region_dir in args.region_dirs]
+        if any("render_region" not in frame_region for frame_region in frame_regions):
+            raise RuntimeError(f"The container {file_name} does not contain a render_region in all given "
+                               f"directories, were they rendered via set_render_region?")
+        write_hdf5_frame(os.path.join(args.output_dir, file_name), stitch_frame_regions(frame_regions))
+    print(f"Stitched {len(file_names)} containers of {len(args.region_dirs)} regions into {args.output_dir}")
+
+
+if __name__ == "__main__":
+    cli()
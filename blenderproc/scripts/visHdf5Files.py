@@ -154,9 +154,79 @@ def vis_data(key, data, full_hdf5_data=None, file_label="", rgb_keys=None, flow_
             plt.close()
 
 
+def is_sharded_container(data) -> bool:
+    """ Checks whether the given hdf5 file is a shard, which contains multiple frames. """
+    return data.attrs.get("layout", "") == "sharded"
+
+
+def iterate_shard_frames(data):
+    """ Iterates over all frames of the given shard.
+
+    :param data: The opened shard.
+    :return: A generator yielding the global frame id and a dict mapping each key to the data of this frame.
+    """
+    frame_ids = np.array(data["frame_ids"])
+    for offset, frame_id in enumerate(frame_ids):
+        yield int(frame_id), {key: np.array(data[key][offset]) for key in data.keys() if key != "frame_ids"}
+
+
+def vis_frame(data, file_label, file_stem, keys_to_visualize=None, rgb_keys=None, flow_keys=None, segmap_keys=None,
+              segcolormap_keys=None, depth_keys=None, depth_max=default_depth_max, save_to_path=None):
+    """ Visualize the data of a single frame
+
+    :param data: Maps each key to the data of this frame, e.g. an opened hdf5 file.
+    :param file_label: The label used in the titles of the figures.
+    :param file_stem: The prefix of the files the visualizations are saved to.
+    """
+    # Select only a subset of keys if args.keys is given
+    if keys_to_visualize is not None:
+        keys = [key for key in data.keys() if key_matches(key, keys_to_visualize)]
+    else:
+        keys = list(data.keys())
+
+    # Visualize every key
+    res = []
+    for key in keys:
+        value = np.array(data[key])
+
+        if sum(ele for ele in value.shape) < 5 or "version" in key:
+            if value.dtype == "|S5":
+                res.append(
+                    (key, str(value).replace("[", "").replace("]", "").replace("b'", "").replace("'", "")))
+            else:
+                res.append((key, value))
+        else:
+            res.append((key, value.shape))
+
+    if res:
+        res = [f"'{key}': {key_res}" for key, key_res in res]
+        print("Keys: " + ', '.join(res))
+
+    for key in keys:
+        value = np.array(data[key])
+        if save_to_path is not None:
+            save_to_file = os.path.join(save_to_path, file_stem + f"_{key}.png")
+        else:
+            save_to_file = None
+
+        # Check if it is a stereo image
+        if len(value.shape) >= 3 and value.shape[0] == 2:
+            # Visualize both eyes separately
+            for i, img in enumerate(value):
+                if save_to_file:
+                    save_to_file = str(Path(save_to_file).with_suffix("")) + (
+                        "_left" if i == 0 else "_right") + Path(save_to_file).suffix
+                vis_data(key, img, data, file_label + (" (left)" if i == 0 else " (right)"),
+                         rgb_keys, flow_keys, segmap_keys, segcolormap_keys, depth_keys, depth_max,
+                         save_to_file)
+        else:
+            vis_data(key, value, data, file_label, rgb_keys, flow_keys, segmap_keys,
+                     segcolormap_keys, depth_keys, depth_max, save_to_file)
+
+
 def vis_file(path, keys_to_visualize=None, rgb_keys=None, flow_keys=None, segmap_keys=None, segcolormap_keys=None,
              depth_keys=None, depth_max=default_depth_max, save_to_path=None):
-    """ Visualize a file """
+    """ Visualize a file, in case of a shard all contained frames are visualized """
     if save_to_path is not None and not os.path.exists(save_to_path):
         os.makedirs(save_to_path)
 
@@ -165,53 +235,16 @@ def vis_file(path, keys_to_visualize=None, rgb_keys=None, flow_keys=None, segmap
         if os.path.isfile(path):
             with h5py.File(path, 'r') as data:
                 print(path + ": ")
-
-                # Select only a subset of keys if args.keys is given
-                if keys_to_visualize is not None:
-                    keys = [key for key in data.keys() if key_matches(key, keys_to_visualize)]
+                file_stem = str(os.path.basename(path)).split('.', maxsplit=1)[0]
+                if is_sharded_container(data):
+                    for frame_id, frame_data in iterate_shard_frames(data):
+                        print(f"Frame {frame_id}:")
+                        vis_frame(frame_data, f"{os.path.basename(path)} (frame {frame_id})",
+                                  f"{file_stem}_{frame_id}", keys_to_visualize, rgb_keys, flow_keys, segmap_keys,
+                                  segcolormap_keys, depth_keys, depth_max, save_to_path)
                 else:
-                    keys = list(data.keys())
-
-                # Visualize every key
-                res = []
-                for key in keys:
-                    value = np.array(data[key])
-
-                    if sum(ele for ele in value.shape) < 5 or "version" in key:
-                        if value.dtype == "|S5":
-                            res.append(
-                                (key, str(value).replace("[", "").replace("]", "").replace("b'", "").replace("'", "")))
-                        else:
-                            res.append((key, value))
-                    else:
-                        res.append((key, value.shape))
-
-                if res:
-                    res = [f"'{key}': {key_res}" for key, key_res in res]
-                    print("Keys: " + ', '.join(res))
-
-                for key in keys:
-                    value = np.array(data[key])
-                    if save_to_path is not None:
-                        save_to_file = os.path.join(save_to_path,
-                                                    str(os.path.basename(path)).split('.', maxsplit=1)[0] +
-                                                    f"_{key}.png")
-                    else:
-                        save_to_file = None
-
-                    # Check if it is a stereo image
-                    if len(value.shape) >= 3 and value.shape[0] == 2:
-                        # Visualize both eyes separately
-                        for i, img in enumerate(value):
-                            if save_to_file:
-                                save_to_file = str(Path(save_to_file).with_suffix("")) + (
-                                    "_left" if i == 0 else "_right") + Path(save_to_file).suffix
-                            vis_data(key, img, data, os.path.basename(path) + (" (left)" if i == 0 else " (right)"),
-                                     rgb_keys, flow_keys, segmap_keys, segcolormap_keys, depth_keys, depth_max,
-                                     save_to_file)
-                    else:
-                        vis_data(key, value, data, os.path.basename(path), rgb_keys, flow_keys, segmap_keys,
-                                 segcolormap_keys, depth_keys, depth_max, save_to_file)
+                    vis_frame(data, os.path.basename(path), file_stem, keys_to_visualize, rgb_keys, flow_keys,
+                              segmap_keys, segcolormap_keys, depth_keys, depth_max, save_to_path)
         else:
             print("The path is not a file")
     else:
@@ -224,7 +257,7 @@ def cli():
     """
     parser = argparse.ArgumentParser("Script to visualize hdf5 files")
 
-    parser.add_argument('hdf5_paths', nargs='+', help='Path to hdf5 file/s')
+    parser.add_argument('hdf5_paths', nargs='+', help='Path to hdf5 file/s, shards are visualized frame by frame')
     parser.add_argument('--keys', nargs='+', help='Keys that should be visualized. If none is given, '
                                                   'all keys are visualized.', default=all_default_keys)
     parser.add_argument('--rgb_keys', nargs='+', help='Keys that should be interpreted as rgb data.',
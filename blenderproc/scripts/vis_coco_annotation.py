@@ -7,6 +7,8 @@
 import numpy as np
 from PIL import Image, ImageFont, ImageDraw
 
+from blenderproc.python.writer.CocoRleUtility import rle_to_binary_mask
+
 
 def cli():
     """
@@ -44,24 +46,6 @@ def get_category(_id):
             return str(category[0])
         raise RuntimeError(f"Category {_id} is not defined in {os.path.join(base_path, conf)}")
 
-    def rle_to_binary_mask(rle):
-        """Converts a COCOs run-length encoding (RLE) to binary mask.
-        :param rle: Mask in RLE format
-        :return: a 2D binary numpy array where '1's represent the object
-        """
-        binary_array = np.zeros(np.prod(rle.get('size')), dtype=np.bool)
-        counts = rle.get('counts')
-
-        start = 0
-        for i in range(len(counts) - 1):
-            start += counts[i]
-            end = start + counts[i + 1]
-            binary_array[start:end] = (i + 1) % 2
-
-        binary_mask = binary_array.reshape(*rle.get('size'), order='F')
-
-        return binary_mask
-
     font = ImageFont.load_default()
     # Add bounding boxes and masks
     for annotation in annotations:
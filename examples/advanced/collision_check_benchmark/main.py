@@ -0,0 +1,58 @@
+import blenderproc as bproc
+from blenderproc.python.utility.CollisionUtility import CollisionUtility, BoundingBoxCache, BvhCache
+import argparse
+import time
+import numpy as np
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--objects', default=20, type=int, help="The number of objects to place.")
+parser.add_argument('--segments', default=256, type=int, help="The number of segments of each sphere, the mesh "
+                                                               "has about segments^2 triangles.")
+parser.add_argument('--max_tries', default=100, type=int, help="The maximum number of tries per object.")
+args = parser.parse_args()
+
+bproc.init()
+
+# All objects are copies of one high resolution sphere, each with its own mesh datablock
+sphere = bproc.object.create_primitive('SPHERE', segments=args.segments, ring_count=args.segments // 2)
+objs = [sphere] + [sphere.duplicate() for _ in range(args.objects - 1)]
+sphere.get_mesh().calc_loop_triangles()
+print(f"{args.objects} objects with {len(sphere.get_mesh().loop_triangles)} triangles each")
+
+
+def baseline_check(obj, placed_objects, bvh_cache):
+    """ The collision check before the bvh cache: the world bvh trees are built via bmesh and the tree of obj is
+    removed from the cache on every try. """
+    bvh_cache.pop(obj.get_name(), None)
+    for other in placed_objects:
+        if not CollisionUtility.check_bb_intersection(obj, other):
+            continue
+        for o in [obj, other]:
+            if o.get_name() not in bvh_cache:
+                bvh_cache[o.get_name()] = o.create_bvh_tree()
+        if bvh_cache[obj.get_name()].overlap(bvh_cache[other.get_name()]):
+            return False
+    return True
+
+
+def cached_check(obj, placed_objects, caches):
+    """ The collision check via the BvhCache, which reads each mesh once and rebuilds only the tree of obj. """
+    bvh_cache, bb_cache = caches
+    # the inside check is skipped, as the baseline check above does not do it
+    return CollisionUtility.check_intersections(obj, bvh_cache, placed_objects, placed_objects, bb_cache)
+
+
+for name, check, caches in [("baseline", baseline_check, {}),
+                            ("bvh cache", cached_check, (BvhCache(), BoundingBoxCache()))]:
+    # Both methods see the same sequence of poses
+    np.random.seed(1)
+    placed_objects, tries = [], 0
+    begin = time.time()
+    for obj in objs:
+        for _ in range(args.max_tries):
+            obj.set_location(np.random.uniform([-2, -2, -2], [2, 2, 2]))
+            tries += 1
+            if check(obj, placed_objects, caches):
+                placed_objects.append(obj)
+                break
+    print(f"{name:<18}{time.time() - begin:>8.2f}s for {tries} tries, {len(placed_objects)} objects placed")
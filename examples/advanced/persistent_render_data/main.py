@@ -0,0 +1,64 @@
+import blenderproc as bproc
+import argparse
+import bpy
+import numpy as np
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--objects', default=200, type=int, help="The number of objects in the scene.")
+parser.add_argument('--runs', default=5, type=int, help="The number of render calls per mode.")
+parser.add_argument('--frames', default=5, type=int, help="The number of frames per render call.")
+parser.add_argument('--samples', default=16, type=int, help="The number of samples per pixel.")
+args = parser.parse_args()
+
+bproc.init()
+
+# Create a scene with many objects, whose poses and materials change between the render calls
+objs = []
+for i in range(args.objects):
+    obj = bproc.object.create_primitive('MONKEY')
+    obj.add_modifier("SUBSURF", render_levels=2)
+    material = bproc.material.create(f"material_{i}")
+    obj.replace_materials(material)
+    objs.append(obj)
+plane = bproc.object.create_primitive('PLANE', scale=[20, 20, 1])
+
+light = bproc.types.Light()
+light.set_location([5, -5, 10])
+light.set_energy(3000)
+
+bproc.camera.set_resolution(512, 512)
+bproc.renderer.set_max_amount_of_samples(args.samples)
+bproc.renderer.set_noise_threshold(0)
+
+# Print the number of changed objects and materials after each render call
+bproc.renderer.enable_render_data_change_tracking()
+
+results = {}
+for persistent in [False, True]:
+    # render_init() enables persistent render data, disable it for the comparison
+    bpy.context.scene.render.use_persistent_data = persistent
+    frame_times = []
+    for r in range(args.runs):
+        bproc.utility.reset_keyframes()
+        # Change the object poses and materials, but not the geometry
+        for obj in objs:
+            obj.set_location(np.random.uniform([-5, -5, 0.5], [5, 5, 3]))
+            obj.set_rotation_euler(bproc.sampler.uniformSO3())
+            obj.get_materials()[0].set_principled_shader_value("Base Color", np.random.uniform(0, 1, 4))
+        for i in range(args.frames):
+            location = bproc.sampler.shell(center=[0, 0, 0], radius_min=12, radius_max=15,
+                                           elevation_min=30, elevation_max=80)
+            rotation_matrix = bproc.camera.rotation_from_forward_vec(-location)
+            bproc.camera.add_camera_pose(bproc.math.build_transformation_mat(location, rotation_matrix))
+        bproc.renderer.render(return_data=False)
+        # the first render call has to build everything in both modes
+        if r > 0:
+            frame_times += [(frame["sync_time"], frame["render_time"])
+                            for frame in bproc.renderer.get_render_stats().frames]
+    results[persistent] = np.array(frame_times)
+
+print(f"{args.objects} objects, {args.runs} render calls with {args.frames} frames and {args.samples} samples each")
+print(f"{'':<22}{'sync [s]':>12}{'sampling [s]':>14}")
+for persistent, frame_times in results.items():
+    name = "persistent data" if persistent else "default"
+    print(f"{name:<22}{frame_times[:, 0].mean():>12.3f}{frame_times[:, 1].mean():>14.3f}")
@@ -0,0 +1,68 @@
+import blenderproc as bproc
+
+import unittest
+import numpy as np
+
+from blenderproc.python.object.ObjectPoseSampler import _ObjectPoseSampler
+
+
+class UnitTestCheckObjectPoseSampler(unittest.TestCase):
+
+    def test_candidate_bounding_boxes(self):
+        """ Tests if the bounding boxes of the candidate poses match the ones of the object placed at these poses.
+        """
+        bproc.clean_up(True)
+        parent = bproc.object.create_primitive("CUBE")
+        parent.set_location([1, -2, 0.5])
+        parent.set_rotation_euler([0.3, 0.1, 1.2])
+        obj = bproc.object.create_primitive("MONKEY")
+        obj.set_parent(parent)
+        obj.set_scale([0.5, 2, 1])
+        parent.set_scale([1, 1.5, 0.8])
+
+        random = np.random.RandomState(0)
+        locations = random.uniform(-2, 2, (20, 3))
+        rotations = random.uniform(0, 2 * np.pi, (20, 3))
+        bounds = _ObjectPoseSampler.compute_bounding_boxes(obj, locations, rotations)
+        for location, rotation, candidate_bounds in zip(locations, rotations, bounds):
+            obj.set_location(location)
+            obj.set_rotation_euler(rotation)
+            bound_box = obj.get_bound_box()
+            self.assertTrue(np.allclose(candidate_bounds, [np.min(bound_box, axis=0), np.max(bound_box, axis=0)],
+                                        atol=1e-5))
+
+    def test_sample_poses_batched_matches_sample_poses(self):
+        """ Tests if the batched sampling places the objects like sample_poses, when both get the same candidates.
+        """
+        placements = []
+        for batched in [False, True]:
+            bproc.clean_up(True)
+            bproc.object.create_primitive("CUBE", scale=[0.5, 0.5, 0.5])
+            objects = [bproc.object.create_primitive("CUBE", scale=[0.3, 0.3, 0.3]) for _ in range(8)]
+            random = np.random.RandomState(0)
+            # the same sequence of candidates for both samplers
+            candidates = {obj.get_name(): iter(zip(random.uniform([-1, -1, 0], [1, 1, 1], (200, 3)),
+                                                   random.uniform(0, 2 * np.pi, (200, 3)))) for obj in objects}
+
+            def sample_pose(obj: bproc.types.MeshObject):
+                location, rotation = next(candidates[obj.get_name()])
+                obj.set_location(location)
+                obj.set_rotation_euler(rotation)
+
+            def sample_poses(obj: bproc.types.MeshObject, num_poses: int):
+                locations, rotations = zip(*[next(candidates[obj.get_name()]) for _ in range(num_poses)])
+                return np.array(locations), np.array(rotations)
+
+            if batched:
+                results = bproc.object.sample_poses_batched(objects, sample_poses, max_tries=100, batch_size=16,
+                                                            mode_on_failure="initial_pose")
+            else:
+                results = bproc.object.sample_poses(objects, sample_pose, max_tries=100,
+                                                    mode_on_failure="initial_pose")
+            placements.append([(results[obj], obj.get_local2world_mat()) for obj in objects])
+
+        for (result, pose), (batched_result, batched_pose) in zip(*placements):
+            self.assertEqual(result, batched_result)
+            self.assertTrue(np.allclose(pose, batched_pose))
+        # some objects needed more than one try
+        self.assertTrue(any(result[0] > 0 for (result, _) in placements[0]))
@@ -0,0 +1,26 @@
+import blenderproc as bproc
+
+import unittest
+import numpy as np
+from mathutils import Euler
+
+from blenderproc.python.object.PhysicsSimulation import _PhysicsSimulation
+
+
+class UnitTestCheckPhysicsSimulation(unittest.TestCase):
+
+    def test_moving_objects_with_wrapped_euler_angles(self):
+        """ Tests if only the objects, whose pose really changed, are detected as moving.
+        """
+        old_eulers = [[0, 0, np.pi - 0.01], [0.3, 0.2, -np.pi + 0.02], [np.pi, 0.5, np.pi], [0, 0, 0], [0, 0, 0]]
+        # the same rotations with wrapped or different euler angles, a rotation by 0.2 and a translation
+        new_eulers = [[0, 0, -np.pi + 0.01], [0.3, 0.2, np.pi + 0.02], [0, np.pi - 0.5, 0], [0, 0.2, 0], [0, 0, 0]]
+        old_rotations = np.array([Euler(euler).to_matrix() for euler in old_eulers])
+        new_rotations = np.array([Euler(euler).to_matrix() for euler in new_eulers])
+        old_locations = np.zeros((5, 3))
+        new_locations = np.array([[0, 0, 0]] * 4 + [[0, 0, 0.5]])
+
+        moving = _PhysicsSimulation.get_moving_objects(old_locations, old_rotations, new_locations, new_rotations,
+                                                       object_stopped_location_threshold=0.01,
+                                                       object_stopped_rotation_threshold=0.1)
+        self.assertEqual(moving.tolist(), [False, False, False, True, True])
@@ -0,0 +1,125 @@
+import blenderproc as bproc
+
+import unittest
+import numpy as np
+
+from blenderproc.python.postprocessing.PostProcessingUtility import remove_segmap_noise, dist2depth, depth2dist, \
+    _PostProcessingUtility
+
+
+def remove_segmap_noise_reference(image: np.ndarray) -> np.ndarray:
+    """ The pixel by pixel implementation of remove_segmap_noise, which the vectorized one has to reproduce. """
+    noise_indices = _PostProcessingUtility.determine_noisy_pixels(image)
+    for index in noise_indices:
+        neighbors = _PostProcessingUtility.get_pixel_neighbors(image, index[0], index[1])
+        curr_val = image[index[0]][index[1]][0]
+        neighbor_vals = [image[neighbor[0]][neighbor[1]] for neighbor in neighbors]
+        neighbor_vals = np.unique(np.array([np.array(val) for val in neighbor_vals]))
+
+        min_val = 10000000000
+        min_idx = 0
+        for idx, n in enumerate(neighbor_vals):
+            if n - curr_val <= min_val:
+                min_val = n - curr_val
+                min_idx = idx
+
+        new_val = neighbor_vals[min_idx]
+        image[index[0]][index[1]] = np.array([new_val, new_val, new_val])
+    return image
+
+
+def create_noisy_segmap(random: np.random.RandomState, size: int = 48, num_noisy_pixels: int = 40,
+                        cluster_noise: bool = False) -> np.ndarray:
+    """ Creates a segmap of a few rectangular labels, where some pixels are replaced by rare values. """
+    # the labels are scaled like the segmaps of blender, such that determine_noisy_pixels can separate them
+    labels = np.zeros((size, size))
+    for label in range(1, 5):
+        y, x = random.randint(0, size - 16, size=2)
+        labels[y:y + 16, x:x + 16] = label
+    image = labels * 2000.0
+    if cluster_noise:
+        # chains of noisy pixels, whose new values depend on each other
+        y, x = random.randint(0, size - 6, size=2)
+        rows, cols = np.meshgrid(np.arange(y, y + 6), np.arange(x, x + 6), indexing="ij")
+        rows, cols = rows.flatten(), cols.flatten()
+    else:
+        rows, cols = random.randint(0, size, num_noisy_pixels), random.randint(0, size, num_noisy_pixels)
+    # the noisy values are higher than all labels, so they are rare values for determine_noisy_pixels
+    image[rows, cols] = random.uniform(11000, 35000, len(rows))
+    return np.repeat(image[:, :, np.newaxis], 3, axis=2)
+
+
+class UnitTestCheckPostProcessing(unittest.TestCase):
+
+    def test_remove_segmap_noise_matches_reference(self):
+        """ Tests if the vectorized denoising gives the same result as the pixel by pixel implementation.
+        """
+        random = np.random.RandomState(0)
+        for i in range(100):
+            image = create_noisy_segmap(random, cluster_noise=i % 2 == 1)
+            expected = remove_segmap_noise_reference(image.copy())
+            denoised = remove_segmap_noise(image.copy())
+            self.assertTrue(np.array_equal(denoised, expected))
+
+    def test_remove_segmap_noise_long_chains(self):
+        """ Tests if chains of noisy pixels, which span whole rows, columns and diagonals, are resolved correctly.
+        """
+        random = np.random.RandomState(2)
+        for i in range(10):
+            image = create_noisy_segmap(random, num_noisy_pixels=0)[:, :, 0]
+            size = image.shape[0]
+            diagonal = np.arange(size)
+            for rows, cols in [(np.full(size, i), diagonal), (diagonal, np.full(size, 2 * i)),
+                               (diagonal, diagonal[::-1]), (diagonal[:-i - 1], diagonal[i + 1:])]:
+                image[rows, cols] = random.uniform(11000, 35000, len(rows))
+            image = np.repeat(image[:, :, np.newaxis], 3, axis=2)
+            expected = remove_segmap_noise_reference(image.copy())
+            denoised = remove_segmap_noise(image.copy())
+            self.assertTrue(np.array_equal(denoised, expected))
+
+    def test_remove_segmap_noise_in_parallel(self):
+        """ Tests if denoising a list of images in several threads gives the same result as in a single thread.
+        """
+        random = np.random.RandomState(1)
+        images = [create_noisy_segmap(random, cluster_noise=i % 2 == 1) for i in range(6)]
+        expected = [remove_segmap_noise_reference(image.copy()) for image in images]
+        denoised = remove_segmap_noise([image.copy() for image in images], num_threads=3)
+        for denoised_image, expected_image in zip(denoised, expected):
+            self.assertTrue(np.array_equal(denoised_image, expected_image))
+
+    def test_dist2depth_matches_reference(self):
+        """ Tests if the cached ray norm factors convert distances like the per pixel formula.
+        """
+        K = np.array([[300.0, 0, 61.3], [0, 300.0, 40.7], [0, 0, 1]])
+        random = np.random.RandomState(0)
+        dist = random.uniform(0.5, 10, (3, 80, 120))
+        ys, xs = np.meshgrid(np.arange(80), np.arange(120), indexing="ij")
+        expected = dist * 300.0 / np.sqrt((xs - 61.3) ** 2 + (ys - 40.7) ** 2 + 300.0 ** 2)
+
+        depth = dist2depth(dist, K)
+        self.assertEqual(depth.shape, dist.shape)
+        self.assertTrue(np.allclose(depth, expected))
+        self.assertTrue(np.allclose(depth2dist(depth, K), dist))
+        for depth_image, expected_image in zip(dist2depth(list(dist), K), expected):
+            self.assertTrue(np.allclose(depth_image, expected_image))
+        depth = dist2depth(dist.astype(np.float32), K, dtype=np.float32)
+        self.assertEqual(depth.dtype, np.float32)
+        self.assertTrue(np.allclose(depth, expected, rtol=1e-5))
+
+    def test_ray_norm_factors_are_cached_per_camera(self):
+        """ Tests if the ray norm factors are only computed once per intrinsics and resolution.
+        """
+        K = np.array([[300.0, 0, 60], [0, 300.0, 40], [0, 0, 1]])
+        factors = _PostProcessingUtility.get_ray_norm_factors(K, 80, 120)
+        self.assertFalse(factors.flags.writeable)
+        self.assertIs(_PostProcessingUtility.get_ray_norm_factors(K.copy(), 80, 120), factors)
+        self.assertIsNot(_PostProcessingUtility.get_ray_norm_factors(K, 80, 121), factors)
+        self.assertIsNot(_PostProcessingUtility.get_ray_norm_factors(K, 80, 120, np.float32), factors)
+
+        # the least recently used factors are dropped, once the cache is full
+        for i in range(_PostProcessingUtility.ray_norm_factor_cache_size - 1):
+            _PostProcessingUtility.get_ray_norm_factors(K, 10, 10 + i)
+        self.assertIsNot(_PostProcessingUtility.get_ray_norm_factors(K, 80, 120), factors)
+        self.assertLessEqual(len(_PostProcessingUtility.ray_norm_factor_cache),
+                             _PostProcessingUtility.ray_norm_factor_cache_size)
+
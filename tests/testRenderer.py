@@ -0,0 +1,254 @@
+import blenderproc as bproc
+
+import unittest
+from unittest import mock
+import os.path
+import tempfile
+import bpy
+import numpy as np
+
+from blenderproc.python.renderer.NOCSRendererUtility import _NOCSRendererUtility
+from blenderproc.python.renderer.RenderManifestUtility import RenderManifest
+from blenderproc.python.renderer.RegionStitchingUtility import split_into_regions, stitch_render_regions
+from blenderproc.python.renderer.RendererUtility import _update_segmentation_pass_indices
+from blenderproc.python.renderer import SegMapRendererUtility
+from blenderproc.python.renderer.SampleBudgetRendererUtility import render_with_sample_budget, \
+    _SampleBudgetRendererUtility
+from blenderproc.python.utility.BlenderUtility import get_all_blender_mesh_objects
+from blenderproc.python.utility.Utility import Utility
+
+
+class UnitTestCheckRenderer(unittest.TestCase):
+
+    def test_render_manifest_resume(self):
+        """ Tests if a manifest of the same seed and render call resumes the complete frames.
+        """
+        with tempfile.TemporaryDirectory() as output_dir:
+            paths = [os.path.join(output_dir, f"rgb_{frame:04d}.png") for frame in range(3)]
+            manifest = RenderManifest(output_dir, "1", "call_0")
+            for frame in range(2):
+                open(paths[frame], "w", encoding="utf-8").close()
+                manifest.mark_complete(frame, [paths[frame]])
+
+            manifest = RenderManifest(output_dir, "1", "call_0")
+            self.assertEqual([manifest.is_complete(frame) for frame in range(3)], [True, True, False])
+
+            # a frame only counts as complete, if all of its files still exist
+            os.remove(paths[1])
+            self.assertFalse(manifest.is_complete(1))
+
+    def test_render_manifest_of_later_call(self):
+        """ Tests if a later render call can resume, after the earlier calls have been run again.
+        """
+        with tempfile.TemporaryDirectory() as output_dir:
+            paths = [os.path.join(output_dir, f"rgb_{frame:04d}.png") for frame in range(2)]
+            # call_0 finishes, call_1 is interrupted after its first frame
+            manifest = RenderManifest(output_dir, "1", "call_0")
+            for frame, path in enumerate(paths):
+                open(path, "w", encoding="utf-8").close()
+                manifest.mark_complete(frame, [path])
+            manifest.remove()
+            manifest = RenderManifest(output_dir, "1", "call_1")
+            open(paths[0], "w", encoding="utf-8").close()
+            os.utime(paths[0], ns=(10 ** 18, 10 ** 18))
+            manifest.mark_complete(0, [paths[0]])
+
+            # the restart runs call_0 again from scratch, which does not touch the manifest of call_1
+            manifest = RenderManifest(output_dir, "1", "call_0")
+            self.assertFalse(manifest.is_complete(0))
+            manifest.remove()
+            manifest = RenderManifest(output_dir, "1", "call_1")
+            self.assertEqual([manifest.is_complete(frame) for frame in range(2)], [True, False])
+
+            # a frame, whose files have been overwritten by another call, is rendered again
+            os.utime(paths[0], ns=(2 * 10 ** 18, 2 * 10 ** 18))
+            self.assertFalse(manifest.is_complete(0))
+            with self.assertRaises(RuntimeError):
+                RenderManifest(output_dir, "2", "call_1")
+
+    def test_render_manifest_remove(self):
+        """ Tests if a removed manifest lets the next render call start fresh.
+        """
+        with tempfile.TemporaryDirectory() as output_dir:
+            path = os.path.join(output_dir, "rgb_0000.png")
+            open(path, "w", encoding="utf-8").close()
+            manifest = RenderManifest(output_dir, "1", "call_0")
+            manifest.mark_complete(0, [path])
+            manifest.remove()
+
+            self.assertFalse(os.path.exists(manifest.path))
+            self.assertFalse(RenderManifest(output_dir, "1", "call_0").is_complete(0))
+
+    def test_render_manifest_incomplete_line(self):
+        """ Tests if a line, which was interrupted while being written, is ignored.
+        """
+        with tempfile.TemporaryDirectory() as output_dir:
+            paths = [os.path.join(output_dir, f"rgb_{frame:04d}.png") for frame in range(2)]
+            for path in paths:
+                open(path, "w", encoding="utf-8").close()
+            manifest = RenderManifest(output_dir, "1", "call_0")
+            manifest.mark_complete(0, [paths[0]])
+            with open(manifest.path, "a", encoding="utf-8") as f:
+                f.write('{"frame": 1, "fi')
+
+            manifest = RenderManifest(output_dir, "1", "call_0")
+            self.assertEqual([manifest.is_complete(frame) for frame in range(2)], [True, False])
+            # new lines are appended after the last complete line
+            manifest.mark_complete(1, [paths[1]])
+            self.assertTrue(RenderManifest(output_dir, "1", "call_0").is_complete(1))
+
+    def test_split_into_regions(self):
+        """ Tests if the regions cover every pixel of the image exactly once.
+        """
+        for width, height, num_columns, num_rows in [(64, 48, 2, 2), (101, 37, 3, 5), (10, 10, 10, 1)]:
+            coverage = np.zeros((height, width), dtype=int)
+            for x_min, y_min, x_max, y_max in split_into_regions(width, height, num_columns, num_rows):
+                coverage[y_min:y_max, x_min:x_max] += 1
+            self.assertTrue((coverage == 1).all())
+        with self.assertRaises(ValueError):
+            split_into_regions(4, 4, 5, 1)
+
+    def test_stitch_render_regions(self):
+        """ Tests if stitching the cropped and uncropped outputs of all regions gives the whole images again.
+        """
+        random = np.random.RandomState(0)
+        width, height, num_frames = 37, 23, 2
+        colors = [random.uniform(size=(height, width, 3)) for _ in range(num_frames)]
+        depth = [random.uniform(size=(height, width)) for _ in range(num_frames)]
+        stereo = [random.uniform(size=(2, height, width, 3)) for _ in range(num_frames)]
+
+        region_data = []
+        for region_index, (x_min, y_min, x_max, y_max) in enumerate(split_into_regions(width, height, 3, 2)):
+            crop = (slice(y_min, y_max), slice(x_min, x_max))
+            region_data.append({
+                "colors": [image[crop] for image in colors],
+                # an output, which was not cropped to the region
+                "depth": depth,
+                "stereo": [image[(slice(None),) + crop] for image in stereo],
+                "instance_attribute_maps": [[{"idx": region_index % 2, "name": f"obj_{region_index % 2}"}]
+                                            for _ in range(num_frames)],
+                "render_region": [np.array([x_min, y_min, x_max, y_max, width, height]) for _ in range(num_frames)]
+            })
+
+        stitched = stitch_render_regions(region_data)
+        for key, expected in [("colors", colors), ("depth", depth), ("stereo", stereo)]:
+            self.assertEqual(len(stitched[key]), num_frames)
+            for stitched_image, expected_image in zip(stitched[key], expected):
+                self.assertTrue(np.array_equal(stitched_image, expected_image))
+        self.assertEqual(stitched["instance_attribute_maps"][0], [{"idx": 0, "name": "obj_0"},
+                                                                  {"idx": 1, "name": "obj_1"}])
+        self.assertNotIn("render_region", stitched)
+
+        # regions of different resolutions can not be stitched
+        region_data[1]["render_region"] = [np.array([0, 0, 1, 1, width + 1, height]) for _ in range(num_frames)]
+        with self.assertRaises(ValueError):
+            stitch_render_regions(region_data)
+
+    def test_render_data_change_tracking(self):
+        """ Tests if the moved objects and changed materials are tracked until the tracking is stopped.
+        """
+        bproc.clean_up(True)
+        cube = bproc.object.create_primitive("CUBE")
+        sphere = bproc.object.create_primitive("SPHERE")
+        material = bproc.material.create("material")
+        cube.replace_materials(material)
+        bproc.renderer.enable_render_data_change_tracking()
+        try:
+            cube.set_location([1, 2, 3])
+            material.set_principled_shader_value("Roughness", 0.1)
+            changes = bproc.renderer.get_render_data_changes()
+            self.assertIn(cube.get_name(), changes["moved_objects"])
+            self.assertNotIn(sphere.get_name(), changes["moved_objects"])
+            self.assertIn(material.get_name(), changes["changed_materials"])
+        finally:
+            bproc.renderer.enable_render_data_change_tracking(False)
+
+        sphere.set_location([1, 2, 3])
+        self.assertEqual(bproc.renderer.get_render_data_changes()["moved_objects"], set())
+
+    def test_nocs_aov_outputs_are_removed(self):
+        """ Tests if the NOCS AOV outputs are added once per material and removed without touching other nodes.
+        """
+        bproc.clean_up(True)
+        material = bproc.material.create("material")
+        cubes = [bproc.object.create_primitive("CUBE") for _ in range(2)]
+        for cube in cubes:
+            cube.replace_materials(material)
+        node_names = sorted(node.name for node in material.nodes)
+
+        added_nodes = _NOCSRendererUtility.add_nocs_aov_outputs()
+        self.assertEqual(len(added_nodes), 4)
+        self.assertEqual(len(material.nodes), len(node_names) + 4)
+        # a second call, e.g. by a nested rendering, does not add another output
+        self.assertEqual(_NOCSRendererUtility.add_nocs_aov_outputs(), [])
+
+        _NOCSRendererUtility.remove_nodes(added_nodes)
+        self.assertEqual(sorted(node.name for node in material.nodes), node_names)
+
+    def test_segmentation_pass_indices(self):
+        """ Tests if new and duplicated objects get unique pass indices within the range supported by blender.
+        """
+        bproc.clean_up(True)
+        cube = bproc.object.create_primitive("CUBE")
+        cube.blender_obj.pass_index = 5
+        duplicate = cube.duplicate()
+        new_object = bproc.object.create_primitive("SPHERE")
+        _update_segmentation_pass_indices()
+        self.assertEqual(cube.blender_obj.pass_index, 5)
+        self.assertEqual(sorted([duplicate.blender_obj.pass_index, new_object.blender_obj.pass_index]), [6, 7])
+
+        cube.blender_obj.pass_index = 32767
+        bproc.object.create_primitive("SPHERE")
+        with self.assertRaises(RuntimeError):
+            _update_segmentation_pass_indices()
+
+    def test_sample_budget_keyframes_are_removed(self):
+        """ Tests if the sample keyframes are removed and the original exception is kept, if the rendering fails.
+        """
+        bproc.clean_up(True)
+        bproc.utility.set_keyframe_render_interval(0, 3)
+        bpy.context.scene.cycles.samples = 7
+        probe = {"noise": 0.1, "time_per_sample": 0.01, "overhead_time": 0.1, "probe_time": 0.2}
+        # the scene has no mesh objects, so the rendering after the probes fails
+        with mock.patch.object(_SampleBudgetRendererUtility, "render_probes", return_value=[probe] * 3):
+            with self.assertRaisesRegex(Exception, "no mesh-objects"):
+                render_with_sample_budget(target_noise=0.05)
+
+        self.assertEqual(bpy.context.scene.cycles.samples, 7)
+        # without keyframes, changing the frame does not change the number of samples
+        bpy.context.scene.frame_set(2)
+        self.assertEqual(bpy.context.scene.cycles.samples, 7)
+
+    def test_render_segmap_maps_attributes(self):
+        """ Tests if the attributes of the visible objects are mapped onto the rendered instance ids of each frame.
+        """
+        bproc.clean_up(True)
+        bproc.utility.set_keyframe_render_interval(0, 2)
+        for category_id in [3, None, 7]:
+            obj = bproc.object.create_primitive("CUBE")
+            if category_id is not None:
+                obj.set_cp("category_id", category_id)
+        # the same order in which render_segmap assigns the instance ids, the background is not an object
+        objects = get_all_blender_mesh_objects()
+        class_ids = np.array([5] + [obj.get("category_id", 5) for obj in objects])
+        names = [bpy.context.scene.world.name] + [obj.name for obj in objects]
+        colors, _ = Utility.generate_equidistant_values(len(objects) + 1, 2048)
+        instance_segmaps = [np.array([[0, 1, 1], [2, 2, 0]]), np.array([[3, 3, 1], [0, 3, 0]])]
+
+        def load_segmentation(file_path: str, num_channels: int = 3) -> np.ndarray:
+            frame = int(os.path.basename(file_path)[len("seg_"):len("seg_") + 4])
+            return np.array(colors, dtype=np.float32)[instance_segmaps[frame]][:, :, :num_channels]
+
+        with tempfile.TemporaryDirectory() as output_dir:
+            with mock.patch.object(SegMapRendererUtility.RendererUtility, "render"), \
+                    mock.patch.object(SegMapRendererUtility, "load_image", side_effect=load_segmentation):
+                data = bproc.renderer.render_segmap(output_dir, output_dir, map_by=["instance", "class", "name"],
+                                                    default_values={"class": 5})
+
+        for frame, instance_segmap in enumerate(instance_segmaps):
+            self.assertTrue(np.array_equal(data["instance_segmaps"][frame], instance_segmap))
+            self.assertTrue(np.array_equal(data["class_segmaps"][frame], class_ids[instance_segmap]))
+            self.assertEqual({mapping["idx"]: (mapping["category_id"], mapping["name"])
+                              for mapping in data["instance_attribute_maps"][frame]},
+                             {int(i): (int(class_ids[i]), names[i]) for i in np.unique(instance_segmap)})
+
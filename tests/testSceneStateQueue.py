@@ -0,0 +1,81 @@
+import blenderproc as bproc
+
+import unittest
+import os
+import tempfile
+import threading
+from unittest import mock
+
+from blenderproc.python.utility.SceneStateQueue import SceneStateQueue
+from blenderproc.python.utility.ScenePreparationUtility import prepare_scenes, is_scene_worker
+
+
+class UnitTestCheckSceneStateQueue(unittest.TestCase):
+
+    def test_states_are_claimed_in_order(self):
+        """ Tests if the states are returned in the order of their scene index and removed after being claimed.
+        """
+        with tempfile.TemporaryDirectory() as queue_dir:
+            queue = SceneStateQueue(queue_dir)
+            for scene_index, worker_id in [(2, 0), (0, 1), (1, 0)]:
+                queue.put({"scene": scene_index}, worker_id, scene_index)
+            self.assertEqual(queue.num_pending(), 3)
+            queue.mark_worker_done(0)
+            queue.mark_worker_done(1)
+
+            states = [queue.get(2, poll_interval=0.01) for _ in range(3)]
+            self.assertEqual(states, [{"scene": 0}, {"scene": 1}, {"scene": 2}])
+            self.assertEqual(queue.num_pending(), 0)
+            self.assertIsNone(queue.get(2, poll_interval=0.01))
+            # neither the claimed nor the temporary files are left behind
+            self.assertEqual(sorted(os.listdir(queue_dir)), ["worker_000.done", "worker_001.done"])
+
+    def test_get_waits_for_workers(self):
+        """ Tests if get blocks until all workers are done and returns the states of concurrent workers.
+        """
+        with tempfile.TemporaryDirectory() as queue_dir:
+            queue = SceneStateQueue(queue_dir)
+            num_workers, num_scenes = 3, 4
+
+            def run_worker(worker_id: int):
+                for i in range(num_scenes):
+                    worker_queue = SceneStateQueue(queue_dir)
+                    worker_queue.wait_for_space(max_pending=2, poll_interval=0.01)
+                    scene_index = i * num_workers + worker_id
+                    worker_queue.put({"scene": scene_index}, worker_id, scene_index)
+                SceneStateQueue(queue_dir).mark_worker_done(worker_id)
+
+            workers = [threading.Thread(target=run_worker, args=(worker_id,)) for worker_id in range(num_workers)]
+            for worker in workers:
+                worker.start()
+
+            scenes = []
+            while True:
+                state = queue.get(num_workers, poll_interval=0.01)
+                if state is None:
+                    break
+                scenes.append(state["scene"])
+            for worker in workers:
+                worker.join()
+
+            self.assertEqual(sorted(scenes), list(range(num_workers * num_scenes)))
+            self.assertEqual(queue.num_pending(), 0)
+
+    def test_scene_worker_exits_after_preparing(self):
+        """ Tests if a scene worker exits in prepare_scenes, so the rest of the script only runs in the main process.
+        """
+        self.assertFalse(is_scene_worker())
+        with tempfile.TemporaryDirectory() as queue_dir:
+            # the second of two workers has nothing to prepare for a single scene
+            worker_environment = {"BLENDER_PROC_SCENE_QUEUE": queue_dir, "BLENDER_PROC_NUM_SCENE_WORKERS": "2",
+                                  "BLENDER_PROC_SCENE_WORKER_ID": "1"}
+            with mock.patch.dict(os.environ, worker_environment):
+                self.assertTrue(is_scene_worker())
+                loop_bodies = []
+                with self.assertRaises(SystemExit) as context:
+                    for scene_index in prepare_scenes(1, lambda _: None, []):
+                        loop_bodies.append(scene_index)
+                self.assertEqual(context.exception.code, 0)
+                self.assertEqual(loop_bodies, [])
+            self.assertEqual(os.listdir(queue_dir), ["worker_001.done"])
+
@@ -7,6 +7,7 @@
 from blenderproc.python.tests.SilentMode import SilentMode
 from blenderproc.python.tests.TestsPathManager import test_path_manager
 from blenderproc.python.utility.Utility import UndoAfterExecution
+from blenderproc.python.utility.CollisionUtility import CollisionUtility, BvhCache, BoundingBoxCache
 
 
 class UnitTestCheckUtility(unittest.TestCase):
@@ -48,4 +49,115 @@ def test_math_util_transformation_mat(self):
         cam2world_matrix = bproc.math.build_transformation_mat(location, rotation_matrix)
 
         for x, y in zip(np.reshape(correct_cam2world_matrix, -1).tolist(), np.reshape(cam2world_matrix, -1).tolist()):
-            self.assertAlmostEqual(x, y)
\ No newline at end of file
+            self.assertAlmostEqual(x, y)
+
+    def test_bvh_cache_shares_duplicated_meshes(self):
+        """ Tests if duplicated objects share the cached mesh, although they have their own mesh datablock.
+        """
+        bproc.clean_up(True)
+        monkey = bproc.object.create_primitive("MONKEY")
+        duplicate = monkey.duplicate()
+        other = bproc.object.create_primitive("CUBE")
+        self.assertNotEqual(monkey.get_mesh().name, duplicate.get_mesh().name)
+
+        bvh_cache = BvhCache()
+        self.assertEqual(bvh_cache.get_content_hash(monkey), bvh_cache.get_content_hash(duplicate))
+        self.assertNotEqual(bvh_cache.get_content_hash(monkey), bvh_cache.get_content_hash(other))
+
+    def test_bvh_cache_rebuilds_moved_objects(self):
+        """ Tests if the bvh tree of an object is reused until the object is moved.
+        """
+        bproc.clean_up(True)
+        monkey = bproc.object.create_primitive("MONKEY")
+        bvh_cache = BvhCache()
+
+        bvh_tree = bvh_cache.get_world_bvh_tree(monkey)
+        self.assertIs(bvh_cache.get_world_bvh_tree(monkey), bvh_tree)
+        random = np.random.RandomState(0)
+        # more moves than BvhCache.max_transformations, the trees stay exact nevertheless
+        for _ in range(2 * BvhCache.max_transformations + 1):
+            monkey.set_location(random.uniform(-3, 3, 3))
+            monkey.set_rotation_euler(random.uniform(0, 2 * np.pi, 3))
+            moved_bvh_tree = bvh_cache.get_world_bvh_tree(monkey)
+            self.assertIsNot(moved_bvh_tree, bvh_tree)
+            bvh_tree = moved_bvh_tree
+        for point in random.uniform(-5, 5, (10, 3)):
+            nearest = np.array(bvh_tree.find_nearest(point)[0])
+            expected = np.array(monkey.create_bvh_tree().find_nearest(point)[0])
+            self.assertTrue(np.allclose(nearest, expected, atol=1e-5))
+
+    def test_bvh_cache_remove_edited_mesh(self):
+        """ Tests if the bvh tree of an edited mesh is rebuilt after the mesh has been removed from the cache.
+        """
+        bproc.clean_up(True)
+        cube = bproc.object.create_primitive("CUBE")
+        other = bproc.object.create_primitive("CUBE")
+        other.set_location([3, 0, 0])
+        bvh_cache = BvhCache()
+        self.assertFalse(CollisionUtility.check_mesh_intersection(cube, other, True, bvh_cache)[0])
+
+        # the same number of vertices, but the cube now reaches the other one
+        cube.get_mesh().transform(np.diag([2.5, 1, 1, 1]))
+        bvh_cache.remove_mesh(cube)
+        self.assertTrue(CollisionUtility.check_mesh_intersection(cube, other, True, bvh_cache)[0])
+
+    def test_mesh_intersection_matches_world_bvh_trees(self):
+        """ Tests if the cached collision check gives the same results as the bvh trees built via bmesh.
+        """
+        bproc.clean_up(True)
+        monkey = bproc.object.create_primitive("MONKEY")
+        duplicate = monkey.duplicate()
+        bvh_cache = BvhCache()
+        random = np.random.RandomState(0)
+        num_intersections = 0
+        for _ in range(100):
+            for obj in [monkey, duplicate]:
+                obj.set_location(random.uniform(-1.5, 1.5, 3))
+                obj.set_rotation_euler(random.uniform(0, 2 * np.pi, 3))
+            expected = len(monkey.create_bvh_tree().overlap(duplicate.create_bvh_tree())) > 0
+            intersection, bvh_cache = CollisionUtility.check_mesh_intersection(monkey, duplicate,
+                                                                                skip_inside_check=True,
+                                                                                bvh_cache=bvh_cache)
+            self.assertEqual(intersection, expected)
+            num_intersections += expected
+        # both cases have been checked
+        self.assertTrue(0 < num_intersections < 100)
+
+    def test_bounding_box_cache_updates_moved_objects(self):
+        """ Tests if the cached bounding box of an object is recomputed once the object has been moved.
+        """
+        bproc.clean_up(True)
+        cube = bproc.object.create_primitive("CUBE")
+        other = bproc.object.create_primitive("CUBE")
+        other.set_location([3, 0, 0])
+        bb_cache = BoundingBoxCache()
+        self.assertEqual(bb_cache.get_intersecting_objects(cube, [other]), [])
+
+        other.set_location([1.5, 0, 0])
+        self.assertEqual(bb_cache.get_intersecting_objects(cube, [other]), [other])
+        other.set_rotation_euler([0, 0, np.pi / 4])
+        other.set_scale([2, 2, 2])
+        bound_box = other.get_bound_box()
+        self.assertTrue(np.allclose(bb_cache.get_bounds([other])[0],
+                                    [np.min(bound_box, axis=0), np.max(bound_box, axis=0)]))
+
+    def test_bounding_box_cache_matches_check_bb_intersection(self):
+        """ Tests if the cached bounding box check gives the same results as checking each pair of objects.
+        """
+        bproc.clean_up(True)
+        objects = [bproc.object.create_primitive(shape) for shape in ["CUBE", "MONKEY", "CYLINDER"] * 5]
+        bb_cache = BoundingBoxCache()
+        random = np.random.RandomState(0)
+        num_intersections = 0
+        for _ in range(50):
+            # only some of the objects are moved, the others keep their cached bounding boxes
+            for obj in random.choice(objects, 5, replace=False):
+                obj.set_location(random.uniform(-4, 4, 3))
+                obj.set_rotation_euler(random.uniform(0, 2 * np.pi, 3))
+            obj, others = objects[0], objects[1:]
+            expected = [other for other in others if CollisionUtility.check_bb_intersection(obj, other)]
+            self.assertEqual(bb_cache.get_intersecting_objects(obj, others), expected)
+            num_intersections += len(expected)
+        # both cases have been checked
+        self.assertTrue(0 < num_intersections < 50 * len(objects[1:]))
+
@@ -0,0 +1,346 @@
+import blenderproc as bproc
+
+import unittest
+import json
+import os
+import tempfile
+from itertools import groupby
+import cv2
+import h5py
+import numpy as np
+
+from blenderproc.python.writer.BopWriterUtility import _BopWriterUtility
+from blenderproc.python.writer.CocoJournalUtility import CocoAnnotationsJournal, consolidate_coco_journal
+from blenderproc.python.writer.CocoWriterUtility import _CocoWriterUtility, write_coco_annotations
+from blenderproc.python.writer.WriterUtility import _WriterUtility
+from blenderproc.python.writer.CocoRleUtility import binary_mask_to_rle, rle_to_binary_mask, compress_rle_counts, \
+    decompress_rle_counts
+
+try:
+    from pycocotools import mask as coco_mask
+except ImportError:
+    coco_mask = None
+
+
+def binary_mask_to_rle_reference(binary_mask: np.ndarray) -> dict:
+    """ The run by run implementation of binary_mask_to_rle, which the vectorized one has to reproduce. """
+    rle = {'counts': [], 'size': list(binary_mask.shape)}
+    counts = rle.get('counts')
+    for i, (value, elements) in enumerate(groupby(binary_mask.ravel(order='F'))):
+        if i == 0 and value == 1:
+            counts.append(0)
+        counts.append(len(list(elements)))
+    return rle
+
+
+def compress_rle_counts_reference(counts: list) -> str:
+    """ A port of rleToString of pycocotools, which compresses the counts value by value. """
+    chars = []
+    for i, count in enumerate(counts):
+        value = int(count)
+        if i > 2:
+            value -= int(counts[i - 2])
+        more = True
+        while more:
+            char = value & 0x1f
+            value >>= 5
+            more = value != -1 if char & 0x10 else value != 0
+            if more:
+                char |= 0x20
+            chars.append(chr(char + 48))
+    return "".join(chars)
+
+
+def create_random_masks(random: np.random.RandomState):
+    """ Yields masks of different sizes and densities, including empty and full masks. """
+    yield np.zeros((7, 5), dtype=np.uint8)
+    yield np.ones((7, 5), dtype=np.uint8)
+    for _ in range(100):
+        height, width = random.randint(1, 80, size=2)
+        density = random.choice([0.01, 0.3, 0.5, 0.9])
+        mask = (random.uniform(size=(height, width)) < density).astype(np.uint8)
+        if random.uniform() < 0.5:
+            # large connected regions give long runs
+            mask = np.zeros((height, width), dtype=np.uint8)
+            y, x = random.randint(0, height), random.randint(0, width)
+            mask[y:y + random.randint(1, 60), x:x + random.randint(1, 60)] = 1
+        yield mask
+
+
+class UnitTestCheckWriter(unittest.TestCase):
+
+    def test_binary_mask_to_rle_matches_reference(self):
+        """ Tests if the vectorized RLE gives the same counts as the run by run implementation.
+        """
+        for mask in create_random_masks(np.random.RandomState(0)):
+            self.assertEqual(binary_mask_to_rle(mask), binary_mask_to_rle_reference(mask))
+
+    def test_rle_round_trip(self):
+        """ Tests if decoding the uncompressed and the compressed RLE gives the original mask again.
+        """
+        for mask in create_random_masks(np.random.RandomState(1)):
+            for compressed in [False, True]:
+                decoded = rle_to_binary_mask(binary_mask_to_rle(mask, compressed=compressed))
+                self.assertTrue(np.array_equal(decoded, mask.astype(bool)))
+
+    def test_compressed_rle_matches_reference(self):
+        """ Tests if the compressed counts are identical to the ones of the pycocotools port, also for large counts.
+        """
+        random = np.random.RandomState(2)
+        for mask in create_random_masks(random):
+            counts = binary_mask_to_rle(mask)["counts"]
+            self.assertEqual(compress_rle_counts(counts), compress_rle_counts_reference(counts))
+        for _ in range(100):
+            counts = random.randint(0, 2 ** 40, size=random.randint(0, 20)).tolist()
+            compressed = compress_rle_counts(counts)
+            self.assertEqual(compressed, compress_rle_counts_reference(counts))
+            self.assertEqual(decompress_rle_counts(compressed).tolist(), counts)
+
+    @unittest.skipIf(coco_mask is None, "pycocotools is not installed")
+    def test_compressed_rle_matches_pycocotools(self):
+        """ Tests if the compressed RLE is identical to the one of pycocotools.
+        """
+        for mask in create_random_masks(np.random.RandomState(3)):
+            expected = coco_mask.encode(np.asfortranarray(mask))
+            rle = binary_mask_to_rle(mask, compressed=True)
+            self.assertEqual(rle["counts"], expected["counts"].decode("ascii"))
+            self.assertEqual(rle["size"], list(expected["size"]))
+
+    def test_bop_sidecar_append_and_compact(self):
+        """ Tests if the frames appended to a sidecar are compacted into the same JSON file as a full rewrite gives.
+        """
+        with tempfile.TemporaryDirectory() as chunk_dir:
+            path = os.path.join(chunk_dir, "scene_gt.json")
+            frames = {im_id: [{"obj_id": im_id % 3, "cam_t_m2c": [im_id, 0, 1]}] for im_id in range(25)}
+            for first_im_id in range(0, 25, 10):
+                new_frames = {im_id: frames[im_id] for im_id in range(first_im_id, min(first_im_id + 10, 25))}
+                _BopWriterUtility.save_chunk_json(path, new_frames, incremental=True, chunk_is_full=False)
+            self.assertFalse(os.path.exists(path))
+            self.assertEqual(_BopWriterUtility.get_last_frame_id(path), 24)
+            self.assertEqual(_BopWriterUtility.load_chunk_json(path), frames)
+            # only the last frames are read, if all requested frames are in the sidecar
+            self.assertEqual({im_id: frame for im_id, frame in _BopWriterUtility.load_chunk_json(path, 20).items()
+                              if im_id >= 20}, {im_id: frames[im_id] for im_id in range(20, 25)})
+            self.assertLess(len(_BopWriterUtility.load_chunk_json(path, 20)), 25)
+
+            _BopWriterUtility.compact_chunk_json(path)
+            self.assertFalse(os.path.exists(_BopWriterUtility.sidecar_path(path)))
+            with open(path, "r", encoding="utf-8") as f:
+                compacted = f.read()
+            _BopWriterUtility.save_chunk_json(path, frames)
+            with open(path, "r", encoding="utf-8") as f:
+                self.assertEqual(compacted, f.read())
+
+    def test_bop_sidecar_truncated_line(self):
+        """ Tests if an incomplete last line of a sidecar, e.g. after a crash, is ignored and replaced.
+        """
+        with tempfile.TemporaryDirectory() as chunk_dir:
+            path = os.path.join(chunk_dir, "scene_gt.json")
+            sidecar_path = _BopWriterUtility.sidecar_path(path)
+            # only a partial line and no JSON file
+            with open(sidecar_path, "w", encoding="utf-8") as f:
+                f.write('{"data": [{"obj_id": 1}], "im_')
+            self.assertEqual(_BopWriterUtility.get_last_frame_id(path), -1)
+            self.assertEqual(_BopWriterUtility.load_chunk_json(path), {})
+
+            _BopWriterUtility.append_json_lines(sidecar_path, {0: [{"obj_id": 1}], 1: [{"obj_id": 2}]})
+            with open(sidecar_path, "a", encoding="utf-8") as f:
+                f.write('{"data": [{"obj_id": 3}], "im_id": 2')
+            self.assertEqual(_BopWriterUtility.get_last_frame_id(path), 1)
+            self.assertEqual(_BopWriterUtility.load_chunk_json(path, 1), {1: [{"obj_id": 2}]})
+
+            _BopWriterUtility.append_json_lines(sidecar_path, {2: [{"obj_id": 4}]})
+            self.assertEqual(_BopWriterUtility.load_chunk_json(path),
+                             {0: [{"obj_id": 1}], 1: [{"obj_id": 2}], 2: [{"obj_id": 4}]})
+
+    def test_bop_sidecar_long_lines(self):
+        """ Tests if lines, which are longer than the blocks read from the end of a sidecar, are read correctly.
+        """
+        with tempfile.TemporaryDirectory() as chunk_dir:
+            path = os.path.join(chunk_dir, "scene_gt.json")
+            frames = {im_id: [{"obj_id": i} for i in range(im_id * 50)] for im_id in range(6)}
+            _BopWriterUtility.append_json_lines(_BopWriterUtility.sidecar_path(path), frames)
+            entries = list(_BopWriterUtility.read_json_lines_reversed(_BopWriterUtility.sidecar_path(path),
+                                                                      block_size=64))
+            self.assertEqual(entries, [(im_id, frames[im_id]) for im_id in reversed(range(6))])
+
+    def test_bop_coco_sidecar(self):
+        """ Tests if the coco annotations of a sidecar continue the ids of the compacted file and are merged into it.
+        """
+        with tempfile.TemporaryDirectory() as chunk_dir:
+            path = os.path.join(chunk_dir, "scene_gt_coco.json")
+            header = {"info": {}, "licenses": [], "categories": [{"id": 1}]}
+            _BopWriterUtility.save_coco_json(path, dict(header, images=[{"id": 0}],
+                                                        annotations=[{"id": 1}, {"id": 2}]))
+            self.assertEqual(_BopWriterUtility.get_next_coco_annotation_id(path), 3)
+
+            sidecar_path = _BopWriterUtility.sidecar_path(path)
+            _BopWriterUtility.append_json_lines(sidecar_path, {1: {"image": {"id": 1}, "annotations": [{"id": 3}]},
+                                                               2: {"image": {"id": 2}, "annotations": []}})
+            # the last frame without annotations is skipped
+            self.assertEqual(_BopWriterUtility.get_next_coco_annotation_id(path), 4)
+
+            _BopWriterUtility.compact_chunk_coco(path)
+            self.assertFalse(os.path.exists(sidecar_path))
+            self.assertEqual(_BopWriterUtility.load_json(path),
+                             dict(header, images=[{"id": 0}, {"id": 1}, {"id": 2}],
+                                  annotations=[{"id": 1}, {"id": 2}, {"id": 3}]))
+
+    def test_bop_gt_info_of_truncated_object(self):
+        """ Tests if the gt masks and gt info count the parts of an object outside the image.
+        """
+        with tempfile.TemporaryDirectory() as output_dir:
+            for mask_type in ["mask", "mask_visib"]:
+                os.makedirs(os.path.join(output_dir, mask_type))
+            K = np.array([[100.0, 0, 50], [0, 100.0, 40], [0, 0, 1]])
+            # a square covering x in [-0.5, 0.5) and y in [-0.2, 0.2) at z=1, so its left half is outside the image
+            vertices = np.array([[-1.0, -0.2, 1], [0.0, -0.2, 1], [0.0, 0.2, 1], [-1.0, 0.2, 1]])
+            triangles = np.array([[0, 1, 2], [0, 2, 3]])
+            instance_segmap = np.zeros((80, 100), dtype=np.int32)
+            instance_segmap[20:60, 0:50] = 1
+            depth = np.ones((80, 100))
+
+            gt_info = _BopWriterUtility.calc_frame_gt_masks_and_info(
+                os.path.join(output_dir, "{mask_type}"), 0, instance_segmap, depth,
+                [(1, vertices, triangles), (2, vertices + [0, 0, -2], triangles)], K)
+
+            self.assertEqual(gt_info[0]["px_count_visib"], 40 * 50)
+            self.assertAlmostEqual(gt_info[0]["visib_fract"], 0.5, delta=0.02)
+            self.assertEqual(gt_info[0]["bbox_visib"], [0, 20, 49, 39])
+            self.assertAlmostEqual(gt_info[0]["bbox_obj"][0], -50, delta=1)
+            self.assertAlmostEqual(gt_info[0]["bbox_obj"][2], 99, delta=1)
+            # an object behind the camera has no pixels at all
+            self.assertEqual(gt_info[1], {"px_count_all": 0, "px_count_valid": 0, "px_count_visib": 0,
+                                          "visib_fract": 0.0, "bbox_obj": [-1, -1, -1, -1],
+                                          "bbox_visib": [-1, -1, -1, -1]})
+            mask = cv2.imread(os.path.join(output_dir, "mask", "000000_000000.png"), cv2.IMREAD_GRAYSCALE)
+            self.assertEqual(int((mask > 0).sum()), gt_info[0]["px_count_valid"])
+
+    def test_coco_annotations_in_threads(self):
+        """ Tests if computing the coco annotations in several threads gives the same annotations as in one thread.
+        """
+        random = np.random.RandomState(0)
+        inst_segmaps, inst_attribute_maps = [], []
+        for _ in range(5):
+            inst_segmap = np.zeros((40, 60), dtype=np.int32)
+            for inst in range(1, 5):
+                y, x = random.randint(0, 30), random.randint(0, 50)
+                inst_segmap[y:y + random.randint(1, 10), x:x + random.randint(1, 10)] = inst
+            inst_segmaps.append(inst_segmap)
+            inst_attribute_maps.append([{"idx": inst, "category_id": inst % 3 + 1} for inst in range(5)])
+        image_paths = [f"images/{i:06d}.jpg" for i in range(5)]
+
+        for mask_encoding_format in ["rle", "compressed_rle", "polygon"]:
+            annotations = [_CocoWriterUtility.generate_coco_annotations(inst_segmaps, inst_attribute_maps,
+                                                                         image_paths, "coco_annotations",
+                                                                         mask_encoding_format, num_threads=num_threads)
+                           for num_threads in [1, 3]]
+            for key in ["categories", "annotations"]:
+                self.assertEqual(annotations[0][key], annotations[1][key])
+            # the images only differ in the time they were captured
+            self.assertEqual([dict(image, date_captured=None) for image in annotations[0]["images"]],
+                             [dict(image, date_captured=None) for image in annotations[1]["images"]])
+            self.assertEqual([annotation["id"] for annotation in annotations[1]["annotations"]],
+                             list(range(1, len(annotations[1]["annotations"]) + 1)))
+
+    def test_coco_journal_mixed_with_plain_appends(self):
+        """ Tests if appends with and without the coco journal after a consolidation never reuse ids.
+        """
+        bproc.utility.set_keyframe_render_interval(0, 2)
+        inst_segmap = np.zeros((20, 30), dtype=np.int32)
+        inst_segmap[2:8, 3:9] = 1
+        inst_segmap[10:15, 12:25] = 2
+        inst_attribute_map = [{"idx": inst, "category_id": inst} for inst in range(3)]
+        colors = [np.zeros((20, 30, 3), dtype=np.uint8)] * 2
+
+        with tempfile.TemporaryDirectory() as output_dir:
+            for use_journal, consolidate in [(True, True), (False, False), (True, False), (True, True),
+                                             (False, False), (True, False)]:
+                write_coco_annotations(output_dir, instance_segmaps=[inst_segmap] * 2,
+                                       instance_attribute_maps=[inst_attribute_map] * 2, colors=colors,
+                                       use_journal=use_journal)
+                if consolidate:
+                    consolidate_coco_journal(output_dir)
+            coco_annotations = _BopWriterUtility.load_json(consolidate_coco_journal(output_dir))
+
+        self.assertEqual([image["id"] for image in coco_annotations["images"]], list(range(12)))
+        self.assertEqual(len({image["file_name"] for image in coco_annotations["images"]}), 12)
+        annotation_ids = [annotation["id"] for annotation in coco_annotations["annotations"]]
+        self.assertEqual(len(annotation_ids), 24)
+        self.assertEqual(len(set(annotation_ids)), 24)
+        self.assertEqual(sorted(annotation["image_id"] for annotation in coco_annotations["annotations"]),
+                         sorted(list(range(12)) * 2))
+
+    def test_coco_journal_adopts_appended_entries(self):
+        """ Tests if images appended to the consolidated file without the journal are taken over by the journal.
+        """
+        def create_coco_annotations(num_images: int):
+            return {"info": {}, "licenses": [], "categories": [{"id": 1, "name": "1"}],
+                    "images": [{"id": i, "file_name": f"{i}.png"} for i in range(num_images)],
+                    "annotations": [{"id": i + 1, "image_id": i, "category_id": 1} for i in range(num_images)]}
+
+        with tempfile.TemporaryDirectory() as output_dir:
+            journal = CocoAnnotationsJournal(output_dir)
+            journal.append(create_coco_annotations(2))
+            coco_annotations_path = journal.consolidate()
+            # an unchanged consolidated file is not read again
+            journal.adopt_appended_entries(coco_annotations_path)
+            self.assertEqual(len(journal.shard_paths()), 1)
+
+            # append to the consolidated file like write_coco_annotations without a journal did
+            coco_annotations = _CocoWriterUtility.merge_coco_annotations(_BopWriterUtility.load_json(
+                coco_annotations_path), create_coco_annotations(3))
+            with open(coco_annotations_path, "w", encoding="utf-8") as f:
+                json.dump(coco_annotations, f)
+            journal = CocoAnnotationsJournal(output_dir)
+            journal.adopt_appended_entries(coco_annotations_path)
+            self.assertEqual(journal.next_image_id, 5)
+            self.assertEqual(journal.next_annotation_id,
+                             max(annotation["id"] for annotation in coco_annotations["annotations"]) + 1)
+
+            journal.append(create_coco_annotations(1))
+            consolidated = _BopWriterUtility.load_json(journal.consolidate())
+        self.assertEqual([image["id"] for image in consolidated["images"]], list(range(6)))
+        annotation_ids = [annotation["id"] for annotation in consolidated["annotations"]]
+        self.assertEqual(len(set(annotation_ids)), 6)
+
+    def test_hdf5_shards_of_earlier_runs_are_removed(self):
+        """ Tests if writing shards without appending removes the shards of an earlier run.
+        """
+        with tempfile.TemporaryDirectory() as output_dir:
+            bproc.utility.set_keyframe_render_interval(0, 5)
+            bproc.writer.write_hdf5(output_dir, {"colors": [np.full((4, 4, 3), i, dtype=np.uint8) for i in range(5)]},
+                                    frames_per_shard=2)
+            self.assertTrue(os.path.exists(os.path.join(output_dir, "shard_000002.hdf5")))
+
+            bproc.utility.set_keyframe_render_interval(0, 3)
+            bproc.writer.write_hdf5(output_dir, {"colors": [np.full((4, 4, 3), 10 + i, dtype=np.uint8)
+                                                            for i in range(3)]}, frames_per_shard=2)
+            self.assertEqual(sorted(os.listdir(output_dir)), ["shard_000000.hdf5", "shard_000001.hdf5",
+                                                              "shard_index.hdf5"])
+            self.assertEqual(_WriterUtility.read_hdf5_shard_index(output_dir).tolist(),
+                             [[0, 0, 0], [1, 0, 1], [2, 1, 0]])
+
+            bproc.writer.write_hdf5(output_dir, {"colors": [np.full((4, 4, 3), 20 + i, dtype=np.uint8)
+                                                            for i in range(3)]},
+                                    append_to_existing_output=True, frames_per_shard=2)
+            with h5py.File(os.path.join(output_dir, "shard_000001.hdf5"), "r") as file:
+                self.assertEqual(file["frame_ids"][()].tolist(), [2, 3])
+                self.assertEqual(file["colors"][:, 0, 0, 0].tolist(), [12, 20])
+
+    def test_hdf5_stream_writer_compression_level(self):
+        """ Tests if the deprecated compression_level of the Hdf5StreamWriter still sets the gzip level of all keys
+        without write policy.
+        """
+        with tempfile.TemporaryDirectory() as output_dir:
+            with self.assertWarns(DeprecationWarning):
+                writer = bproc.writer.Hdf5StreamWriter(output_dir, False, False, 1, 16, 9,
+                                                       write_policies={"depth": bproc.writer.Hdf5WritePolicy("lzf")})
+            with writer:
+                hdf5_path = writer.write_frame({"colors": np.zeros((4, 4, 3), dtype=np.uint8),
+                                                "depth": np.zeros((4, 4), dtype=np.float32)})
+            with h5py.File(hdf5_path, "r") as file:
+                self.assertEqual(file["colors"].compression, "gzip")
+                self.assertEqual(file["colors"].compression_opts, 9)
+                self.assertEqual(file["depth"].compression, "lzf")
+